@@ -0,0 +1,88 @@
+"""
+Measures the cost of sending a many-tiny-cases submission's results from a worker to the judge: one pickle per
+message, as the judge used to send them, against coalesced binary frames.
+
+    python benchmarks/ipc_many_cases.py [cases]
+"""
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dmoj.judge import IPC, JudgeWorker  # noqa: E402
+from dmoj.problem import TestCase  # noqa: E402
+from dmoj.result import Result  # noqa: E402
+from dmoj.utils import ipc_frames  # noqa: E402
+
+
+def make_messages(cases):
+    messages = []
+    for position in range(cases):
+        case = TestCase.__new__(TestCase)
+        case.__setstate__(
+            {'position': position, 'batch': 0, 'points': 1, 'output_prefix_length': 64, 'has_binary_data': False}
+        )
+        result = Result(case, execution_time=0.001, wall_clock_time=0.002, max_memory=1024, proc_output=b'42')
+        messages.append((IPC.RESULT, (None, position + 1, result)))
+    messages.append((IPC.BYE, ()))
+    return messages
+
+
+def send_pickled(conn, messages):
+    for message in messages:
+        conn.send(message)
+
+
+def send_framed(conn, messages):
+    sender = ipc_frames.FrameCoalescer(conn, JudgeWorker._encode_frame_record, window=0.005)
+    for message in messages:
+        sender.send(message)
+
+
+def receive(conn):
+    worker = JudgeWorker.__new__(JudgeWorker)
+    worker.worker_process_conn = conn
+    worker._pending_events = deque()
+    worker._idle = threading.Event()
+    worker.submissions_graded = 0
+    worker.failure_history = None
+    worker._failure_recorded = False
+    received = 0
+    while worker.recv() is not None:
+        received += 1
+    return received
+
+
+def run(send, messages):
+    parent_conn, child_conn = multiprocessing.Pipe()
+    sender = multiprocessing.Process(target=send, args=(child_conn, messages))
+    start = time.perf_counter()
+    sender.start()
+    try:
+        received = receive(parent_conn)
+        elapsed = time.perf_counter() - start
+    except BaseException:
+        # Otherwise joining would wait forever on a sender stuck writing to the full pipe.
+        sender.terminate()
+        raise
+    finally:
+        sender.join()
+    assert received == len(messages) - 1
+    return elapsed
+
+
+def main():
+    cases = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    messages = make_messages(cases)
+    for name, send in (('pickle per message', send_pickled), ('coalesced frames', send_framed)):
+        elapsed = min(run(send, messages) for _ in range(3))
+        print(f'{name:>20}: {elapsed * 1000:8.1f} ms for {cases} results ({elapsed / cases * 1e6:.2f} us/result)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+from dmoj import sysinfo
+from dmoj.judgeenv import env
+
+logger = logging.getLogger(__name__)
+
+# How many slots of any gate are held across the judge, shared with the worker processes forked from it.
+_held_slots = multiprocessing.Value('i', 0)
+
+
+def load_factor(own_load: float = 0.0) -> Tuple[float, str]:
+    """
+    Returns which fraction of its capacity the judge can use without disturbing its own timings, going by the load
+    average, memory pressure and free memory, along with the reasons for any cut. `own_load`, the part of the load
+    per core the judge itself accounts for, isn't held against it.
+    """
+    if not env.admission_control:
+        return 1.0, ''
+
+    factor = 1.0
+    reasons: List[str] = []
+    _, load = sysinfo.load_fair()
+    load = max(0.0, load - own_load)
+    if env.admission_max_load and load > env.admission_max_load:
+        factor = min(factor, env.admission_max_load / load)
+        reasons.append(f'load {load:.2f} per core')
+    _, pressure = sysinfo.memory_pressure()
+    if env.admission_max_memory_pressure and pressure > env.admission_max_memory_pressure:
+        factor = min(factor, env.admission_max_memory_pressure / pressure)
+        reasons.append(f'memory pressure {pressure:.1f}%')
+    _, available = sysinfo.memory_available()
+    if env.admission_min_free_memory and 0 <= available < env.admission_min_free_memory:
+        factor = 0.0
+        reasons.append(f'{available} KB of memory available')
+    return factor, ', '.join(reasons)
+
+
+class AdmissionController:
+    """
+    Caps how much the judge takes on at once while the machine is busy with something else.
+
+    `capped` scales any limit by the current `load_factor`, never below one; as a gate, the controller lets at most
+    `capped(slots)` holders in at a time. Each slot held keeps about one core busy with grading, so the load of the
+    slots held across the judge is left out of the factor. The factor is recomputed at most every
+    `admission_refresh_interval` seconds, and every change to a cap is logged.
+    """
+
+    def __init__(self, name: str, slots: int = 1) -> None:
+        self.name = name
+        self.slots = slots
+        self._condition = threading.Condition()
+        self._active = 0
+        self._factor = 1.0
+        self._reason = ''
+        self._refreshed_at = -math.inf
+        self._caps: Dict[int, int] = {}
+
+    def capped(self, limit: int) -> int:
+        with self._condition:
+            return self._capped_locked(limit)
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self._active < self._capped_locked(self.slots):
+                self._hold(1)
+                return True
+            return False
+
+    def acquire(self) -> None:
+        with self._condition:
+            while self._active >= self._capped_locked(self.slots):
+                # Wake up now and then to see whether the machine calmed down.
+                self._condition.wait(timeout=env.admission_refresh_interval)
+            self._hold(1)
+
+    def release(self) -> None:
+        with self._condition:
+            self._hold(-1)
+            self._condition.notify()
+
+    @contextmanager
+    def holding(self, slots: int) -> Iterator[None]:
+        """Counts `slots` more slots as held for the duration, without waiting for them, e.g. ones `capped` granted."""
+        with self._condition:
+            self._hold(slots)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._hold(-slots)
+                self._condition.notify_all()
+
+    def _hold(self, slots: int) -> None:
+        self._active += slots
+        with _held_slots.get_lock():
+            _held_slots.value += slots
+
+    def _capped_locked(self, limit: int) -> int:
+        now = time.monotonic()
+        if now - self._refreshed_at >= env.admission_refresh_interval:
+            self._refreshed_at = now
+            self._factor, self._reason = load_factor(_held_slots.value / sysinfo.cpu_count()[1])
+
+        cap = max(1, min(limit, int(limit * self._factor)))
+        if cap != self._caps.get(limit, limit):
+            reason = self._reason or 'load back to normal'
+            log = logger.warning if cap < self._caps.get(limit, limit) else logger.info
+            log('Admission control: %s capped at %d of %d (%s)', self.name, cap, limit, reason)
+            self._condition.notify_all()
+        self._caps[limit] = cap
+        return cap
@@ -0,0 +1,161 @@
+import asyncio
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from dmoj.judge import BaseJudge, IPC, JudgeWorker, Submission, write_trace
+from dmoj.judgeenv import env
+from dmoj.utils import tracing
+
+# How often, in seconds, a submission held back by admission control checks whether it may start.
+ADMISSION_POLL_INTERVAL = 0.5
+
+
+class AsyncJudge(BaseJudge):
+    """
+    A `Judge` for asyncio services: the event loop watches each worker's pipe, so grading many submissions at once
+    doesn't need a thread per submission.
+    """
+
+    def __init__(self, slots: Optional[int] = None) -> None:
+        super().__init__(slots)
+        self._slot_semaphore = asyncio.Semaphore(self.slots)
+
+    @property
+    def current_submissions(self) -> List[Submission]:
+        return [worker.submission for worker in self.current_judge_workers.values() if worker.submission]
+
+    async def grade(self, submission: Submission) -> AsyncIterator[Tuple[IPC, tuple]]:
+        """
+        Grades `submission`, yielding each IPC event as the worker sends it.
+
+        Cancelling the task consuming this iterator (or closing it early) aborts the submission; its slot is freed in
+        the background once the worker has wound down.
+        """
+        if submission.id in self.current_judge_workers:
+            raise ValueError(f'submission {submission.id} is already being graded')
+
+        loop = asyncio.get_running_loop()
+        cache_key, cached_events = await loop.run_in_executor(None, self._prepare_grading, submission)
+        if cached_events is not None:
+            for event in cached_events:
+                yield event
+            return
+
+        tracer = tracing.Tracer(f'Judge grading {submission.id}') if env.trace_dir else None
+        with tracing.span_of(tracer, 'waiting for a grading slot'):
+            await self._slot_semaphore.acquire()
+            try:
+                while not self.admission.try_acquire():
+                    await asyncio.sleep(ADMISSION_POLL_INTERVAL)
+            except BaseException:
+                self._slot_semaphore.release()
+                raise
+        with tracing.span_of(tracer, 'acquiring worker'):
+            try:
+                worker = self._worker_pool.acquire()
+            except BaseException:
+                self.admission.release()
+                self._slot_semaphore.release()
+                raise
+        self.current_judge_workers[submission.id] = worker
+        finished = False
+        graded_events: List[Tuple[IPC, tuple]] = []
+        try:
+            worker.start_grading(submission, self.failure_history)
+            with self._watch(worker) as readable, tracing.span_of(tracer, 'grading'):
+                while True:
+                    event = await self._recv(worker, readable)
+                    if event is None:
+                        break
+                    if event[0] not in (IPC.HELLO, IPC.HEARTBEAT, IPC.TRACE):
+                        if cache_key is not None:
+                            graded_events.append(event)
+                        yield event
+            finished = True
+            if tracer is not None:
+                write_trace(tracer, submission, worker)
+            await loop.run_in_executor(None, self._finish_grading, submission, cache_key, graded_events)
+        finally:
+            if finished or not worker.is_alive():
+                self._release(submission, worker)
+            else:
+                worker.request_abort_grading()
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    # Finalized outside of the event loop, so there is nothing to hand the cleanup to.
+                    self._drain_and_release_blocking(submission, worker)
+                else:
+                    loop.create_task(self._drain_and_release(submission, worker))
+
+    def abort_grading(self, submission_id: Optional[int] = None) -> None:
+        """
+        Asks the given submission, or every submission if no id is given, to stop grading. Their `grade` iterators
+        finish with GRADING-ABORTED shortly after.
+        """
+        if submission_id is None:
+            workers = list(self.current_judge_workers.values())
+        elif submission_id in self.current_judge_workers:
+            workers = [self.current_judge_workers[submission_id]]
+        else:
+            workers = []
+        for worker in workers:
+            worker.request_abort_grading()
+
+    @contextmanager
+    def _watch(self, worker: JudgeWorker) -> Iterator[asyncio.Event]:
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        fd = worker.worker_process_conn.fileno()
+        loop.add_reader(fd, readable.set)
+        try:
+            yield readable
+        finally:
+            loop.remove_reader(fd)
+
+    async def _recv(self, worker: JudgeWorker, readable: asyncio.Event) -> Optional[Tuple[IPC, tuple]]:
+        while not worker.poll():
+            readable.clear()
+            # Data may have arrived between the poll and the clear.
+            if worker.poll():
+                break
+            # Not wait_for: before Python 3.12, it drops a cancellation that races with the pipe becoming readable.
+            waiter = asyncio.ensure_future(readable.wait())
+            try:
+                done, _ = await asyncio.wait({waiter}, timeout=worker.recv_timeout)
+            finally:
+                waiter.cancel()
+            if not done:
+                worker.kill_unresponsive()
+        return worker.recv()
+
+    async def _drain(self, worker: JudgeWorker) -> None:
+        with self._watch(worker) as readable:
+            while await self._recv(worker, readable) is not None:
+                pass
+
+    async def _drain_and_release(self, submission: Submission, worker: JudgeWorker) -> None:
+        try:
+            await asyncio.wait_for(self._drain(worker), env.worker_abort_timeout)
+        except asyncio.TimeoutError:
+            print("Worker still busy, forcing kill...")
+            worker.kill()
+        except (EOFError, OSError, TimeoutError):
+            pass
+        finally:
+            self._release(submission, worker)
+
+    def _drain_and_release_blocking(self, submission: Submission, worker: JudgeWorker) -> None:
+        try:
+            for _ in worker.communicate():
+                pass
+        except (EOFError, OSError, TimeoutError):
+            pass
+        finally:
+            self._release(submission, worker)
+
+    def _release(self, submission: Submission, worker: JudgeWorker) -> None:
+        self.current_judge_workers.pop(submission.id, None)
+        self._worker_pool.release(worker)
+        self.admission.release()
+        self._slot_semaphore.release()
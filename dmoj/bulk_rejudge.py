@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, List, Optional, Set, Tuple
+
+from dmoj.judge import IPC, Judge, Submission
+from dmoj.problem import Problem
+
+Events = List[Tuple[IPC, tuple]]
+# Called with how many submissions are done, how many there are in all, and the submission just done with its events.
+ProgressCallback = Callable[[int, int, Submission, Events], None]
+
+
+def print_progress(done: int, total: int, submission: Submission, events: Events) -> None:
+    print(f"Rejudged {submission.problem_id}/{submission.id} ({done}/{total})")
+
+
+class BulkRejudge:
+    """
+    Rejudges many submissions to one problem in one go, through `judge`: every submission waits for one of its
+    grading slots, admission control included, like any other, and is answered from its result cache if it can be.
+
+    The problem's init.yml, archive and test data, generated cases included, are loaded once, and the workers the judge
+    forks meanwhile inherit them instead of loading them for each submission. Submissions sharing their source,
+    language, limits and meta are graded only once, and all of them get the outcome.
+    """
+
+    def __init__(self, judge: Judge) -> None:
+        self.judge = judge
+        self._lock = threading.Lock()
+        self._aborted = False
+        self._grading: Set[int] = set()
+
+    def rejudge(
+        self, submissions: List[Submission], on_progress: Optional[ProgressCallback] = print_progress
+    ) -> Dict[int, Events]:
+        """
+        Grades `submissions`, which must all be to the same problem, returning every IPC event each of them produced,
+        by submission id. `on_progress` is called as each submission is done.
+        """
+        if not submissions:
+            return {}
+        if len({submission.problem_id for submission in submissions}) > 1:
+            raise ValueError('bulk rejudges are limited to one problem')
+
+        duplicates: Dict[tuple, List[Submission]] = {}
+        for submission in submissions:
+            duplicates.setdefault(self._dedupe_key(submission), []).append(submission)
+        print(
+            f"Rejudging {len(submissions)} submissions to {submissions[0].problem_id}, "
+            f"{len(duplicates)} of them distinct..."
+        )
+
+        problem = self._load_problem(submissions[0])
+        preloaded: ContextManager[None] = self.judge.preloaded(problem) if problem is not None else nullcontext()
+        pending: 'queue.Queue[List[Submission]]' = queue.Queue()
+        for group in duplicates.values():
+            pending.put(group)
+
+        outcomes: Dict[int, Events] = {}
+        total = len(submissions)
+
+        def report(group: List[Submission], events: Events) -> None:
+            with self._lock:
+                for submission in group:
+                    outcomes[submission.id] = events
+                    if on_progress is not None:
+                        on_progress(len(outcomes), total, submission, events)
+
+        with preloaded:
+            threads = [
+                threading.Thread(target=self._grading_thread_main, args=(pending, report), daemon=True)
+                for _ in range(min(self.judge.slots, len(duplicates)))
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return outcomes
+
+    def abort(self) -> None:
+        """Aborts the submissions being graded, and drops those that haven't started yet."""
+        with self._lock:
+            self._aborted = True
+            submission_ids = list(self._grading)
+        for submission_id in submission_ids:
+            self.judge.abort_grading(submission_id)
+
+    @staticmethod
+    def _dedupe_key(submission: Submission) -> tuple:
+        return (
+            submission.language,
+            submission.source,
+            submission.time_limit,
+            submission.memory_limit,
+            submission.short_circuit,
+            repr(sorted(submission.meta.items())),
+        )
+
+    @staticmethod
+    def _load_problem(submission: Submission) -> Optional[Problem]:
+        started = time.monotonic()
+        try:
+            problem = Problem(submission.problem_id, submission.time_limit, submission.memory_limit, submission.meta)
+            problem.preload()
+        except Exception as e:
+            # Every submission will then load the problem itself, and report whatever is wrong with it.
+            print(f"Failed to preload {submission.problem_id}: {e!r}")
+            return None
+        print(f"Preloaded {submission.problem_id} in {time.monotonic() - started:.2f}s.")
+        return problem
+
+    def _grading_thread_main(
+        self, pending: 'queue.Queue[List[Submission]]', report: Callable[[List[Submission], Events], None]
+    ) -> None:
+        while True:
+            try:
+                group = pending.get_nowait()
+            except queue.Empty:
+                return
+            report(group, self._grade(group[0]))
+
+    def _grade(self, submission: Submission) -> Events:
+        self.judge.acquire_slot()
+        with self._lock:
+            if self._aborted:
+                self.judge.release_slot()
+                return [(IPC.GRADING_ABORTED, ())]
+            self._grading.add(submission.id)
+        try:
+            return list(self.judge.grade(submission, slot_acquired=True))
+        except Exception as e:
+            return [(IPC.UNHANDLED_EXCEPTION, (repr(e),))]
+        finally:
+            with self._lock:
+                self._grading.discard(submission.id)
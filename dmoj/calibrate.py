@@ -0,0 +1,212 @@
+import math
+import multiprocessing
+import os
+import resource
+import statistics
+import subprocess
+import tempfile
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import yaml
+
+from dmoj.executors import executors
+from dmoj.executors.base_executor import BaseExecutor
+from dmoj.problem import BatchedTestCase, Problem, TestCase
+from dmoj.result import CheckerResult, Result
+from dmoj.utils.unicode import utf8bytes
+
+# One run of a solution on a case: the solution's index, the case's index, its CPU time and its verdict.
+Run = NamedTuple('Run', [('solution', int), ('case', int), ('time', float), ('verdict', str)])
+Solution = NamedTuple('Solution', [('name', str), ('language', str), ('source', str)])
+# Called with how many runs are done, and how many there are in all.
+ProgressCallback = Callable[[int, int], None]
+
+# The calibrator whose runs the processes of the pool do; inherited by them when they are forked.
+_calibrator: Optional['TimeLimitCalibrator'] = None
+
+
+def _set_up_process(calibrator: 'TimeLimitCalibrator', cores: 'multiprocessing.Queue[int]') -> None:
+    global _calibrator
+    _calibrator = calibrator
+    core = cores.get()
+    if hasattr(os, 'sched_setaffinity'):
+        # Everything this process launches stays on its core too, so that runs don't disturb each other.
+        os.sched_setaffinity(0, {core})
+
+
+def _run_task(task: Tuple[int, int]) -> Run:
+    assert _calibrator is not None
+    return _calibrator.run_once(*task)
+
+
+def _children_cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class TimeLimitCalibrator:
+    """
+    Proposes a time limit for a problem from the CPU time its reference solutions take on every case.
+
+    Every solution is compiled once and the problem's data, generated cases included, is loaded once; `processes`
+    worker processes, one per available core by default, are then forked and each pinned to a core of its own, and
+    run each solution on each case `repetitions` times. The time limit proposed is the median time of the slowest
+    solution on its slowest case, times `factor`, rounded up to the next tenth of a second.
+    """
+
+    def __init__(
+        self,
+        problem_id: str,
+        solutions: List[Solution],
+        repetitions: int = 5,
+        factor: float = 2.0,
+        time_limit: float = 10.0,
+        memory_limit: int = 262144,
+        processes: Optional[int] = None,
+    ) -> None:
+        self.problem = Problem(problem_id, time_limit, memory_limit, {})
+        self.problem.preload()
+        self.cases: List[TestCase] = []
+        for case in self.problem.cases():
+            self.cases.extend(case.batched_cases if isinstance(case, BatchedTestCase) else [case])  # type: ignore
+        self.solutions = solutions
+        self.repetitions = repetitions
+        self.factor = factor
+        self.cores = sorted(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else []
+        self.processes = processes or len(self.cores) or multiprocessing.cpu_count()
+        self.binaries = [self._compile_solution(solution) for solution in solutions]
+
+    def run(self, on_progress: Optional[ProgressCallback] = None) -> List[Run]:
+        tasks = [
+            (solution, case)
+            for _ in range(self.repetitions)
+            for solution in range(len(self.solutions))
+            for case in range(len(self.cases))
+        ]
+        cores: 'multiprocessing.Queue[int]' = multiprocessing.Queue()
+        for process in range(self.processes):
+            cores.put(self.cores[process % len(self.cores)] if self.cores else process)
+
+        runs: List[Run] = []
+        with multiprocessing.Pool(self.processes, initializer=_set_up_process, initargs=(self, cores)) as pool:
+            for run in pool.imap_unordered(_run_task, tasks):
+                runs.append(run)
+                if on_progress is not None:
+                    on_progress(len(runs), len(tasks))
+        return runs
+
+    def run_once(self, solution: int, case_index: int) -> Run:
+        binary = self.binaries[solution]
+        case = self.cases[case_index]
+        result = Result(case)
+        wall_time = case.config.wall_time_factor * self.problem.time_limit
+
+        # A process of the pool runs one solution at a time, so the CPU time its reaped children gained is the run's.
+        started = _children_cpu_time()
+        # `launch` waits for the process itself, so the input has to be there from the start, as the graders do it.
+        with tempfile.TemporaryFile() as input_file:
+            input_file.write(case.input_data())
+            input_file.seek(0)
+            proc = binary.launch(
+                time=self.problem.time_limit,
+                memory=self.problem.memory_limit,
+                symlinks=case.config.symlinks,
+                stdin=input_file,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                wall_time=wall_time,
+            )
+        try:
+            result.proc_output, error = proc.communicate(None, timeout=wall_time)
+        except subprocess.TimeoutExpired:
+            error = b''
+            proc.kill()
+            result.result_flag |= Result.TLE
+        finally:
+            proc.wait()
+        binary.populate_result(error, result, proc)
+        result.execution_time = _children_cpu_time() - started
+
+        if not result.result_flag:
+            check = case.checker()(
+                result.proc_output,
+                case.output_data(),
+                submission_source=utf8bytes(self.solutions[solution].source),
+                judge_input=lambda: case.input_data(),
+                point_value=case.points,
+                case_position=case.position,
+                batch=case.batch,
+                submission_language=self.solutions[solution].language,
+                binary_data=case.has_binary_data,
+                execution_time=result.execution_time,
+                problem_id=self.problem.id,
+                case=case,
+                result=result,
+            )
+            if not (check.passed if isinstance(check, CheckerResult) else check):
+                result.result_flag |= Result.WA
+        return Run(solution, case_index, result.execution_time, result.readable_codes()[0])
+
+    def report(self, runs: List[Run]) -> dict:
+        """Summarizes `runs` per solution and case, along with the time limit proposed."""
+        times: Dict[Tuple[int, int], List[float]] = {}
+        verdicts: Dict[Tuple[int, int], List[str]] = {}
+        for run in runs:
+            times.setdefault((run.solution, run.case), []).append(run.time)
+            verdicts.setdefault((run.solution, run.case), []).append(run.verdict)
+
+        solutions = []
+        slowest = 0.0
+        for solution_index, solution in enumerate(self.solutions):
+            cases = []
+            for case_index, case in enumerate(self.cases):
+                case_times = sorted(times.get((solution_index, case_index), []))
+                if not case_times:
+                    continue
+                median = statistics.median(case_times)
+                slowest = max(slowest, median)
+                cases.append(
+                    {
+                        'case': case_index + 1,
+                        'input': case.config['in'],
+                        'min': round(case_times[0], 3),
+                        'median': round(median, 3),
+                        'max': round(case_times[-1], 3),
+                        'times': [round(time, 3) for time in case_times],
+                        'verdicts': sorted(set(verdicts[solution_index, case_index])),
+                    }
+                )
+            slowest_case = max(cases, key=lambda case: case['median']) if cases else None
+            solutions.append(
+                {
+                    'name': solution.name,
+                    'language': solution.language,
+                    'slowest_case': slowest_case['case'] if slowest_case else None,
+                    'slowest_median': slowest_case['median'] if slowest_case else None,
+                    'failed_cases': [case['case'] for case in cases if case['verdicts'] != ['AC']],
+                    'cases': cases,
+                }
+            )
+
+        return {
+            'problem': self.problem.id,
+            'repetitions': self.repetitions,
+            'factor': self.factor,
+            'proposed_time_limit': max(0.1, math.ceil(slowest * self.factor * 10) / 10),
+            'solutions': solutions,
+        }
+
+    def write_report(self, report: dict) -> str:
+        """Writes `report` next to the problem's init.yml, returning its path."""
+        path = os.path.join(self.problem.root_dir, 'calibration.yml')
+        with open(path, 'w') as report_file:
+            yaml.safe_dump(report, report_file, default_flow_style=None, sort_keys=False)
+        return path
+
+    def _compile_solution(self, solution: Solution) -> BaseExecutor:
+        return executors[solution.language].Executor(
+            self.problem.id,
+            utf8bytes(solution.source),
+            hints=self.problem.config.hints or [],
+            unbuffered=self.problem.config.unbuffered,
+        )
@@ -6,6 +6,7 @@ from dmoj.contrib import contrib_modules
 from dmoj.error import InternalError
 from dmoj.judgeenv import env, get_problem_root
 from dmoj.result import CheckerResult
+from dmoj.utils import tracing
 from dmoj.utils.helper_files import compile_with_auxiliary_files, mktemp
 from dmoj.utils.unicode import utf8text
 
@@ -48,15 +49,16 @@ def check(
                 answer_file=shlex.quote(answer_file.name),
             )
         )
-        process = executor.launch(
-            *checker_args,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            memory=memory_limit,
-            time=time_limit,
-            extra_fs=[input_path],  # Thay ExactFile bằng string
-        )
-        proc_output, error = process.communicate()
+        with tracing.span('running checker process', 'checker'):
+            process = executor.launch(
+                *checker_args,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                memory=memory_limit,
+                time=time_limit,
+                extra_fs=[input_path],  # Thay ExactFile bằng string
+            )
+            proc_output, error = process.communicate()
         proc_output = utf8text(proc_output)
         return contrib_modules[type].ContribModule.parse_return_code(
             process,
@@ -1,6 +1,8 @@
 from typing import List, Type
 
 from dmoj.commands.base_command import Command, commands, register_command
+from dmoj.commands.bulk_rejudge import BulkRejudgeCommand
+from dmoj.commands.calibrate import CalibrateCommand
 from dmoj.commands.diff import DifferenceCommand
 from dmoj.commands.help import HelpCommand
 from dmoj.commands.locate import LocateCommand
@@ -9,6 +11,7 @@ from dmoj.commands.quit import QuitCommand
 from dmoj.commands.rejudge import RejudgeCommand
 from dmoj.commands.resubmit import ResubmitCommand
 from dmoj.commands.show import ShowCommand
+from dmoj.commands.stress import StressCommand
 from dmoj.commands.submissions import ListSubmissionsCommand
 from dmoj.commands.submit import SubmitCommand
 from dmoj.commands.test import TestCommand
@@ -20,6 +23,7 @@ all_commands: List[Type[Command]] = [
     SubmitCommand,
     ResubmitCommand,
     RejudgeCommand,
+    BulkRejudgeCommand,
     DifferenceCommand,
     TestCommand,
     ShowCommand,
@@ -27,4 +31,6 @@ all_commands: List[Type[Command]] = [
     HelpCommand,
     QuitCommand,
     ValidateCommand,
+    StressCommand,
+    CalibrateCommand,
 ]
@@ -0,0 +1,29 @@
+from typing import List
+
+from dmoj.bulk_rejudge import BulkRejudge
+from dmoj.commands.base_command import Command
+from dmoj.error import InvalidCommandException
+from dmoj.judge import Submission
+
+
+class BulkRejudgeCommand(Command):
+    name = 'bulk-rejudge'
+    help = 'Rejudge many submissions to one problem at once.'
+
+    def _populate_parser(self) -> None:
+        self.arg_parser.add_argument('submission_ids', type=int, nargs='+', help='ids of submissions to rejudge')
+
+    def execute(self, line: str) -> None:
+        args = self.arg_parser.parse_args(line)
+        submissions: List[Submission] = []
+        for submission_id in args.submission_ids:
+            problem_id, lang, src, tl, ml = self.get_submission_data(submission_id)
+            submissions.append(Submission(submission_id, problem_id, lang, src, tl, ml, False, {}))
+        if len({submission.problem_id for submission in submissions}) > 1:
+            raise InvalidCommandException('bulk rejudges are limited to one problem')
+
+        rejudge = BulkRejudge(self.judge)
+        try:
+            rejudge.rejudge(submissions)
+        except KeyboardInterrupt:
+            rejudge.abort()
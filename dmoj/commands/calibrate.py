@@ -0,0 +1,121 @@
+import os
+from typing import List, Optional
+
+from dmoj import executors, judgeenv
+from dmoj.calibrate import Solution, TimeLimitCalibrator
+from dmoj.commands.base_command import Command
+from dmoj.config import InvalidInitException
+from dmoj.error import CompileError, InvalidCommandException
+from dmoj.utils.ansi import print_ansi
+
+
+class CalibrateCommand(Command):
+    name = 'calibrate'
+    help = 'Proposes a time limit for a problem from the running times of its reference solutions.'
+
+    def _populate_parser(self) -> None:
+        self.arg_parser.add_argument('problem_id', help='id of problem to calibrate')
+        self.arg_parser.add_argument('source_files', nargs='+', help='paths to the reference solutions')
+        self.arg_parser.add_argument(
+            '-l', '--language', default=None, help='language of the solutions, if not told by their extensions'
+        )
+        self.arg_parser.add_argument(
+            '-n', '--repetitions', type=int, default=5, help='times to run each solution on each case (default: 5)'
+        )
+        self.arg_parser.add_argument(
+            '-j', '--processes', type=int, default=None, help='number of processes to run (default: one per core)'
+        )
+        self.arg_parser.add_argument(
+            '-f', '--factor', type=float, default=2.0, help='time limit over the slowest case time (default: 2.0)'
+        )
+        self.arg_parser.add_argument(
+            '-tl',
+            '--time-limit',
+            type=float,
+            help='time limit for each run, in seconds',
+            default=10.0,
+            metavar='<time limit>',
+        )
+        self.arg_parser.add_argument(
+            '-ml',
+            '--memory-limit',
+            type=int,
+            help='memory limit for each run, in kilobytes',
+            default=262144,
+            metavar='<memory limit>',
+        )
+
+    def get_solution(self, source_file: str, language_id: Optional[str]) -> Solution:
+        if language_id is None:
+            try:
+                language_id = executors.from_filename(source_file).Executor.name
+            except KeyError:
+                raise InvalidCommandException(f"can't tell the language of '{source_file}'")
+        if language_id not in executors.executors:
+            raise InvalidCommandException(f"unknown language '{language_id}'")
+        return Solution(os.path.basename(source_file), language_id, self.get_source(source_file))
+
+    def execute(self, line: str) -> int:
+        args = self.arg_parser.parse_args(line)
+
+        if args.problem_id not in judgeenv.get_supported_problems():
+            raise InvalidCommandException(f"unknown problem '{args.problem_id}'")
+        elif args.repetitions <= 0:
+            raise InvalidCommandException('--repetitions must be > 0')
+        elif args.factor <= 0:
+            raise InvalidCommandException('--factor must be > 0')
+        elif args.time_limit <= 0:
+            raise InvalidCommandException('--time-limit must be >= 0')
+        elif args.memory_limit <= 0:
+            raise InvalidCommandException('--memory-limit must be >= 0')
+
+        solutions: List[Solution] = [self.get_solution(file, args.language) for file in args.source_files]
+
+        try:
+            calibrator = TimeLimitCalibrator(
+                args.problem_id,
+                solutions,
+                args.repetitions,
+                args.factor,
+                args.time_limit,
+                args.memory_limit,
+                args.processes,
+            )
+        except InvalidInitException as e:
+            raise InvalidCommandException(str(e))
+        except CompileError as e:
+            print_ansi(f'#ansi[Compile error](red|bold)\n{e.message}')
+            return 1
+
+        print_ansi(
+            f'Calibrating #ansi[{args.problem_id}](cyan|bold) with {len(solutions)} solution(s), '
+            f'{len(calibrator.cases)} case(s), {args.repetitions} run(s) each, on {calibrator.processes} core(s)...'
+        )
+        try:
+            runs = calibrator.run(
+                on_progress=lambda done, total: print(f'\r{done}/{total} runs...', end='', flush=True)
+            )
+        except KeyboardInterrupt:
+            print()
+            return 1
+        print()
+
+        report = calibrator.report(runs)
+        for solution in report['solutions']:
+            print_ansi(
+                f"#ansi[{solution['name']}](|underline): slowest case {solution['slowest_case']}, "
+                f"median {solution['slowest_median']}s"
+            )
+            for case in solution['cases']:
+                colour = 'green' if case['verdicts'] == ['AC'] else 'red'
+                print_ansi(
+                    f"  case {case['case']:>3}: min {case['min']:.3f}s, median {case['median']:.3f}s, "
+                    f"max {case['max']:.3f}s #ansi[{'/'.join(case['verdicts'])}]({colour}|bold)"
+                )
+
+        path = calibrator.write_report(report)
+        failed = [solution['name'] for solution in report['solutions'] if solution['failed_cases']]
+        if failed:
+            print_ansi(f"#ansi[Not all reference solutions passed:](red|bold) {', '.join(failed)}")
+        print_ansi(f"Proposed time limit: #ansi[{report['proposed_time_limit']}s](green|bold); report saved to {path}.")
+        return 1 if failed else 0
@@ -0,0 +1,113 @@
+import random
+from typing import Optional, Tuple
+
+from dmoj import executors, judgeenv
+from dmoj.commands.base_command import Command
+from dmoj.config import InvalidInitException
+from dmoj.error import CompileError, InternalError, InvalidCommandException
+from dmoj.stress import StressTester, describe_mismatch
+from dmoj.utils.ansi import print_ansi
+
+
+class StressCommand(Command):
+    name = 'stress'
+    help = "Compares a solution against a brute force on inputs from the problem's generator."
+
+    def _populate_parser(self) -> None:
+        self.arg_parser.add_argument('problem_id', help='id of problem to stress-test')
+        self.arg_parser.add_argument('brute_file', help='path to the brute force solution')
+        self.arg_parser.add_argument('candidate_file', help='path to the solution to test')
+        self.arg_parser.add_argument(
+            '--brute-language', default=None, help='language of the brute force, if not told by its extension'
+        )
+        self.arg_parser.add_argument(
+            '--candidate-language', default=None, help='language of the solution, if not told by its extension'
+        )
+        self.arg_parser.add_argument(
+            '-n', '--iterations', type=int, default=None, help='stop after this many inputs (default: never)'
+        )
+        self.arg_parser.add_argument(
+            '-j', '--processes', type=int, default=None, help='number of processes to run (default: one per core)'
+        )
+        self.arg_parser.add_argument('--seed', type=int, default=None, help='first seed (default: random)')
+        self.arg_parser.add_argument(
+            '--case', type=int, default=None, help='case whose generator to use (default: the first generated one)'
+        )
+        self.arg_parser.add_argument(
+            '-o', '--output', default=None, help='where to save the failing input (default: <problem>.stress.in)'
+        )
+        self.arg_parser.add_argument(
+            '-tl',
+            '--time-limit',
+            type=float,
+            help='time limit for each solution, in seconds',
+            default=2.0,
+            metavar='<time limit>',
+        )
+        self.arg_parser.add_argument(
+            '-ml',
+            '--memory-limit',
+            type=int,
+            help='memory limit for each solution, in kilobytes',
+            default=262144,
+            metavar='<memory limit>',
+        )
+
+    def get_solution(self, source_file: str, language_id: Optional[str]) -> Tuple[str, str]:
+        if language_id is None:
+            try:
+                language_id = executors.from_filename(source_file).Executor.name
+            except KeyError:
+                raise InvalidCommandException(f"can't tell the language of '{source_file}'")
+        if language_id not in executors.executors:
+            raise InvalidCommandException(f"unknown language '{language_id}'")
+        return language_id, self.get_source(source_file)
+
+    def execute(self, line: str) -> int:
+        args = self.arg_parser.parse_args(line)
+
+        if args.problem_id not in judgeenv.get_supported_problems():
+            raise InvalidCommandException(f"unknown problem '{args.problem_id}'")
+        elif args.time_limit <= 0:
+            raise InvalidCommandException('--time-limit must be >= 0')
+        elif args.memory_limit <= 0:
+            raise InvalidCommandException('--memory-limit must be >= 0')
+
+        brute = self.get_solution(args.brute_file, args.brute_language)
+        candidate = self.get_solution(args.candidate_file, args.candidate_language)
+        first_seed = args.seed if args.seed is not None else random.randrange(1 << 31)
+
+        try:
+            tester = StressTester(
+                args.problem_id, brute, candidate, args.time_limit, args.memory_limit, args.case, args.processes
+            )
+        except (ValueError, InvalidInitException) as e:
+            raise InvalidCommandException(str(e))
+        except CompileError as e:
+            print_ansi(f'#ansi[Compile error](red|bold)\n{e.message}')
+            return 1
+
+        print_ansi(f'Stress-testing #ansi[{args.problem_id}](cyan|bold) from seed {first_seed}...')
+        try:
+            iterations, mismatch = tester.run(
+                args.iterations, first_seed, on_progress=lambda done: print(f'\r{done} inputs...', end='', flush=True)
+            )
+        except InternalError as e:
+            print()
+            print_ansi(f'#ansi[Stress test failed:](red|bold) {e}')
+            return 1
+        except KeyboardInterrupt:
+            print()
+            return 1
+        print()
+
+        if mismatch is None:
+            print_ansi(f'#ansi[No mismatch](green|bold) in {iterations} inputs.')
+            return 0
+
+        output = args.output or f'{args.problem_id}.stress.in'
+        with open(output, 'wb') as f:
+            f.write(mismatch.input)
+        print_ansi(f'#ansi[Mismatch](red|bold) after {iterations} inputs; saved the input to {output}.')
+        print(describe_mismatch(mismatch))
+        return 1
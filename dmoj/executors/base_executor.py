@@ -10,6 +10,7 @@ from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
 from dmoj.error import InternalError
 from dmoj.judgeenv import env, skip_self_test
 from dmoj.result import Result
+from dmoj.utils import cancellation
 from dmoj.utils.unicode import utf8bytes, utf8text
 
 VersionFlags = Union[str, Tuple[str, ...]]
@@ -153,6 +154,7 @@ class BaseExecutor(metaclass=ExecutorMeta):
             env=child_env,
             cwd=utf8bytes(self._dir),
         )
+        cancellation.track(process)
         
             # Gắn thuộc tính is_tle nếu có timeout
         wall_time = kwargs.get('wall_time', kwargs.get('time', None))
@@ -8,6 +8,7 @@ import pylru
 from dmoj.error import CompileError, OutputLimitExceeded
 from dmoj.executors.base_executor import BaseExecutor, ExecutorMeta
 from dmoj.judgeenv import env
+from dmoj.utils import cancellation, tracing
 from dmoj.utils.communicate import safe_communicate
 from dmoj.utils.unicode import utf8bytes
 
@@ -38,8 +39,9 @@ class _CompiledExecutorMeta(ExecutorMeta):
                     obj._dir = executor._dir
                     return obj
 
-        obj.create_files(*args, **kwargs)
-        obj.compile()
+        with tracing.span('compiling', 'executor', executor=obj.__class__.__module__):
+            obj.create_files(*args, **kwargs)
+            obj.compile()
         if is_cached:
             cls.compiled_binary_cache[cache_key] = obj
         return obj
@@ -82,12 +84,14 @@ class CompiledExecutor(BaseExecutor, metaclass=_CompiledExecutorMeta):
         assert self._dir is not None
         env['TMPDIR'] = self._dir
 
-        return subprocess.Popen(
-            [utf8bytes(a) for a in args],
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=env,
-            cwd=utf8bytes(self._dir),
+        return cancellation.track(
+            subprocess.Popen(
+                [utf8bytes(a) for a in args],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env,
+                cwd=utf8bytes(self._dir),
+            )
         )
 
     def get_compile_output(self, process: subprocess.Popen) -> bytes:
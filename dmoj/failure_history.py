@@ -0,0 +1,42 @@
+import threading
+from typing import Dict, TYPE_CHECKING, Tuple
+
+from dmoj.judgeenv import env
+
+if TYPE_CHECKING:
+    from dmoj.judge import Submission
+
+
+class FailureHistory:
+    """
+    Remembers, for every problem, which cases most often turn out to be the first one a submission fails.
+
+    Workers use this under short-circuiting to try the likeliest culprits of a batch first. Older failures count for
+    less and less, so the ordering follows changes to the problem's data.
+    """
+
+    # Weight left to all earlier failures of a problem each time a new one is recorded.
+    DECAY = 0.95
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._scores: Dict[Tuple[str, bool], Dict[int, float]] = {}
+
+    @staticmethod
+    def _key(submission: 'Submission') -> Tuple[str, bool]:
+        # Pretest runs number their cases differently.
+        return submission.problem_id, bool(submission.meta.get('pretests_only'))
+
+    def record_first_failure(self, submission: 'Submission', case_number: int) -> None:
+        with self._lock:
+            scores = self._scores.setdefault(self._key(submission), {})
+            for other_case in scores:
+                scores[other_case] *= self.DECAY
+            scores[case_number] = scores.get(case_number, 0.0) + 1
+
+    def hints(self, submission: 'Submission') -> Dict[int, float]:
+        """Returns how likely each case number is to fail first; the higher the score, the likelier."""
+        if not env.fail_fast_case_ordering:
+            return {}
+        with self._lock:
+            return dict(self._scores.get(self._key(submission), {}))
@@ -1,5 +1,6 @@
 import subprocess
-from typing import Optional, TYPE_CHECKING
+import threading
+from typing import Dict, Optional, TYPE_CHECKING
 
 from dmoj.executors.base_executor import BaseExecutor
 from dmoj.problem import Problem, TestCase
@@ -15,27 +16,58 @@ class BaseGrader:
     problem: Problem
     judge: 'JudgeWorker'
     binary: BaseExecutor
-    _current_proc: Optional[subprocess.Popen]
+    # Graders that keep no per-case state on `self` can grade several cases at once from different threads.
+    supports_parallel_cases = False
+    # Graders that split `grade` into `run_case` and `check_case` can check a case while the next one runs.
+    supports_pipelined_checking = False
 
     def __init__(self, judge: 'JudgeWorker', problem: Problem, language: str, source: bytes) -> None:
         self.source = utf8bytes(source)
         self.language = language
         self.problem = problem
         self.judge = judge
+        self._running_procs: Dict[int, subprocess.Popen] = {}
         self.binary = self._generate_binary()
         self._abort_requested = False
-        self._current_proc = None
+
+    @property
+    def _current_proc(self) -> Optional[subprocess.Popen]:
+        return self._running_procs.get(threading.get_ident())
+
+    @_current_proc.setter
+    def _current_proc(self, proc: Optional[subprocess.Popen]) -> None:
+        if proc is None:
+            self._running_procs.pop(threading.get_ident(), None)
+        else:
+            self._running_procs[threading.get_ident()] = proc
 
     def grade(self, case: TestCase) -> Result:
         raise NotImplementedError
 
+    def run_case(self, case: TestCase) -> Result:
+        raise NotImplementedError
+
+    def check_case(self, case: TestCase, result: Result) -> Result:
+        raise NotImplementedError
+
     def _generate_binary(self) -> BaseExecutor:
         raise NotImplementedError
 
+    @classmethod
+    def warm_up(cls, problem: Problem) -> None:
+        """Compiles the helper programs, other than the submission, that grading `problem` needs."""
+        pass
+
     def abort_grading(self) -> None:
         self._abort_requested = True
-        if self._current_proc:
+        for thread_ident in list(self._running_procs):
+            self.abort_case(thread_ident)
+
+    def abort_case(self, thread_ident: int) -> None:
+        """Kills the process launched for the case being graded on the given thread, if any."""
+        proc = self._running_procs.get(thread_ident)
+        if proc:
             try:
-                self._current_proc.kill()
+                proc.kill()
             except OSError:
-                pass
\ No newline at end of file
+                pass
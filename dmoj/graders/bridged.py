@@ -19,6 +19,9 @@ if TYPE_CHECKING:
     from dmoj.judge import JudgeWorker
 
 class BridgedInteractiveGrader(StandardGrader):
+    supports_parallel_cases = False
+    supports_pipelined_checking = False
+    supports_tle_recheck = False
     handler_data: ConfigNode
     interactor_binary: BaseExecutor
     contrib_type: str
@@ -53,13 +56,13 @@ class BridgedInteractiveGrader(StandardGrader):
         self._interactor_stdin_pipe, submission_stdout_pipe = os.pipe()
         submission_stdin_pipe, self._interactor_stdout_pipe = os.pipe()
         self._current_proc = self.binary.launch(
-            time=self.problem.time_limit,
+            time=self.time_limit,
             memory=self.problem.memory_limit,
             symlinks=case.config.symlinks,
             stdin=submission_stdin_pipe,
             stdout=submission_stdout_pipe,
             stderr=subprocess.PIPE,
-            wall_time=case.config.wall_time_factor * self.problem.time_limit,
+            wall_time=case.config.wall_time_factor * self.time_limit,
         )
         os.close(submission_stdin_pipe)
         os.close(submission_stdout_pipe)
@@ -68,7 +71,7 @@ class BridgedInteractiveGrader(StandardGrader):
         assert self._current_proc is not None
         assert self._current_proc.stderr is not None
         judge_output = case.output_data()
-        self._interactor_time_limit = (self.handler_data.preprocessing_time or 2) + self.problem.time_limit
+        self._interactor_time_limit = (self.handler_data.preprocessing_time or 2) + self.time_limit
         self._interactor_memory_limit = self.handler_data.memory_limit or env['generator_memory_limit']
         args_format_string = (
             self.handler_data.args_format_string
@@ -98,17 +101,26 @@ class BridgedInteractiveGrader(StandardGrader):
             self._interactor.wait()
             return self._current_proc.stderr.read()
 
+    @classmethod
+    def warm_up(cls, problem: Problem) -> None:
+        cls._compile_interactor(problem)
+
     def _generate_interactor_binary(self) -> BaseExecutor:
-        files = self.handler_data.files
+        return self._compile_interactor(self.problem)
+
+    @staticmethod
+    def _compile_interactor(problem: Problem) -> BaseExecutor:
+        handler_data = problem.config.interactive
+        files = handler_data.files
         if isinstance(files, str):
             filenames = [files]
         elif isinstance(files.unwrap(), list):
             filenames = list(files.unwrap())
-        problem_root = get_problem_root(self.problem.id)
+        problem_root = get_problem_root(problem.id)
         assert problem_root is not None
         filenames = [os.path.join(problem_root, f) for f in filenames]
-        flags = self.handler_data.get('flags', [])
-        unbuffered = self.handler_data.get('unbuffered', True)
+        flags = handler_data.get('flags', [])
+        unbuffered = handler_data.get('unbuffered', True)
         return compile_with_auxiliary_files(
-            filenames, flags, self.handler_data.lang, self.handler_data.compiler_time_limit, unbuffered
+            filenames, flags, handler_data.lang, handler_data.compiler_time_limit, unbuffered
         )
\ No newline at end of file
@@ -91,6 +91,9 @@ class Interactor:
         self.process.stdin.close()
 
 class InteractiveGrader(StandardGrader):
+    supports_parallel_cases = False
+    supports_pipelined_checking = False
+    supports_tle_recheck = False
     check: CheckerOutput
 
     def _launch_process(self, case, input_file=None):
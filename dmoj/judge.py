@@ -1,13 +1,32 @@
+import copy
+import hashlib
+import itertools
 import multiprocessing
+import os
+import pickle
+import queue
 import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
 from enum import Enum
-from typing import Generator, List, NamedTuple, Optional, Tuple
+from typing import Deque, Dict, Generator, Iterator, List, NamedTuple, NoReturn, Optional, Set, Tuple, cast
 
+from dmoj import speed
+from dmoj.admission import AdmissionController
+from dmoj.config import ConfigNode
 from dmoj.error import CompileError
+from dmoj.failure_history import FailureHistory
 from dmoj.judgeenv import clear_problem_dirs_cache, env, get_supported_problems_and_mtimes
 from dmoj.problem import BaseTestCase, BatchedTestCase, Problem, TestCase
 from dmoj.result import Result
+from dmoj.result_cache import ResultCache
+from dmoj.utils import cancellation, ipc_frames, shared_payload, tracing
+from dmoj.utils.os_ext import get_rss
+from dmoj.utils.shared_payload import SharedPayload
 from dmoj.utils.unicode import utf8bytes
+from dmoj.warmup import ProblemWarmup
 
 class IPC(Enum):
     HELLO = 'HELLO'
@@ -22,8 +41,32 @@ class IPC(Enum):
     GRADING_ABORTED = 'GRADING-ABORTED'
     UNHANDLED_EXCEPTION = 'UNHANDLED_EXCEPTION'
     REQUEST_ABORT = 'REQUEST-ABORT'
+    REQUEST_GRADING = 'REQUEST-GRADING'
+    HEARTBEAT = 'HEARTBEAT'
+    TRACE = 'TRACE'
 
 IPC_TIMEOUT = 60  # seconds
+# How many input files each worker process remembers the hash of.
+INPUT_FINGERPRINT_CACHE_SIZE = 10000
+
+# Result fields that may be large enough to be worth sending through shared memory.
+SHARED_PAYLOAD_FIELDS = ('proc_output', 'feedback', 'extended_feedback')
+
+# The messages sent often enough to be worth packing into binary frames instead of pickling one by one.
+FRAME_RECORD_KINDS = {
+    IPC.RESULT: ipc_frames.RESULT,
+    IPC.BATCH_BEGIN: ipc_frames.BATCH_BEGIN,
+    IPC.BATCH_END: ipc_frames.BATCH_END,
+}
+FRAME_RECORD_TYPES = {kind: ipc_type for ipc_type, kind in FRAME_RECORD_KINDS.items()}
+
+# What one thread of a worker is busy with, as reported in its heartbeats: the phase (compiling, generating, running
+# or checking), the case number it concerns if any, how many seconds it has been at it, and how many seconds it may
+# take at most, if that is known.
+PhaseReport = Tuple[str, Optional[int], float, Optional[float]]
+
+# Shared by every submission a worker process grades, so that cap changes are logged once, not once per submission.
+_case_admission = AdmissionController('parallel cases')
 
 Submission = NamedTuple(
     'Submission',
@@ -39,103 +82,498 @@ Submission = NamedTuple(
     ],
 )
 
-class Judge:
-    def __init__(self):
-        self.current_judge_worker: Optional[JudgeWorker] = None
-        self._grading_lock = threading.Lock()
+FlattenedCases = List[Tuple[Optional[int], BaseTestCase]]
 
-    @property
-    def current_submission(self):
-        worker = self.current_judge_worker
+
+def flatten_cases(cases: List[BaseTestCase]) -> Tuple[FlattenedCases, Dict[int, BatchedTestCase]]:
+    """
+    Lists every case to grade along with the number of its batch, if any, and returns the batches by number.
+    """
+    flattened_cases: FlattenedCases = []
+    batches: Dict[int, BatchedTestCase] = {}
+    batch_number = 0
+    for case in cases:
+        if isinstance(case, BatchedTestCase):
+            batch_number += 1
+            batches[batch_number] = case
+            for batched_case in case.batched_cases:
+                flattened_cases.append((batch_number, batched_case))
+        else:
+            flattened_cases.append((None, case))
+    return flattened_cases, batches
+
+
+def shard_case_numbers(flattened_cases: FlattenedCases, shard: int, shards: int) -> List[int]:
+    """
+    Returns the numbers of the cases shard `shard` of `shards` grades. Batches are never split up, and batches and
+    cases outside batches are dealt out round-robin, so that the heavy cases usually found at the end are spread out.
+    """
+    case_numbers = []
+    units = itertools.groupby(enumerate(flattened_cases, 1), key=lambda item: item[1][0] or ('case', item[0]))
+    for unit_index, (_, unit) in enumerate(units):
+        if unit_index % shards == shard:
+            case_numbers.extend(case_number for case_number, _ in unit)
+    return case_numbers
+
+
+def write_trace(tracer: tracing.Tracer, submission: Submission, worker: 'JudgeWorker') -> None:
+    """Saves what `tracer` recorded, along with the spans of the worker that graded `submission`, under `trace_dir`."""
+    tracer.add_events(worker.trace_events)
+    path = os.path.join(env.trace_dir, f'{submission.problem_id}-{submission.id}.json')
+    try:
+        tracer.write(path)
+    except OSError as e:
+        print(f"Failed to write the trace of {submission.problem_id}/{submission.id}: {e!r}")
+    else:
+        print(f"Wrote the trace of {submission.problem_id}/{submission.id} to {path}.")
+
+
+# Hashes of the problem files read as case input, by path (and archive member) as of their size and mtime.
+_input_fingerprints: 'OrderedDict[tuple, bytes]' = OrderedDict()
+
+
+def _input_fingerprint(problem: Problem, name: str) -> Optional[bytes]:
+    """
+    Returns a hash of the content of the problem file `name`, read from the problem's directory or its archive, as
+    `ProblemDataManager` does; each file is only hashed again once it changes.
+    """
+    path = os.path.join(problem.root_dir, name)
+    try:
+        stat = os.stat(path)
+        key: tuple = (path,)
+    except OSError:
+        archive = problem.problem_data.archive
+        if archive is None or archive.filename is None:
+            return None
+        try:
+            stat = os.stat(archive.filename)
+        except OSError:
+            return None
+        key = (archive.filename, name)
+    key += (stat.st_size, stat.st_mtime_ns)
+
+    fingerprint = _input_fingerprints.get(key)
+    if fingerprint is not None:
+        _input_fingerprints.move_to_end(key)
+        return fingerprint
+    try:
+        fingerprint = hashlib.sha256(problem.problem_data[name]).digest()
+    except (KeyError, OSError):
+        return None
+    _input_fingerprints[key] = fingerprint
+    if len(_input_fingerprints) > INPUT_FINGERPRINT_CACHE_SIZE:
+        _input_fingerprints.popitem(last=False)
+    return fingerprint
+
+
+class BaseJudge:
+    """
+    What `Judge` and `AsyncJudge` share: the grading slots and their admission control, the pool of warm workers,
+    the failure history, the result cache and the problem warmup, and what is done for a submission before and after
+    it is graded. Subclasses do the grading itself, each waiting for slots its own way.
+    """
+
+    def __init__(self, slots: Optional[int] = None) -> None:
+        self.slots = slots or env.grading_slots or multiprocessing.cpu_count()
+        self.current_judge_workers: Dict[int, JudgeWorker] = {}
+        # Keeps some of the slots idle while the machine is loaded, when `admission_control` is on.
+        self.admission = AdmissionController('grading slots', self.slots)
+        # Before any worker is forked, so that they all inherit the speed factor.
+        speed.calibrate()
+        self._worker_pool = JudgeWorkerPool(self.slots)
+        self.failure_history = FailureHistory()
+        self.result_cache = ResultCache(env.result_cache_dir) if env.result_cache_dir else None
+        self.warmup: Optional[ProblemWarmup] = None
+        if env.warmup_problems:
+            # Workers forked once the warmup is done inherit the helper binaries it compiled.
+            self.warmup = ProblemWarmup(env.warmup_history_file, on_warmed=self._worker_pool.refresh)
+            self.warmup.warm_up_in_background()
+
+    def current_submission(self, submission_id: int) -> Optional[Submission]:
+        worker = self.current_judge_workers.get(submission_id)
         return worker.submission if worker else None
 
+    def update_problems(self) -> None:
+        """
+        Picks up changes to the problems on disk, dropping the cached results of every problem whose data changed,
+        replacing the workers forked before, and warming the hot problems again.
+        """
+        clear_problem_dirs_cache()
+        self._worker_pool.refresh()
+        if self.result_cache is not None:
+            self.result_cache.invalidate_changed()
+        if self.warmup is not None:
+            self.warmup.warm_up_in_background()
+
+    @contextmanager
+    def preloaded(self, problem: Problem) -> Iterator[None]:
+        """
+        Has the workers forked for the duration inherit `problem`, preloaded, so that the submissions to it they grade
+        don't load it again. Afterwards, they are replaced by plain workers again.
+        """
+        self._worker_pool.preload(problem)
+        try:
+            yield
+        finally:
+            self._worker_pool.preload(None)
+
+    def close(self) -> None:
+        """Shuts down the warm worker processes and saves the submission history."""
+        self._worker_pool.close()
+        if self.warmup is not None:
+            self.warmup.save()
+
+    def _prepare_grading(self, submission: Submission) -> Tuple[Optional[str], Optional[List[Tuple[IPC, tuple]]]]:
+        """
+        Counts `submission` towards its problem's warmup, and returns its result cache key, None if its results may
+        not be cached, along with the events cached under it, if any.
+        """
+        if self.warmup is not None:
+            self.warmup.record(submission.problem_id)
+        if self.result_cache is None:
+            return None, None
+        cache_key = self.result_cache.key(submission)
+        if cache_key is None:
+            return None, None
+        cached_events = self.result_cache.get(submission, cache_key)
+        if cached_events is not None:
+            print(f"Using cached results for {submission.problem_id}/{submission.id}.")
+        return cache_key, cached_events
+
+    def _finish_grading(
+        self, submission: Submission, cache_key: Optional[str], events: List[Tuple[IPC, tuple]]
+    ) -> None:
+        """Caches the `events` `submission` was graded with under `cache_key`, if it has one."""
+        if cache_key is not None and self.result_cache is not None:
+            self.result_cache.put(submission, cache_key, events)
+
+
+class Judge(BaseJudge):
+    def __init__(self, slots: Optional[int] = None) -> None:
+        super().__init__(slots)
+        self._workers_lock = threading.Lock()
+        self._slot_semaphore = threading.BoundedSemaphore(self.slots)
+
+    @property
+    def current_submissions(self) -> List[Submission]:
+        with self._workers_lock:
+            return [worker.submission for worker in self.current_judge_workers.values()]
+
     def begin_grading(self, submission: Submission) -> list:
-        self._grading_lock.acquire()
-        assert self.current_judge_worker is None
+        """
+        Grades `submission` to completion, returning every `(batch, case, Result)` it produced.
+        """
+        return [data for ipc_type, data in self.grade(submission) if ipc_type == IPC.RESULT]
 
-        print(f"Start grading {submission.problem_id}/{submission.id} in {submission.language}...")
-        self.current_judge_worker = JudgeWorker(submission)
+    def acquire_slot(self) -> None:
+        """
+        Blocks until one of the grading slots frees up, and takes it; every slot owns its own worker process. `grade`
+        takes a slot itself, unless it is told the caller already took one.
+        """
+        self._slot_semaphore.acquire()
+        self.admission.acquire()
 
-        ipc_ready_signal = threading.Event()
-        results = []
-        grading_thread = threading.Thread(
-            target=self._grading_thread_main, args=(ipc_ready_signal, results), daemon=True
-        )
-        grading_thread.start()
-        ipc_ready_signal.wait()
-        grading_thread.join()
+    def release_slot(self) -> None:
+        self.admission.release()
+        self._slot_semaphore.release()
+
+    def grade(self, submission: Submission, slot_acquired: bool = False) -> Generator[Tuple[IPC, tuple], None, None]:
+        """
+        Grades `submission`, yielding each IPC event as soon as the worker sends it.
+
+        Events pass through a bounded queue, so a slow consumer eventually stalls the worker instead of results piling
+        up in memory. Closing the generator early aborts the submission.
+
+        With `result_cache_dir` set, a source already graded the same way on a deterministic problem is answered from
+        the cache instead.
+
+        With `slot_acquired`, the caller took a grading slot with `acquire_slot` for the submission, which is released
+        once the submission is done, however it ends.
+        """
+        try:
+            with self._workers_lock:
+                if submission.id in self.current_judge_workers:
+                    raise ValueError(f'submission {submission.id} is already being graded')
+            cache_key, cached_events = self._prepare_grading(submission)
+            if cached_events is not None:
+                yield from cached_events
+                return
 
-        print(f"Done grading {submission.problem_id}/{submission.id}.\n")
-        self.current_judge_worker = None
-        self._grading_lock.release()
-        return results
+            tracer = tracing.Tracer(f'Judge grading {submission.id}') if env.trace_dir else None
+            if not slot_acquired:
+                with tracing.span_of(tracer, 'waiting for a grading slot'):
+                    self.acquire_slot()
+                slot_acquired = True
+            yield from self._grade_in_slot(submission, cache_key, tracer)
+        finally:
+            if slot_acquired:
+                self.release_slot()
+
+    def _grade_in_slot(
+        self, submission: Submission, cache_key: Optional[str], tracer: Optional[tracing.Tracer]
+    ) -> Generator[Tuple[IPC, tuple], None, None]:
+        try:
+            print(f"Start grading {submission.problem_id}/{submission.id} in {submission.language}...")
+            with tracing.span_of(tracer, 'acquiring worker'):
+                worker = self._worker_pool.acquire()
+            with self._workers_lock:
+                self.current_judge_workers[submission.id] = worker
+            worker.start_grading(submission, self.failure_history)
 
-    def _grading_thread_main(self, ipc_ready_signal: threading.Event, results: list) -> None:
-        assert self.current_judge_worker is not None
+            events: 'queue.Queue[Optional[Tuple[IPC, tuple]]]' = queue.Queue(maxsize=env.grading_event_queue_size)
+            grading_thread = threading.Thread(target=self._grading_thread_main, args=(worker, events), daemon=True)
+            grading_thread.start()
+            finished = False
+            graded_events: List[Tuple[IPC, tuple]] = []
+            try:
+                with tracing.span_of(tracer, 'grading'):
+                    while True:
+                        event = events.get()
+                        if event is None:
+                            finished = True
+                            break
+                        if cache_key is not None:
+                            graded_events.append(event)
+                        yield event
+            finally:
+                if not finished:
+                    # The consumer went away mid-grading; stop the worker and drain what it still sends.
+                    worker.request_abort_grading()
+                    self._drain_events(worker, events)
+                grading_thread.join()
+                if tracer is not None:
+                    write_trace(tracer, submission, worker)
 
+            self._finish_grading(submission, cache_key, graded_events)
+            print(f"Done grading {submission.problem_id}/{submission.id}.\n")
+        finally:
+            with self._workers_lock:
+                worker = self.current_judge_workers.pop(submission.id, None)
+            if worker is not None:
+                self._worker_pool.release(worker)
+
+    @staticmethod
+    def _drain_events(worker: 'JudgeWorker', events: 'queue.Queue[Optional[Tuple[IPC, tuple]]]') -> None:
+        deadline = time.monotonic() + env.worker_abort_timeout
+        while True:
+            try:
+                if events.get(timeout=max(0.0, deadline - time.monotonic())) is None:
+                    return
+            except queue.Empty:
+                print("Worker still busy, forcing kill...")
+                worker.kill()
+                break
+        while events.get() is not None:
+            pass
+
+    def _grading_thread_main(
+        self, worker: 'JudgeWorker', events: 'queue.Queue[Optional[Tuple[IPC, tuple]]]'
+    ) -> None:
+        assert worker.submission is not None
+        sub_id = worker.submission.id
         ipc_handler_dispatch = {
-            IPC.HELLO: lambda _r: ipc_ready_signal.set(),
-            IPC.COMPILE_ERROR: lambda r, msg: print(f"Compile Error: {msg}"),
-            IPC.COMPILE_MESSAGE: lambda r, msg: print(f"Compile Message: {msg}"),
-            IPC.GRADING_BEGIN: lambda r, pretest: print(f"Grading {'pretests' if pretest else 'tests'}..."),
-            IPC.GRADING_END: lambda r: print("Grading completed."),
-            IPC.GRADING_ABORTED: lambda r: print("Grading aborted."),
-            IPC.BATCH_BEGIN: lambda r, num: print(f"Batch #{num}"),
+            IPC.COMPILE_ERROR: lambda r, msg: print(f"[{sub_id}] Compile Error: {msg}"),
+            IPC.COMPILE_MESSAGE: lambda r, msg: print(f"[{sub_id}] Compile Message: {msg}"),
+            IPC.GRADING_BEGIN: lambda r, pretest: print(f"[{sub_id}] Grading {'pretests' if pretest else 'tests'}..."),
+            IPC.GRADING_END: lambda r: print(f"[{sub_id}] Grading completed."),
+            IPC.GRADING_ABORTED: lambda r: print(f"[{sub_id}] Grading aborted."),
+            IPC.BATCH_BEGIN: lambda r, num: print(f"[{sub_id}] Batch #{num}"),
             IPC.BATCH_END: lambda r, num: None,
-            IPC.RESULT: lambda r, batch, case, res: results.append((batch, case, res)),
-            IPC.UNHANDLED_EXCEPTION: lambda r, msg: print(f"Error: {msg}"),
+            IPC.RESULT: lambda r, batch, case, res: None,
+            IPC.UNHANDLED_EXCEPTION: lambda r, msg: print(f"[{sub_id}] Error: {msg}"),
         }
 
-        for ipc_type, data in self.current_judge_worker.communicate():
-            handler_func = ipc_handler_dispatch.get(ipc_type)
-            if handler_func:
-                handler_func(None, *data)
+        try:
+            for ipc_type, data in worker.communicate():
+                if ipc_type == IPC.HELLO:
+                    continue
+                handler_func = ipc_handler_dispatch.get(ipc_type)
+                if handler_func:
+                    handler_func(None, *data)
+                    events.put((ipc_type, data))
+                else:
+                    print(f"[{sub_id}] Unexpected IPC message: {ipc_type} {data}")
+        except Exception as e:
+            print(f"[{sub_id}] Error: {e!r}")
+            events.put((IPC.UNHANDLED_EXCEPTION, (repr(e),)))
+        finally:
+            events.put(None)
+
+    def abort_grading(self, submission_id: Optional[int] = None) -> None:
+        """
+        Aborts the given submission, or every submission currently being graded if no id is given.
+        """
+        with self._workers_lock:
+            if submission_id is None:
+                workers = list(self.current_judge_workers.items())
+            elif submission_id in self.current_judge_workers:
+                workers = [(submission_id, self.current_judge_workers[submission_id])]
             else:
-                print(f"Unexpected IPC message: {ipc_type} {data}")
+                workers = []
 
-    def abort_grading(self):
-        worker = self.current_judge_worker
-        if worker:
-            print(f"Aborting grading {worker.submission.id}...")
+        for sub_id, worker in workers:
+            print(f"Aborting grading {sub_id}...")
             worker.request_abort_grading()
-            worker.wait_with_timeout()
+        for _, worker in workers:
+            worker.wait_with_timeout(env.worker_abort_timeout)
+
+    def murder(self) -> None:
+        """
+        Aborts everything being graded, shuts down the warm worker processes and saves the submission history.
+        """
+        self.abort_grading()
+        self.close()
+
 
 class JudgeWorker:
-    def __init__(self, submission: Submission) -> None:
-        self.submission = submission
-        self._abort_requested = False
+    """
+    A long-lived worker process that grades one submission at a time.
+
+    The process is started eagerly, so it can sit warm in a `JudgeWorkerPool` and be handed submissions through
+    `start_grading`; each submission is framed by HELLO ... BYE on the pipe.
+
+    While grading, the worker sends a HEARTBEAT every `worker_heartbeat_interval` seconds with the phase each of its
+    threads is in. It is considered hung, and killed, once no message arrives for `worker_heartbeat_timeout` seconds
+    or a phase overruns its own time limit by as much.
+
+    A `problem` loaded ahead of time is inherited by the process and used for every submission it fits, instead of
+    loading the problem anew each time.
+    """
+
+    def __init__(self, problem: Optional[Problem] = None) -> None:
+        self.submission: Optional[Submission] = None
+        self.problem = problem
+        self.submissions_graded = 0
+        # How many times the `JudgeWorkerPool` the worker belongs to was refreshed before it was started.
+        self.pool_generation = 0
+        self.failure_history: Optional[FailureHistory] = None
+        self._failure_recorded = False
+        self._case_hints: Dict[int, float] = {}
+        # The number in the whole submission of every case this worker grades, in order.
+        self._case_numbers: List[int] = []
+        # The index of the earlier case every case that would run exactly like it duplicates, and the runs of those
+        # earlier cases, by index.
+        self._duplicate_runs: Dict[int, int] = {}
+        self._shared_run_indices: Set[int] = set()
+        self._shared_runs: Dict[int, Result] = {}
+        self.cancellation_token = cancellation.CancellationToken()
         self._sent_sigkill_to_worker_process = False
+        self._idle = threading.Event()
+        self._idle.set()
+        self._pending_events: Deque[Tuple[IPC, tuple]] = deque()
+        self.phases: List[PhaseReport] = []
+        # The spans the worker process recorded while grading the current submission, with `trace_dir` set.
+        self.trace_events: List[tracing.TraceEvent] = []
+        self._phase_stacks: Dict[int, List[Tuple[str, Optional[int], float, Optional[float]]]] = {}
+        self._phase_lock = threading.Lock()
         self.grader = None
 
+        # Names the shared payloads of the worker process, so that those never loaded can be freed once it exits.
+        self._payload_token = shared_payload.new_process_token()
         self.worker_process_conn, child_conn = multiprocessing.Pipe()
         self.worker_process = multiprocessing.Process(
-            name=f"DMOJ Judge Handler for {submission.problem_id}/{submission.id}",
+            name='DMOJ Judge Worker',
             target=self._worker_process_main,
             args=(child_conn, self.worker_process_conn),
+            daemon=True,
         )
         self.worker_process.start()
         child_conn.close()
 
+    def is_alive(self) -> bool:
+        return self.worker_process.is_alive() and not self._sent_sigkill_to_worker_process
+
+    @property
+    def rss(self) -> Optional[int]:
+        return get_rss(self.worker_process.pid) if self.worker_process.pid else None
+
+    def start_grading(self, submission: Submission, failure_history: Optional[FailureHistory] = None) -> None:
+        """
+        Hands `submission` to the worker. With a `failure_history`, the worker orders cases by it, and the first case
+        the submission fails is recorded in it.
+        """
+        self.submission = submission
+        self.failure_history = failure_history
+        self._failure_recorded = False
+        self.phases = []
+        self.trace_events = []
+        self._idle.clear()
+        hints = failure_history.hints(submission) if failure_history else {}
+        self.worker_process_conn.send((IPC.REQUEST_GRADING, (submission, hints)))
+
+    @property
+    def recv_timeout(self) -> float:
+        return env.worker_heartbeat_timeout
+
+    def poll(self, timeout: float = 0.0) -> bool:
+        """
+        Returns whether `recv` has a message ready, waiting up to `timeout` seconds for one.
+        """
+        return bool(self._pending_events) or self.worker_process_conn.poll(timeout)
+
     def communicate(self) -> Generator[Tuple[IPC, tuple], None, None]:
-        recv_timeout = max(60, int(2 * self.submission.time_limit))
-        while True:
-            if not self.worker_process_conn.poll(timeout=recv_timeout):
-                print(f"Worker timeout after {recv_timeout}s, killing...")
-                self.worker_process.kill()
-                raise TimeoutError
-            ipc_type, data = self.worker_process_conn.recv()
-            if ipc_type == IPC.BYE:
-                self.worker_process_conn.send((IPC.BYE, ()))
-                return
-            yield ipc_type, data
+        try:
+            while True:
+                if not self.poll(timeout=self.recv_timeout):
+                    self.kill_unresponsive()
+                event = self.recv()
+                if event is None:
+                    return
+                if event[0] not in (IPC.HEARTBEAT, IPC.TRACE):
+                    yield event
+        finally:
+            self._idle.set()
 
-    def wait_with_timeout(self) -> None:
-        if self.worker_process and self.worker_process.is_alive():
-            self.worker_process.join(timeout=IPC_TIMEOUT)
-            if self.worker_process.is_alive():
-                print("Worker still alive, forcing kill...")
-                self._sent_sigkill_to_worker_process = True
-                self.worker_process.kill()
+    def recv(self) -> Optional[Tuple[IPC, tuple]]:
+        """
+        Receives one message from the worker process, returning None once it is done with the current submission.
+        """
+        if not self._pending_events:
+            message = self.worker_process_conn.recv_bytes()
+            if ipc_frames.is_frame(message):
+                self._pending_events.extend(
+                    (FRAME_RECORD_TYPES[kind], data) for kind, data in ipc_frames.unpack_frame(message)
+                )
+            else:
+                self._pending_events.append(pickle.loads(message))
+
+        ipc_type, data = self._pending_events.popleft()
+        if ipc_type == IPC.BYE:
+            self.submissions_graded += 1
+            self._idle.set()
+            return None
+        if ipc_type == IPC.RESULT:
+            self._load_shared_payloads(data[2])
+            self._record_failure(data[1], data[2])
+        elif ipc_type == IPC.TRACE:
+            self.trace_events = data[0]
+        elif ipc_type == IPC.HEARTBEAT:
+            self.phases = data[0]
+            for phase, case_number, elapsed, time_limit in self.phases:
+                if time_limit is not None and elapsed > time_limit + self.recv_timeout:
+                    what = phase if case_number is None else f'{phase} case {case_number}'
+                    self.kill_unresponsive(f"Worker stuck {what} for {elapsed:.1f}s")
+        return ipc_type, data
+
+    def _record_failure(self, case_number: int, result: Result) -> None:
+        # Results arrive in case order, so the first failure reported is the first one there was.
+        if self.failure_history and not self._failure_recorded and result.result_flag & ~Result.SC:
+            self._failure_recorded = True
+            self.failure_history.record_first_failure(self.submission, case_number)
+
+    def kill(self) -> None:
+        self._sent_sigkill_to_worker_process = True
+        self.worker_process.kill()
+
+    def kill_unresponsive(self, reason: Optional[str] = None) -> NoReturn:
+        print(f"{reason or f'No heartbeat from worker for {self.recv_timeout}s'}, killing...")
+        self.kill()
+        raise TimeoutError
+
+    def wait_with_timeout(self, timeout: float = IPC_TIMEOUT) -> None:
+        if not self._idle.wait(timeout=timeout) and self.worker_process.is_alive():
+            print("Worker still busy, forcing kill...")
+            self.kill()
 
     def request_abort_grading(self) -> None:
         try:
@@ -143,85 +581,629 @@ class JudgeWorker:
         except Exception as e:
             print(f"Failed to send abort request: {e}")
 
+    def close(self) -> None:
+        if self.worker_process.is_alive():
+            try:
+                self.worker_process_conn.send((IPC.BYE, ()))
+            except OSError:
+                pass
+            self.worker_process.join(timeout=IPC_TIMEOUT)
+            if self.worker_process.is_alive():
+                self.kill()
+                self.worker_process.join()
+        self.worker_process_conn.close()
+        if self.worker_process.pid is not None:
+            # Results still in the pipe, or lost with a killed worker, were never loaded.
+            shared_payload.free_unloaded_payloads(self.worker_process.pid, self._payload_token)
+
     def _worker_process_main(self, judge_conn, worker_conn) -> None:
         worker_conn.close()
-        judge_conn.send((IPC.HELLO, ()))
+        shared_payload.set_process_token(self._payload_token)
+        submissions: 'queue.Queue[Optional[Tuple[Submission, Dict[int, float]]]]' = queue.Queue()
 
         def _ipc_recv_thread_main():
             while True:
-                ipc_type, data = judge_conn.recv()
+                try:
+                    ipc_type, data = judge_conn.recv()
+                except EOFError:
+                    ipc_type, data = IPC.BYE, ()
                 if ipc_type == IPC.BYE:
+                    submissions.put(None)
                     return
+                elif ipc_type == IPC.REQUEST_GRADING:
+                    # A fresh token before the submission is even queued, so that an abort following right on its
+                    # heels isn't lost.
+                    self.cancellation_token = cancellation.CancellationToken()
+                    submissions.put(data)
                 elif ipc_type == IPC.REQUEST_ABORT:
                     self._do_abort()
 
         ipc_recv_thread = threading.Thread(target=_ipc_recv_thread_main, daemon=True)
         ipc_recv_thread.start()
+        sender = ipc_frames.FrameCoalescer(judge_conn, self._encode_frame_record, env.ipc_coalesce_window)
+        grading = threading.Event()
+        grading_lock = threading.Lock()
+
+        def _heartbeat_thread_main():
+            while True:
+                grading.wait()
+                time.sleep(env.worker_heartbeat_interval)
+                with grading_lock:
+                    if grading.is_set():
+                        sender.send((IPC.HEARTBEAT, (self._phase_reports(),)))
+
+        threading.Thread(target=_heartbeat_thread_main, daemon=True).start()
 
+        while True:
+            request = submissions.get()
+            if request is None:
+                break
+
+            self.submission, self._case_hints = request
+            cancellation.set_current_token(self.cancellation_token)
+            if env.trace_dir:
+                tracing.start(f'Worker grading {self.submission.id}')
+            sender.send((IPC.HELLO, ()))
+            grading.set()
+            try:
+                for ipc_msg in self._grade_cases():
+                    with tracing.span('sending', 'ipc', message=ipc_msg[0].value):
+                        sender.send(ipc_msg)
+            except Exception as e:
+                if self._abort_requested:
+                    # Most likely fallout from killing whatever was running, e.g. a generator.
+                    sender.send((IPC.GRADING_ABORTED, ()))
+                else:
+                    sender.send((IPC.UNHANDLED_EXCEPTION, (str(e),)))
+            finally:
+                self.grader = None
+            tracer = tracing.stop()
+            if tracer is not None:
+                sender.send((IPC.TRACE, (tracer.events,)))
+            with grading_lock:
+                grading.clear()
+                sender.send((IPC.BYE, ()))
+
+        ipc_recv_thread.join(timeout=IPC_TIMEOUT)
+
+    @contextmanager
+    def phase(
+        self, name: str, case_number: Optional[int] = None, time_limit: Optional[float] = None
+    ) -> Iterator[None]:
+        """
+        Marks the calling thread as being in phase `name` for the heartbeats, and the trace if any, taking at most
+        `time_limit` seconds. Phases nest, and a nested phase concerns the same case as the one around it unless told
+        otherwise.
+        """
+        thread_ident = threading.get_ident()
+        with self._phase_lock:
+            stack = self._phase_stacks.setdefault(thread_ident, [])
+            if case_number is None and stack:
+                case_number = stack[-1][1]
+            stack.append((name, case_number, time.monotonic(), time_limit))
         try:
-            for ipc_msg in self._grade_cases():
-                judge_conn.send(ipc_msg)
-            judge_conn.send((IPC.BYE, ()))
-        except Exception as e:
-            judge_conn.send((IPC.UNHANDLED_EXCEPTION, (str(e),)))
-            judge_conn.send((IPC.BYE, ()))
+            with tracing.span(name, 'phase', case=case_number):
+                yield
         finally:
-            ipc_recv_thread.join(timeout=IPC_TIMEOUT)
+            with self._phase_lock:
+                stack.pop()
+                if not stack:
+                    del self._phase_stacks[thread_ident]
+
+    def _phase_reports(self) -> List[PhaseReport]:
+        now = time.monotonic()
+        with self._phase_lock:
+            return [
+                (name, case_number, now - started, time_limit)
+                for name, case_number, started, time_limit in (stack[-1] for stack in self._phase_stacks.values())
+            ]
+
+    def _load_problem(self) -> Problem:
+        submission = self.submission
+        problem = self.problem
+        if (
+            problem is not None
+            and problem.id == submission.problem_id
+            and problem.time_limit == submission.time_limit
+            and problem.memory_limit == submission.memory_limit
+            and problem.meta.unwrap() == submission.meta
+        ):
+            return problem
+        return Problem(submission.problem_id, submission.time_limit, submission.memory_limit, submission.meta)
 
     def _grade_cases(self) -> Generator[Tuple[IPC, tuple], None, None]:
-        problem = Problem(
-            self.submission.problem_id, self.submission.time_limit, self.submission.memory_limit, self.submission.meta
-        )
+        with tracing.span('loading problem'):
+            problem = self._load_problem()
 
         try:
-            self.grader = problem.grader_class(
-                self, problem, self.submission.language, utf8bytes(self.submission.source)
-            )
+            with self.phase('compiling'):
+                self.grader = problem.grader_class(
+                    self, problem, self.submission.language, utf8bytes(self.submission.source)
+                )
         except CompileError as compilation_error:
-            yield IPC.COMPILE_ERROR, (compilation_error.message,)
+            if self._abort_requested:
+                yield IPC.GRADING_ABORTED, ()
+            else:
+                yield IPC.COMPILE_ERROR, (compilation_error.message,)
             return
         else:
             warning = getattr(self.grader.binary, 'warning', None)
             if warning:
                 yield IPC.COMPILE_MESSAGE, (warning,)
 
+        if self._abort_requested:
+            yield IPC.GRADING_ABORTED, ()
+            return
+
         yield IPC.GRADING_BEGIN, (problem.run_pretests_only,)
 
-        flattened_cases: List[Tuple[Optional[int], BaseTestCase]] = []
-        batch_number = 0
-        for case in problem.cases():
-            if isinstance(case, BatchedTestCase):
-                batch_number += 1
-                for batched_case in case.batched_cases:
-                    flattened_cases.append((batch_number, batched_case))
-            else:
-                flattened_cases.append((None, case))
+        with tracing.span('resolving cases'):
+            flattened_cases, batches = flatten_cases(problem.cases())
+        # A shard of a submission graded by a `ShardCoordinator` only grades some of the cases, but still reports
+        # them by their number in the whole submission.
+        shard = self.submission.meta.get('shard')
+        if shard:
+            self._case_numbers = shard_case_numbers(flattened_cases, *shard)
+            flattened_cases = [flattened_cases[case_number - 1] for case_number in self._case_numbers]
+        else:
+            self._case_numbers = list(range(1, len(flattened_cases) + 1))
 
-        case_number = 0
-        is_short_circuiting = False
-        for batch_number, case in flattened_cases:
-            if batch_number:
-                yield IPC.BATCH_BEGIN, (batch_number,)
-            case_number += 1
+        with tracing.span('finding duplicate runs'):
+            self._duplicate_runs = self._find_duplicate_runs(problem, flattened_cases)
+        self._shared_run_indices = set(self._duplicate_runs.values())
+        self._shared_runs = {}
+
+        # The batch of every case, padded so that BATCH-BEGIN and BATCH-END are sent once per batch.
+        batch_numbers = [None] + [batch_number for batch_number, _ in flattened_cases] + [None]
+
+        parallelism = self._case_parallelism(problem)
+        if parallelism > 1:
+            results = self._grade_cases_in_parallel(flattened_cases, batches, parallelism)
+        else:
+            results = self._grade_cases_sequentially(flattened_cases, batches, self._pipelines_checking(problem))
+
+        try:
+            for position, ((batch_number, case), result) in enumerate(zip(flattened_cases, results), 1):
+                if batch_number and batch_numbers[position - 1] != batch_number:
+                    yield IPC.BATCH_BEGIN, (batch_number,)
 
-            if is_short_circuiting:
-                result = Result(case, result_flag=Result.SC)
-            else:
-                result = self.grader.grade(case)
                 if self._abort_requested:
                     yield IPC.GRADING_ABORTED, ()
                     return
-                if result.result_flag & Result.WA and self.submission.short_circuit:
-                    is_short_circuiting = True
 
-            result.proc_output = utf8bytes(result.output)
-            yield IPC.RESULT, (batch_number, case_number, result)
-            if batch_number:
-                yield IPC.BATCH_END, (batch_number,)
+                # Only the prefix the site displays ever leaves the worker.
+                result.proc_output = utf8bytes(result.output)
+                self._share_large_payloads(result)
+                yield IPC.RESULT, (batch_number, self._case_numbers[position - 1], result)
+                if batch_number and batch_numbers[position + 1] != batch_number:
+                    yield IPC.BATCH_END, (batch_number,)
+        finally:
+            results.close()
 
         yield IPC.GRADING_END, ()
 
+    def _case_parallelism(self, problem: Problem) -> int:
+        """
+        Returns how many cases of this submission may run at once: `parallel_cases` from init.yml, falling back to the
+        judge-wide setting. `true` means one case per core. Admission control lowers it while the machine is loaded.
+        """
+        if not getattr(self.grader, 'supports_parallel_cases', False):
+            return 1
+        parallel_cases = problem.config.parallel_cases
+        if parallel_cases is None:
+            parallel_cases = env.parallel_cases
+        cores = multiprocessing.cpu_count()
+        if parallel_cases is True:
+            return _case_admission.capped(cores)
+        return _case_admission.capped(max(1, min(int(parallel_cases or 1), cores)))
+
+    def _pipelines_checking(self, problem: Problem) -> bool:
+        """
+        Returns whether each case is checked while the next one runs: `pipelined_checking` from init.yml, falling
+        back to the judge-wide setting.
+        """
+        if not getattr(self.grader, 'supports_pipelined_checking', False):
+            return False
+        pipelined_checking = problem.config.pipelined_checking
+        if pipelined_checking is None:
+            pipelined_checking = env.pipelined_checking
+        return bool(pipelined_checking)
+
+    @staticmethod
+    def _skip_batch_if_doomed(batch: BatchedTestCase, failed_batches: Set[BatchedTestCase]) -> bool:
+        """
+        Called once all of `batch`'s dependencies have been graded. A batch that depends on a failed batch can't be
+        awarded any points, so it is marked as failed itself and its cases are never run.
+        """
+        if any(dependency in failed_batches for dependency in batch.dependency_batches):
+            failed_batches.add(batch)
+            return True
+        return False
+
+    def _grade_cases_sequentially(
+        self,
+        flattened_cases: List[Tuple[Optional[int], BaseTestCase]],
+        batches: Dict[int, BatchedTestCase],
+        pipelined: bool = False,
+    ) -> Generator[Result, None, None]:
+        """
+        Grades one case at a time, yielding results in case order. Under short-circuiting, the cases of a batch are
+        tried in `_fail_fast_order`; any failure fails the whole batch, so which of its cases get to run doesn't
+        change the score.
+
+        When `pipelined`, each case is checked on a thread of its own while the next one already runs. A case that
+        ran while the one before it turned out to short-circuit the submission is reported as SC all the same (and
+        killed, if still running), and every batch with dependencies waits for all checks before it, so the outcome
+        is exactly that of grading one case at a time.
+        """
+        is_short_circuiting = False
+        failed_batches: Set[BatchedTestCase] = set()
+        results: Dict[int, Result] = {}
+        next_index = 0
+        checker_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checker') if pipelined else None
+        # The case being checked while the next one runs: its index, its batch and the future of its result.
+        checking: Optional[Tuple[int, Optional[BatchedTestCase], Future]] = None
+
+        def record(index: int, batch: Optional[BatchedTestCase], result: Result) -> None:
+            nonlocal is_short_circuiting
+            if result.result_flag & Result.WA:
+                if batch is not None:
+                    failed_batches.add(batch)
+                if self.submission.short_circuit:
+                    is_short_circuiting = True
+            results[index] = result
+
+        def finish_checking() -> None:
+            nonlocal checking
+            if checking is not None:
+                index, batch, future = checking
+                checking = None
+                record(index, batch, future.result())
+
+        try:
+            for batch_number, run in itertools.groupby(
+                range(len(flattened_cases)), key=lambda i: flattened_cases[i][0]
+            ):
+                batch = batches.get(batch_number) if batch_number else None
+                indices = list(run)
+                if batch is not None:
+                    if batch.dependency_batches:
+                        finish_checking()
+                    is_skipped = self._skip_batch_if_doomed(batch, failed_batches)
+                    indices = self._fail_fast_order(indices)
+                else:
+                    is_skipped = False
+
+                for index in indices:
+                    case = flattened_cases[index][1]
+                    if is_short_circuiting or is_skipped or self._abort_requested:
+                        results[index] = Result(case, result_flag=Result.SC)
+                    elif checker_pool is None:
+                        with self.phase('running', self._case_numbers[index]):
+                            result = self._grade_case(index, case)
+                        record(index, batch, result)
+                    else:
+                        with self.phase('running', self._case_numbers[index]):
+                            result = self._run_case(index, case)
+                        finish_checking()
+                        if is_short_circuiting:
+                            case.free_data()
+                            results[index] = Result(case, result_flag=Result.SC)
+                        else:
+                            checking = index, batch, checker_pool.submit(
+                                self._check_case, index, case, result, threading.get_ident()
+                            )
+
+                    while next_index in results:
+                        yield results.pop(next_index)
+                        next_index += 1
+
+            finish_checking()
+            while next_index in results:
+                yield results.pop(next_index)
+                next_index += 1
+        finally:
+            if checker_pool is not None:
+                checker_pool.shutdown(cancel_futures=True)
+
+    def _find_duplicate_runs(
+        self, problem: Problem, flattened_cases: List[Tuple[Optional[int], BaseTestCase]]
+    ) -> Dict[int, int]:
+        """
+        Pairs cases with an earlier case they would run exactly like, one reading input of the same content and run
+        the same way, whose run they then reuse: on problems marked `deterministic: true`, any such cases, and
+        otherwise, with `reuse_pretest_runs`, main tests with pretests. Cases with generated input are left alone,
+        since telling would mean generating it.
+
+        Only graders that split `grade` into `run_case` and `check_case` can reuse a run; every case is still checked
+        on its own, so that its points and checker configuration apply.
+        """
+        if not getattr(self.grader, 'supports_pipelined_checking', False):
+            return {}
+        deterministic = bool(problem.config.deterministic)
+        reuses_pretests = (
+            env.reuse_pretest_runs
+            and not problem.run_pretests_only
+            and any(getattr(case, 'is_pretest', False) for _, case in flattened_cases)
+        )
+        if not deterministic and not reuses_pretests:
+            return {}
+
+        def run_key(case: BaseTestCase) -> Optional[tuple]:
+            if not isinstance(case, TestCase) or case.config.generator or not case.config['in']:
+                return None
+            fingerprint = _input_fingerprint(problem, case.config['in'])
+            if fingerprint is None:
+                return None
+            symlinks = case.config.symlinks
+            return (
+                fingerprint,
+                case.has_binary_data,
+                case.config.wall_time_factor,
+                repr(symlinks.unwrap() if isinstance(symlinks, ConfigNode) else symlinks),
+            )
+
+        first_runs: Dict[tuple, int] = {}
+        duplicates: Dict[int, int] = {}
+        for index, (_, case) in enumerate(flattened_cases):
+            key = run_key(case)
+            if key is None:
+                continue
+            is_pretest = cast(TestCase, case).is_pretest
+            if key not in first_runs:
+                if deterministic or is_pretest:
+                    first_runs[key] = index
+            elif deterministic or not is_pretest:
+                duplicates[index] = first_runs[key]
+
+        if duplicates:
+            print(
+                f"Running {len(flattened_cases) - len(duplicates)} distinct inputs for {len(flattened_cases)} cases "
+                f"of {problem.id}: "
+                + ', '.join(
+                    f'case {self._case_numbers[index]} reuses case {self._case_numbers[first]}'
+                    for index, first in duplicates.items()
+                )
+            )
+        return duplicates
+
+    def _grade_case(self, index: int, case: BaseTestCase) -> Result:
+        if not self._duplicate_runs:
+            return self.grader.grade(case)
+        return self.grader.check_case(case, self._run_case(index, case))
+
+    def _run_case(self, index: int, case: BaseTestCase) -> Result:
+        """Runs `case`, unless it duplicates a case that already ran, in which case that run is reused."""
+        first_index = self._duplicate_runs.get(index)
+        if first_index is not None:
+            first_run = self._shared_runs.get(first_index)
+            if first_run is not None:
+                result = copy.copy(first_run)
+                result.case = case
+                result.attempts = list(first_run.attempts)
+                return result
+
+        result = self.grader.run_case(case)
+        if index in self._shared_run_indices and not self._abort_requested:
+            # Kept before checking, which adds the verdict and points of this case to the result.
+            self._shared_runs[index] = copy.copy(result)
+        return result
+
+    def _check_case(self, index: int, case: BaseTestCase, result: Result, runner_ident: int) -> Result:
+        with self.phase('checking', self._case_numbers[index]):
+            result = self.grader.check_case(case, result)
+        if result.result_flag & Result.WA and self.submission.short_circuit:
+            # Whatever runs meanwhile is short-circuited; no use letting it finish.
+            self.grader.abort_case(runner_ident)
+        return result
+
+    def _fail_fast_order(self, indices: List[int]) -> List[int]:
+        """
+        Orders the cases of a batch so that those that most often were the first a submission failed come first,
+        when short-circuiting makes that pay off.
+        """
+        if not self.submission.short_circuit or not self._case_hints:
+            return indices
+        return sorted(indices, key=lambda index: -self._case_hints.get(self._case_numbers[index], 0.0))
+
+    def _grade_cases_in_parallel(
+        self,
+        flattened_cases: List[Tuple[Optional[int], BaseTestCase]],
+        batches: Dict[int, BatchedTestCase],
+        parallelism: int,
+    ) -> Generator[Result, None, None]:
+        """
+        Grades up to `parallelism` cases at once, but yields results in case order. Under short-circuiting, every
+        case after the earliest failed one is reported as SC, exactly as sequential grading would, and those still
+        running are killed.
+
+        Cases of a batch with dependencies are only queued once every case before them has been graded, so that a
+        doomed batch is skipped without launching anything.
+        """
+        lock = threading.Lock()
+        # Index of the earliest failed case seen so far, while short-circuiting.
+        short_circuit_at = len(flattened_cases)
+        running: Dict[int, int] = {}  # case index -> ident of the thread grading it
+        failed_batches: Set[BatchedTestCase] = set()
+        skipped_batches: Set[BatchedTestCase] = set()
+
+        def grade_case(index: int, case: BaseTestCase) -> Optional[Result]:
+            nonlocal short_circuit_at
+            with lock:
+                if index > short_circuit_at or self._abort_requested:
+                    return None
+                running[index] = threading.get_ident()
+            try:
+                with self.phase('running', self._case_numbers[index]):
+                    result = self._grade_case(index, case)
+            finally:
+                with lock:
+                    del running[index]
+
+            if result.result_flag & Result.WA and self.submission.short_circuit:
+                with lock:
+                    if index < short_circuit_at:
+                        short_circuit_at = index
+                        for other_index, thread_ident in running.items():
+                            if other_index > index:
+                                self.grader.abort_case(thread_ident)
+            return result
+
+        # The grading slot the submission holds already accounts for one of the cases running.
+        with _case_admission.holding(parallelism - 1), ThreadPoolExecutor(
+            max_workers=parallelism, thread_name_prefix='case'
+        ) as pool:
+            futures: List[Optional[Future]] = []
+
+            def queue_cases(graded_count: int) -> None:
+                while len(futures) < len(flattened_cases):
+                    index = len(futures)
+                    batch_number, case = flattened_cases[index]
+                    batch = batches.get(batch_number) if batch_number else None
+                    starts_batch = batch is not None and (index == 0 or flattened_cases[index - 1][0] != batch_number)
+                    if starts_batch and batch.dependency_batches:
+                        if index > graded_count:
+                            return
+                        if self._skip_batch_if_doomed(batch, failed_batches):
+                            skipped_batches.add(batch)
+                    futures.append(None if batch in skipped_batches else pool.submit(grade_case, index, case))
+
+            try:
+                for index, (batch_number, case) in enumerate(flattened_cases):
+                    queue_cases(index)
+                    future = futures[index]
+                    result = future.result() if future is not None else None
+                    if result is None or index > short_circuit_at:
+                        result = Result(case, result_flag=Result.SC)
+                    elif result.result_flag & Result.WA and batch_number:
+                        failed_batches.add(batches[batch_number])
+                    yield result
+            finally:
+                for future in futures:
+                    if future is not None:
+                        future.cancel()
+
+    @staticmethod
+    def _encode_frame_record(message: Tuple[IPC, tuple]) -> Optional[bytes]:
+        ipc_type, data = message
+        kind = FRAME_RECORD_KINDS.get(ipc_type)
+        if kind == ipc_frames.RESULT:
+            return ipc_frames.encode_result_record(*data)
+        elif kind is not None:
+            return ipc_frames.encode_batch_record(kind, data[0])
+        return None
+
+    @staticmethod
+    def _share_large_payloads(result: Result) -> None:
+        """
+        Moves payloads above `ipc_shared_memory_threshold` bytes into shared memory, so that only a handle is pickled
+        through the pipe.
+        """
+        threshold = env.ipc_shared_memory_threshold
+        if not threshold:
+            return
+        for field in SHARED_PAYLOAD_FIELDS:
+            value = getattr(result, field)
+            if value and len(value) > threshold:
+                setattr(result, field, SharedPayload(value))
+
+    @staticmethod
+    def _load_shared_payloads(result: Result) -> None:
+        for field in SHARED_PAYLOAD_FIELDS:
+            value = getattr(result, field)
+            if isinstance(value, SharedPayload):
+                setattr(result, field, value.load())
+
+    @property
+    def _abort_requested(self) -> bool:
+        return self.cancellation_token.cancelled
+
     def _do_abort(self) -> None:
-        self._abort_requested = True
+        self.cancellation_token.cancel()
         if self.grader:
-            self.grader.abort_grading()
\ No newline at end of file
+            self.grader.abort_grading()
+
+class JudgeWorkerPool:
+    """
+    Keeps up to `size` pre-started `JudgeWorker`s around, so that a submission doesn't pay for starting a process.
+
+    A worker is retired after grading `max_submissions` submissions, once its RSS grows past `max_rss` kilobytes, or
+    when it was killed, and so is every worker started before the last `refresh`. Past the ones started up front, all
+    workers are forked by `acquire`, on the thread about to grade with them, once one is needed and none is idle; the
+    pool never forks from a thread of its own, nor after `close`.
+    """
+
+    def __init__(self, size: int, max_submissions: Optional[int] = None, max_rss: Optional[int] = None) -> None:
+        self.size = size
+        self.max_submissions = max_submissions or env.worker_max_submissions
+        self.max_rss = max_rss or env.worker_max_rss
+        self._lock = threading.Lock()
+        self._closed = False
+        self._generation = 0
+        self._problem: Optional[Problem] = None
+        self._idle_workers: List[JudgeWorker] = [self._start_worker() for _ in range(size)]
+
+    def acquire(self) -> JudgeWorker:
+        stale_workers = []
+        try:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError('worker pool is closed')
+                while self._idle_workers:
+                    worker = self._idle_workers.pop()
+                    if worker.is_alive() and worker.pool_generation == self._generation:
+                        return worker
+                    stale_workers.append(worker)
+        finally:
+            for worker in stale_workers:
+                worker.close()
+        return self._start_worker()
+
+    def release(self, worker: JudgeWorker) -> None:
+        worker.submission = None
+        if not self._should_retire(worker):
+            with self._lock:
+                if not self._closed and len(self._idle_workers) < self.size:
+                    self._idle_workers.append(worker)
+                    return
+        # Waiting for the process to exit is slow; `acquire` starts a replacement once one is needed.
+        threading.Thread(target=worker.close, daemon=True).start()
+
+    def refresh(self) -> None:
+        """
+        Has every worker replaced by one forked from the judge as it is now, so that they inherit what it loaded since.
+        Like any other, the replacements are forked by `acquire` as they are needed, not on the calling thread.
+        """
+        with self._lock:
+            self._generation += 1
+
+    def preload(self, problem: Optional[Problem]) -> None:
+        """Has every worker replaced by one that inherits `problem`, or by a plain one again if it is None."""
+        with self._lock:
+            self._problem = problem
+            self._generation += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            workers, self._idle_workers = self._idle_workers, []
+        for worker in workers:
+            worker.close()
+
+    def _start_worker(self) -> JudgeWorker:
+        generation, problem = self._generation, self._problem
+        worker = JudgeWorker(problem)
+        worker.pool_generation = generation
+        return worker
+
+    def _should_retire(self, worker: JudgeWorker) -> bool:
+        if not worker.is_alive() or worker.pool_generation != self._generation:
+            return True
+        if self.max_submissions and worker.submissions_graded >= self.max_submissions:
+            return True
+        if self.max_rss:
+            rss = worker.rss
+            if rss is not None and rss > self.max_rss:
+                print(f"Retiring worker using {rss} KB of memory...")
+                return True
+        return False
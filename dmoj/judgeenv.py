@@ -24,6 +24,35 @@ env: ConfigNode = ConfigNode(
         'compiler_output_character_limit': 65536,  # Giới hạn ký tự đầu ra biên dịch
         'compiled_binary_cache_dir': None,  # Thư mục cache mặc định
         'compiled_binary_cache_size': 100,  # Số lượng file thực thi tối đa trong cache
+        'grading_slots': None,  # Số submission được chấm đồng thời, mặc định bằng số lõi CPU
+        'worker_max_submissions': 100,  # Số submission một worker chấm trước khi được thay mới
+        'worker_max_rss': 524288,  # Thay worker mới khi RSS vượt quá 512mb
+        'parallel_cases': False,  # Số test chạy song song cho mỗi submission (true = theo số lõi CPU)
+        'grading_event_queue_size': 256,  # Số sự kiện IPC tối đa chờ người gọi Judge.grade xử lý
+        'ipc_shared_memory_threshold': 65536,  # Dữ liệu kết quả lớn hơn ngưỡng này (byte) được gửi qua shared memory
+        'ipc_coalesce_window': 0.005,  # Thời gian tối đa (giây) gom các kết quả liên tiếp vào một gói IPC
+        'worker_heartbeat_interval': 1,  # Worker gửi heartbeat mỗi 1 giây khi đang chấm
+        'worker_heartbeat_timeout': 5,  # Coi worker bị treo nếu 5 giây không nhận được tin nào
+        'scheduler_aging_interval': 60,  # Submission chờ quá 60 giây được nâng lên một mức ưu tiên
+        'worker_abort_timeout': 1,  # Giết worker nếu sau 1 giây vẫn chưa dừng chấm submission bị hủy
+        'fail_fast_case_ordering': True,  # Khi short-circuit, chấm trước các test trong batch hay sai đầu tiên
+        'result_cache_dir': None,  # Thư mục cache kết quả chấm của các bài deterministic (None = tắt)
+        'pipelined_checking': False,  # Chạy test kế tiếp trong khi checker còn chấm test hiện tại
+        'reuse_pretest_runs': True,  # Test chính có input trùng một pretest dùng lại lần chạy của pretest đó
+        'tle_recheck_band': 0,  # Chạy lại test có thời gian cách giới hạn không quá tỉ lệ này, vd 0.1 (0 = tắt)
+        'tle_recheck_attempts': 2,  # Số lần chạy lại tối đa cho mỗi test sát giới hạn thời gian
+        'tle_recheck_report': 'min',  # Thời gian báo cáo sau khi chạy lại: 'min' hoặc 'median'
+        'admission_control': False,  # Giảm số slot và số test song song khi máy đang bận
+        'admission_max_load': 1.0,  # Tải trung bình tối đa trên mỗi lõi CPU trước khi giảm
+        'admission_max_memory_pressure': 10,  # % thời gian chờ bộ nhớ (avg10 trong /proc/pressure/memory) tối đa
+        'admission_min_free_memory': 262144,  # Chỉ chấm một submission mỗi lúc khi bộ nhớ trống dưới 256mb
+        'admission_refresh_interval': 5,  # Tính lại giới hạn tối đa mỗi 5 giây
+        'warmup_problems': 0,  # Số bài hay được nộp nhất được chuẩn bị sẵn khi khởi động và khi cập nhật bài (0 = tắt)
+        'warmup_history_file': None,  # File lưu tần suất nộp bài qua các lần khởi động (None = chỉ giữ trong bộ nhớ)
+        'trace_dir': None,  # Thư mục ghi trace (định dạng Chrome/Perfetto) của từng submission (None = tắt)
+        'speed_normalization': False,  # Đo tốc độ máy khi khởi động và nhân giới hạn thời gian với hệ số tốc độ
+        'speed_reference_time': 0.05,  # Thời gian (giây) chạy benchmark trên máy chuẩn, nơi đặt giới hạn thời gian
+        'speed_benchmark_file': None,  # File lưu kết quả benchmark để không phải đo lại (None = đo mỗi lần khởi động)
         'runtime': {},
         'extra_fs': {},
     },
@@ -10,15 +10,15 @@ import threading
 import time
 import traceback
 import zlib
-from typing import List, Optional, TYPE_CHECKING, Tuple
+from typing import Dict, List, Optional, TYPE_CHECKING, Tuple
 
-from dmoj import sysinfo
+from dmoj import speed, sysinfo
 from dmoj.judgeenv import get_runtime_versions, get_supported_problems_and_mtimes
 from dmoj.result import Result
 from dmoj.utils.unicode import utf8bytes, utf8text
 
 if TYPE_CHECKING:
-    from dmoj.judge import Judge
+    from dmoj.judge import Judge, Submission
 
 log = logging.getLogger(__name__)
 
@@ -75,9 +75,9 @@ class PacketManager:
         self.cert_store = cert_store
 
         self._lock = threading.RLock()
-        self._batch = 0
         self._testcase_queue_lock = threading.Lock()
-        self._testcase_queue: List[Tuple[int, Result]] = []
+        # Results waiting to be sent, as (submission id, position, result); submissions are graded concurrently.
+        self._testcase_queue: List[Tuple[int, int, Result]] = []
 
         # Exponential backoff: starting at 4 seconds, max 60 seconds.
         # If it fails to connect for something like 7 hours, it could RecursionError.
@@ -191,29 +191,35 @@ class PacketManager:
             if not self._testcase_queue:
                 return
 
-            self._send_packet(
-                {
-                    'name': 'test-case-status',
-                    'submission-id': self.judge.current_submission.id,
-                    'cases': [
-                        {
-                            'position': position,
-                            'status': result.result_flag,
-                            'time': result.execution_time,
-                            'points': result.points,
-                            'total-points': result.total_points,
-                            'memory': result.max_memory,
-                            'output': result.output,
-                            'extended-feedback': result.extended_feedback,
-                            'feedback': result.feedback,
-                            'voluntary-context-switches': result.context_switches[0],
-                            'involuntary-context-switches': result.context_switches[1],
-                            'runtime-version': result.runtime_version,
-                        }
-                        for position, result in self._testcase_queue
-                    ],
-                }
-            )
+            by_submission: Dict[int, List[Tuple[int, Result]]] = {}
+            for submission_id, position, result in self._testcase_queue:
+                by_submission.setdefault(submission_id, []).append((position, result))
+
+            for submission_id, results in by_submission.items():
+                self._send_packet(
+                    {
+                        'name': 'test-case-status',
+                        'submission-id': submission_id,
+                        'cases': [
+                            {
+                                'position': position,
+                                'status': result.result_flag,
+                                'time': result.execution_time,
+                                'raw-time': result.raw_execution_time,
+                                'points': result.points,
+                                'total-points': result.total_points,
+                                'memory': result.max_memory,
+                                'output': result.output,
+                                'extended-feedback': result.extended_feedback,
+                                'feedback': result.feedback,
+                                'voluntary-context-switches': result.context_switches[0],
+                                'involuntary-context-switches': result.context_switches[1],
+                                'runtime-version': result.runtime_version,
+                            }
+                            for position, result in results
+                        ],
+                    }
+                )
 
             self._testcase_queue.clear()
 
@@ -256,19 +262,18 @@ class PacketManager:
             self.submission_acknowledged_packet(packet['submission-id'])
             from dmoj.judge import Submission
 
-            self.judge.begin_grading(
-                Submission(
-                    id=packet['submission-id'],
-                    problem_id=packet['problem-id'],
-                    language=packet['language'],
-                    source=packet['source'],
-                    time_limit=float(packet['time-limit']),
-                    memory_limit=int(packet['memory-limit']),
-                    short_circuit=packet['short-circuit'],
-                    meta=packet['meta'],
-                )
+            submission = Submission(
+                id=packet['submission-id'],
+                problem_id=packet['problem-id'],
+                language=packet['language'],
+                source=packet['source'],
+                time_limit=float(packet['time-limit']),
+                memory_limit=int(packet['memory-limit']),
+                short_circuit=packet['short-circuit'],
+                meta=packet['meta'],
             )
-            self._batch = 0
+            # Grading waits for a free slot, so it can't hold up reading the packets that follow.
+            threading.Thread(target=self._grade_submission, args=(submission,), daemon=True).start()
             log.info(
                 'Accept submission: %d: executor: %s, code: %s',
                 packet['submission-id'],
@@ -276,15 +281,48 @@ class PacketManager:
                 packet['problem-id'],
             )
         elif name == 'terminate-submission':
-            self.judge.abort_grading()
+            self.judge.abort_grading(packet.get('submission-id'))
         elif name == 'disconnect':
             log.info('Received disconnect request, shutting down...')
             self.disconnect()
         else:
             log.error('Unknown packet %s, payload %s', name, packet)
 
+    def _grade_submission(self, submission: 'Submission') -> None:
+        from dmoj.judge import IPC
+
+        sub_id = submission.id
+        ipc_packet_dispatch = {
+            IPC.COMPILE_ERROR: lambda message: self.compile_error_packet(sub_id, message),
+            IPC.COMPILE_MESSAGE: lambda message: self.compile_message_packet(sub_id, message),
+            IPC.GRADING_BEGIN: lambda pretested: self.begin_grading_packet(sub_id, pretested),
+            IPC.GRADING_END: lambda: self.grading_end_packet(sub_id),
+            IPC.GRADING_ABORTED: lambda: self.submission_aborted_packet(sub_id),
+            IPC.BATCH_BEGIN: lambda batch: self.batch_begin_packet(sub_id, batch),
+            IPC.BATCH_END: lambda batch: self.batch_end_packet(sub_id, batch),
+            IPC.RESULT: lambda batch, case, result: self.test_case_status_packet(sub_id, case, result),
+            IPC.UNHANDLED_EXCEPTION: lambda message: self.internal_error_packet(sub_id, message),
+        }
+        try:
+            for ipc_type, data in self.judge.grade(submission):
+                handler = ipc_packet_dispatch.get(ipc_type)
+                if handler is not None:
+                    handler(*data)
+        except Exception:
+            log.exception('Failed to grade submission %d', sub_id)
+            self.internal_error_packet(sub_id, traceback.format_exc())
+
     def handshake(self, problems: str, runtimes, id: str, key: str):
-        self._send_packet({'name': 'handshake', 'problems': problems, 'executors': runtimes, 'id': id, 'key': key})
+        self._send_packet(
+            {
+                'name': 'handshake',
+                'problems': problems,
+                'executors': runtimes,
+                'id': id,
+                'key': key,
+                'speed-factor': speed.get_speed_factor(),
+            }
+        )
         log.info('Awaiting handshake response: [%s]:%s', self.host, self.port)
         try:
             data = self.input.read(PacketManager.SIZE_PACK.size)
@@ -303,10 +341,10 @@ class PacketManager:
         log.debug('Update problems')
         self._send_packet({'name': 'supported-problems', 'problems': problems})
 
-    def test_case_status_packet(self, position: int, result: Result):
+    def test_case_status_packet(self, submission_id: int, position: int, result: Result):
         log.debug(
             'Test case on %d: #%d, %s [%.3fs | %.2f MB], %.1f/%.0f',
-            self.judge.current_submission.id,
+            submission_id,
             position,
             ', '.join(result.readable_codes()),
             result.execution_time,
@@ -315,57 +353,53 @@ class PacketManager:
             result.total_points,
         )
         with self._testcase_queue_lock:
-            self._testcase_queue.append((position, result))
+            self._testcase_queue.append((submission_id, position, result))
 
-    def compile_error_packet(self, message: str):
-        log.debug('Compile error: %d', self.judge.current_submission.id)
+    def compile_error_packet(self, submission_id: int, message: str):
+        log.debug('Compile error: %d', submission_id)
         self.fallback = 4
-        self._send_packet({'name': 'compile-error', 'submission-id': self.judge.current_submission.id, 'log': message})
+        self._send_packet({'name': 'compile-error', 'submission-id': submission_id, 'log': message})
 
-    def compile_message_packet(self, message: str):
-        log.debug('Compile message: %d', self.judge.current_submission.id)
-        self._send_packet(
-            {'name': 'compile-message', 'submission-id': self.judge.current_submission.id, 'log': message}
-        )
+    def compile_message_packet(self, submission_id: int, message: str):
+        log.debug('Compile message: %d', submission_id)
+        self._send_packet({'name': 'compile-message', 'submission-id': submission_id, 'log': message})
 
-    def internal_error_packet(self, message: str):
-        log.debug('Internal error: %d', self.judge.current_submission.id)
+    def internal_error_packet(self, submission_id: int, message: str):
+        log.debug('Internal error: %d', submission_id)
         self._flush_testcase_queue()
-        self._send_packet(
-            {'name': 'internal-error', 'submission-id': self.judge.current_submission.id, 'message': message}
-        )
+        self._send_packet({'name': 'internal-error', 'submission-id': submission_id, 'message': message})
 
-    def begin_grading_packet(self, is_pretested: bool):
-        log.debug('Begin grading: %d', self.judge.current_submission.id)
-        self._send_packet(
-            {'name': 'grading-begin', 'submission-id': self.judge.current_submission.id, 'pretested': is_pretested}
-        )
+    def begin_grading_packet(self, submission_id: int, is_pretested: bool):
+        log.debug('Begin grading: %d', submission_id)
+        self._send_packet({'name': 'grading-begin', 'submission-id': submission_id, 'pretested': is_pretested})
 
-    def grading_end_packet(self):
-        log.debug('End grading: %d', self.judge.current_submission.id)
+    def grading_end_packet(self, submission_id: int):
+        log.debug('End grading: %d', submission_id)
         self.fallback = 4
         self._flush_testcase_queue()
-        self._send_packet({'name': 'grading-end', 'submission-id': self.judge.current_submission.id})
+        self._send_packet({'name': 'grading-end', 'submission-id': submission_id})
 
-    def batch_begin_packet(self):
-        self._batch += 1
-        log.debug('Enter batch number %d: %d', self._batch, self.judge.current_submission.id)
+    def batch_begin_packet(self, submission_id: int, batch: int):
+        log.debug('Enter batch number %d: %d', batch, submission_id)
         self._flush_testcase_queue()
-        self._send_packet({'name': 'batch-begin', 'submission-id': self.judge.current_submission.id})
+        self._send_packet({'name': 'batch-begin', 'submission-id': submission_id})
 
-    def batch_end_packet(self):
-        log.debug('Exit batch number %d: %d', self._batch, self.judge.current_submission.id)
+    def batch_end_packet(self, submission_id: int, batch: int):
+        log.debug('Exit batch number %d: %d', batch, submission_id)
         self._flush_testcase_queue()
-        self._send_packet({'name': 'batch-end', 'submission-id': self.judge.current_submission.id})
+        self._send_packet({'name': 'batch-end', 'submission-id': submission_id})
 
     def current_submission_packet(self):
-        log.debug('Current submission query: %d', self.judge.current_submission.id)
-        self._send_packet({'name': 'current-submission-id', 'submission-id': self.judge.current_submission.id})
-
-    def submission_aborted_packet(self):
-        log.debug('Submission aborted: %d', self.judge.current_submission.id)
+        # One packet per submission being graded, or a single one with no id if the judge is idle.
+        submission_ids = [submission.id for submission in self.judge.current_submissions if submission] or [None]
+        for submission_id in submission_ids:
+            log.debug('Current submission query: %s', submission_id)
+            self._send_packet({'name': 'current-submission-id', 'submission-id': submission_id})
+
+    def submission_aborted_packet(self, submission_id: int):
+        log.debug('Submission aborted: %d', submission_id)
         self._flush_testcase_queue()
-        self._send_packet({'name': 'submission-terminated', 'submission-id': self.judge.current_submission.id})
+        self._send_packet({'name': 'submission-terminated', 'submission-id': submission_id})
 
     def ping_packet(self, when: float):
         data = {'name': 'ping-response', 'when': when, 'time': time.time()}
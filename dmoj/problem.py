@@ -31,11 +31,13 @@ from dmoj import checkers
 from dmoj.checkers import Checker
 from dmoj.config import ConfigNode, InvalidInitException
 from dmoj.judgeenv import env, get_problem_root
+from dmoj.utils import tracing
 from dmoj.utils.helper_files import compile_with_auxiliary_files, parse_helper_file_error
 from dmoj.utils.module import load_module_from_file
 from dmoj.utils.normalize import normalized_file_copy
 
 if TYPE_CHECKING:
+    from dmoj.executors.base_executor import BaseExecutor
     from dmoj.graders.base import BaseGrader
 # Định nghĩa MemoryIO đơn giản để thay thế cptbox.utils.MemoryIO
 class MemoryIO:
@@ -104,6 +106,7 @@ class Problem:
         self.run_pretests_only = self.meta.pretests_only
         self._batch_counter = 0
         self._testcase_counter = 0
+        self._preloaded_cases: Optional[List[BaseTestCase]] = None
 
         root_dir = get_problem_root(problem_id)
         assert root_dir is not None
@@ -240,6 +243,9 @@ class Problem:
         return None
 
     def _resolve_testcases(self, cfg, batch_no=0) -> List[BaseTestCase]:
+        if not batch_no:
+            # Batches are numbered, and name each other in `dependencies`, within a single list of cases.
+            self._batch_counter = 0
         cases: List[BaseTestCase] = []
         for case_config in cfg:
             if 'batched' in case_config.raw_config:
@@ -255,21 +261,57 @@ class Problem:
             else:
                 cases.append(TestCase(self._testcase_counter, batch_no, case_config, self))
                 self._testcase_counter += 1
+        if not batch_no:
+            batches = {case.batch_no: case for case in cases if isinstance(case, BatchedTestCase)}
+            for batch in batches.values():
+                batch.dependency_batches = [batches[dependency] for dependency in batch.dependencies]
         return cases
 
+    def preload(self) -> None:
+        """
+        Resolves the cases and reads, or generates, the data of every one of them once, so that any number of
+        submissions can then be graded against this problem without going back to the archive or the generators.
+        """
+        cases = self.cases()
+        for case in cases:
+            for test_case in case.batched_cases if isinstance(case, BatchedTestCase) else [case]:
+                cast(TestCase, test_case).preload()
+        self._preloaded_cases = cases
+
+    def warm_up(self) -> None:
+        """
+        Gets everything but the submission itself ready ahead of time: compiles the problem's interactor, generators
+        and bridged checkers, so that they land in the compiled binary cache, and reads its test data once, so that it
+        lands in the page cache. Unlike `preload`, none of the data is kept in memory.
+        """
+        self.grader_class.warm_up(self)
+        for case in self.cases():
+            for test_case in case.batched_cases if isinstance(case, BatchedTestCase) else [case]:
+                cast(TestCase, test_case).warm_up()
+
     def cases(self) -> List[BaseTestCase]:
+        if self._preloaded_cases is not None:
+            return self._preloaded_cases
+
         pretest_test_cases = self.config.pretest_test_cases
         if self.run_pretests_only and pretest_test_cases:
-            return self._resolve_testcases(pretest_test_cases)
+            return self._resolve_pretests(pretest_test_cases)
 
         test_cases = self._resolve_testcases(self.config.test_cases)
         if pretest_test_cases:
-            pretest_test_cases = self._resolve_testcases(pretest_test_cases)
+            pretest_test_cases = self._resolve_pretests(pretest_test_cases)
             for case in pretest_test_cases:
                 case.points = 0
             test_cases = pretest_test_cases + test_cases
         return test_cases
 
+    def _resolve_pretests(self, cfg) -> List[BaseTestCase]:
+        cases = self._resolve_testcases(cfg)
+        for case in cases:
+            for test_case in case.batched_cases if isinstance(case, BatchedTestCase) else [case]:
+                cast(TestCase, test_case).is_pretest = True
+        return cases
+
 class ProblemDataManager(dict):
     problem_root_dir: str
     archive: Optional[zipfile.ZipFile]
@@ -290,7 +332,7 @@ class ProblemDataManager(dict):
 
     def as_fd(self, key: str, normalize: bool = False) -> MemoryIO:
         memory = MemoryIO()
-        with self.open(key) as f:
+        with tracing.span('reading data', file=key, normalize=normalize), self.open(key) as f:
             if normalize:
                 normalized_file_copy(f, memory)
             else:
@@ -332,12 +374,14 @@ class ProblemConfig(ConfigNode):
 
 class BatchedTestCase(BaseTestCase):
     batch_no: int
+    dependency_batches: List['BatchedTestCase']
 
     def __init__(self, batch_no: int, config: ConfigNode, problem: Problem, cases: List[BaseTestCase]) -> None:
         self.config = config
         self.batch_no = batch_no
         self.points = config.points
         self.dependencies = config.dependencies
+        self.dependency_batches = []
         self.batched_cases = cases
         if any(isinstance(case, BatchedTestCase) for case in self.batched_cases):
             raise InvalidInitException('nested batches')
@@ -354,8 +398,10 @@ class TestCase(BaseTestCase):
     batch: int
     output_prefix_length: int
     has_binary_data: bool
+    is_pretest: bool
     _input_data_io: Optional[MemoryIO]
     _generated: Optional[Tuple[MemoryIO, bytes]]
+    _preloaded: Optional[Tuple[bytes, bytes]]
 
     def __init__(self, count: int, batch_no: int, config: ConfigNode, problem: Problem):
         self.position = count
@@ -365,8 +411,10 @@ class TestCase(BaseTestCase):
         self.points = config.points
         self.output_prefix_length = config.output_prefix_length
         self.has_binary_data = config.binary_data
+        self.is_pretest = False
         self._generated = None
         self._input_data_io = None
+        self._preloaded = None
 
     def _normalize(self, data: bytes) -> bytes:
         data = data or b''
@@ -378,6 +426,35 @@ class TestCase(BaseTestCase):
         return data
 
     def _run_generator(self, gen: Union[str, ConfigNode], args: Optional[Iterable[str]] = None) -> None:
+        executor, args, time_limit, memory_limit = self._compile_generator(gen, args)
+
+        args = map(str, args)
+        input_io = MemoryIO()
+        executor.fsize = -1  # Không giới hạn kích thước file
+
+        try:
+            input = self.problem.problem_data[self.config['in']] if self.config['in'] else None
+        except KeyError:
+            input = None
+
+        with tracing.span('running generator'):
+            proc = executor.launch(
+                *args,
+                time=time_limit,
+                memory=memory_limit,
+                stdin=subprocess.PIPE,
+                stdout=input_io,
+                stderr=subprocess.PIPE,
+            )
+            _, stderr = proc.communicate(input=input)
+        input_io.seal()
+        self._generated = input_io, self._normalize(stderr)
+
+        parse_helper_file_error(proc, executor, 'generator', stderr, time_limit, memory_limit)
+
+    def _compile_generator(
+        self, gen: Union[str, ConfigNode], args: Optional[Iterable[str]] = None
+    ) -> Tuple['BaseExecutor', list, float, int]:
         flags = []
         args = args or []
 
@@ -414,35 +491,18 @@ class TestCase(BaseTestCase):
 
         filenames = [os.path.abspath(os.path.join(base, name)) for name in filenames]
         executor = compile_with_auxiliary_files(filenames, flags, lang, compiler_time_limit)
-
-        args = map(str, args)
-        input_io = MemoryIO()
-        executor.fsize = -1  # Không giới hạn kích thước file
-
-        proc = executor.launch(
-            *args,
-            time=time_limit,
-            memory=memory_limit,
-            stdin=subprocess.PIPE,
-            stdout=input_io,
-            stderr=subprocess.PIPE,
-        )
-
-        try:
-            input = self.problem.problem_data[self.config['in']] if self.config['in'] else None
-        except KeyError:
-            input = None
-
-        _, stderr = proc.communicate(input=input)
-        input_io.seal()
-        self._generated = input_io, self._normalize(stderr)
-
-        parse_helper_file_error(proc, executor, 'generator', stderr, time_limit, memory_limit)
+        return executor, list(args), time_limit, memory_limit
 
     def input_data(self) -> bytes:
         return self.input_data_io().to_bytes()
 
     def input_data_io(self) -> MemoryIO:
+        if self._preloaded is not None:
+            # Every grading gets its own copy, which `free_data` is then free to close.
+            memory = MemoryIO()
+            memory.write(self._preloaded[0])
+            memory.seal()
+            return memory
         if self._input_data_io:
             return self._input_data_io
         result = self._input_data_io = self._make_input_data_io()
@@ -463,6 +523,8 @@ class TestCase(BaseTestCase):
             return MemoryIO(seal=True)
 
     def output_data(self) -> bytes:
+        if self._preloaded is not None:
+            return self._preloaded[1]
         if self.config.out:
             return self._normalize(self.problem.problem_data[self.config.out])
         gen = self.config.generator
@@ -494,6 +556,40 @@ class TestCase(BaseTestCase):
             raise InvalidInitException('malformed checker: no check method found')
         return partial(checker.check, **params)
 
+    def warm_up(self) -> None:
+        """
+        Compiles this case's generator and bridged checker, if any, and reads its data files once, so that they are in
+        the page cache; nothing is kept in memory.
+        """
+        if self.config.generator and (not self.config['out'] or not self.config['in']):
+            self._compile_generator(self.config.generator, args=self.config.generator_args)
+
+        checker = self.config['checker']
+        if isinstance(checker, ConfigNode) and checker['name'] == 'bridged':
+            params = checker['args'] or ConfigNode({})
+            checkers.bridged.get_executor(
+                self.problem.id,
+                params['files'],
+                params.get('flags', []),
+                params['lang'],
+                params.get('compiler_time_limit', env.generator_compiler_time_limit),
+            )
+
+        for key in (self.config['in'], self.config['out']):
+            if not key:
+                continue
+            try:
+                with self.problem.problem_data.open(key) as f:
+                    while f.read(65536):
+                        pass
+            except KeyError:
+                pass
+
+    def preload(self) -> None:
+        """Keeps this case's input and expected output in memory for good, running its generator at most once."""
+        self._preloaded = self.input_data(), self.output_data()
+        self.free_data()
+
     def free_data(self) -> None:
         self._generated = None
         if self._input_data_io:
@@ -502,7 +598,8 @@ class TestCase(BaseTestCase):
     def __str__(self) -> str:
         return f'TestCase(in={self.config["in"]},out={self.config["out"]},points={self.config["points"]})'
 
-    _pickle_blacklist = ('_generated', 'config', 'problem', '_input_data_io')
+    # Only the worker process grading the case needs these; the rest is what `ipc_frames` carries for a result.
+    _pickle_blacklist = ('_generated', 'config', 'problem', '_input_data_io', '_preloaded', 'is_pretest')
 
     def __getstate__(self) -> dict:
         return {k: v for k, v in self.__dict__.items() if k not in self._pickle_blacklist}
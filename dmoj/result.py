@@ -43,6 +43,8 @@ class Result:
         feedback: str = '',
         extended_feedback: str = '',
         points: float = 0,
+        attempts: Optional[List[float]] = None,
+        raw_execution_time: float = 0,
     ):
         self.case: 'TestCase' = case
         self.result_flag: int = result_flag
@@ -55,6 +57,10 @@ class Result:
         self.feedback: str = feedback
         self.extended_feedback: str = extended_feedback
         self.points: float = points
+        # Execution times of every run of a case that was run again for landing too close to the time limit.
+        self.attempts: List[float] = attempts or []
+        # Execution time as measured on this node; `execution_time` is it divided by the node's speed factor.
+        self.raw_execution_time: float = raw_execution_time
 
     def get_main_code(self) -> int:
         for flag in Result.CODE_DISPLAY_ORDER:
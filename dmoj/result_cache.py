@@ -0,0 +1,152 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Dict, List, Optional, TYPE_CHECKING, Tuple
+
+import yaml
+
+from dmoj.executors import executors
+from dmoj.judgeenv import get_problem_root
+from dmoj.result import Result
+from dmoj.utils.unicode import utf8bytes
+
+if TYPE_CHECKING:
+    from dmoj.judge import IPC, Submission
+
+log = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Remembers the complete grading of submissions to problems marked `deterministic: true` in their init.yml, so that
+    grading the same source again replays the stored events without compiling or running anything.
+
+    Entries are keyed by the source, language, executor version, time and memory limits, short-circuiting, the whole
+    of the submission's meta, since any of it may change how it is graded, and a fingerprint of every file in the
+    problem's directory, and are stored under `directory/<problem id>/`. `invalidate` drops everything stored for a
+    problem, and `invalidate_changed` does so for every problem whose data changed since; the judge calls the latter
+    whenever it is told to update its problems. A problem's fingerprint is only taken again then, so changes to its
+    data go unnoticed until the judge is told about them.
+    """
+
+    # Verdicts that may come out differently next time, and so are never cached.
+    UNSTABLE_FLAGS = Result.TLE | Result.IE
+    # Name of the file holding the fingerprint of the problem data a problem's entries were stored for.
+    FINGERPRINT = 'fingerprint'
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        # Fingerprints of the problems' data by problem id, as of the last `invalidate_changed`.
+        self._fingerprints: Dict[str, str] = {}
+
+    def key(self, submission: 'Submission') -> Optional[str]:
+        """Returns the cache key for `submission`, or None if its results may not be cached."""
+        root_dir = get_problem_root(submission.problem_id)
+        executor = executors.get(submission.language)
+        if root_dir is None or executor is None:
+            return None
+        try:
+            with open(os.path.join(root_dir, 'init.yml')) as init_file:
+                config = yaml.safe_load(init_file)
+            if not isinstance(config, dict) or not config.get('deterministic'):
+                return None
+            fingerprint = self._problem_fingerprint(submission.problem_id, root_dir)
+        except (OSError, yaml.YAMLError):
+            return None
+
+        material = [
+            hashlib.sha256(utf8bytes(submission.source)).hexdigest(),
+            submission.language,
+            executor.Executor.get_runtime_versions(),
+            fingerprint,
+            submission.time_limit,
+            submission.memory_limit,
+            submission.short_circuit,
+            submission.meta,
+        ]
+        return hashlib.sha256(utf8bytes(json.dumps(material, sort_keys=True, default=repr))).hexdigest()
+
+    def get(self, submission: 'Submission', key: str) -> Optional[List[Tuple['IPC', tuple]]]:
+        try:
+            with open(self._path(submission.problem_id, key), 'rb') as entry:
+                return pickle.load(entry)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def put(self, submission: 'Submission', key: str, events: List[Tuple['IPC', tuple]]) -> None:
+        """
+        Stores `events`, if they are the complete grading of `submission` and free of unstable verdicts. Failing to
+        store them is only logged, since the grading itself is already done.
+        """
+        from dmoj.judge import IPC
+
+        if not events or events[-1][0] != IPC.GRADING_END:
+            return
+        if any(ipc_type == IPC.RESULT and data[2].result_flag & self.UNSTABLE_FLAGS for ipc_type, data in events):
+            return
+
+        root_dir = get_problem_root(submission.problem_id)
+        if root_dir is None:
+            return
+        try:
+            fingerprint = self._problem_fingerprint(submission.problem_id, root_dir)
+            if self._stored_fingerprint(submission.problem_id) != fingerprint:
+                self.invalidate(submission.problem_id)
+                self._write(self._path(submission.problem_id, self.FINGERPRINT), utf8bytes(fingerprint))
+            self._write(self._path(submission.problem_id, key), pickle.dumps(events))
+        except OSError:
+            log.exception('Failed to cache the results of submission %d', submission.id)
+
+    def invalidate(self, problem_id: str) -> None:
+        shutil.rmtree(os.path.join(self.directory, problem_id), ignore_errors=True)
+
+    def invalidate_changed(self) -> None:
+        """Drops the entries of every problem whose data changed, or that disappeared, since they were stored."""
+        self._fingerprints.clear()
+        try:
+            problem_ids = os.listdir(self.directory)
+        except OSError:
+            return
+        for problem_id in problem_ids:
+            root_dir = get_problem_root(problem_id)
+            if root_dir is None:
+                self.invalidate(problem_id)
+            elif self._stored_fingerprint(problem_id) != self._problem_fingerprint(problem_id, root_dir):
+                self.invalidate(problem_id)
+
+    def _stored_fingerprint(self, problem_id: str) -> Optional[str]:
+        try:
+            with open(self._path(problem_id, self.FINGERPRINT)) as fingerprint_file:
+                return fingerprint_file.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _write(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as entry:
+            entry.write(data)
+        os.replace(entry.name, path)
+
+    def _path(self, problem_id: str, name: str) -> str:
+        return os.path.join(self.directory, problem_id, name)
+
+    def _problem_fingerprint(self, problem_id: str, root_dir: str) -> str:
+        fingerprint = self._fingerprints.get(problem_id)
+        if fingerprint is None:
+            fingerprint = self._fingerprints[problem_id] = self._fingerprint(root_dir)
+        return fingerprint
+
+    @staticmethod
+    def _fingerprint(root_dir: str) -> str:
+        files = []
+        for dirpath, _, filenames in os.walk(root_dir):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                stat = os.stat(path)
+                files.append((os.path.relpath(path, root_dir), stat.st_size, stat.st_mtime_ns))
+        return hashlib.sha256(utf8bytes(json.dumps(sorted(files)))).hexdigest()
@@ -0,0 +1,230 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional, Tuple
+
+from dmoj.judge import IPC, Judge, Submission
+from dmoj.judgeenv import env, get_problem_root
+from dmoj.problem import BatchedTestCase, Problem
+
+log = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    CONTEST = 0
+    PRACTICE = 1
+    REJUDGE = 2
+    TESTSUITE = 3
+
+    DEFAULT = PRACTICE
+
+
+EventCallback = Callable[[IPC, tuple], None]
+
+
+class _QueuedSubmission:
+    def __init__(
+        self,
+        submission: Submission,
+        priority: Priority,
+        baseline: float,
+        estimate: float,
+        sequence: int,
+        on_event: Optional[EventCallback],
+    ) -> None:
+        self.submission = submission
+        self.priority = priority
+        # Case count times time limit, and the expected grading time in seconds once scaled by the problem's history.
+        self.baseline = baseline
+        self.estimate = estimate
+        self.sequence = sequence
+        self.on_event = on_event
+        self.enqueued_at = time.monotonic()
+        self.future: 'Future[list]' = Future()
+
+
+class SubmissionScheduler:
+    """
+    Queues submissions in front of a `Judge` and hands them out as its slots free up, instead of in arrival order.
+
+    A submission is picked from the most urgent priority class first; within a class, the one expected to finish
+    soonest had it started on arrival goes first, which is shortest-job-first with ties going to whoever waited
+    longer. A submission's expected grading time starts out as its case count times its time limit, and is scaled by
+    how long that problem's submissions actually took so far. To keep anything from starving, a queued submission
+    moves up one class for every `scheduler_aging_interval` seconds it waits.
+    """
+
+    # Weight of the latest submission in a problem's moving average of actual over expected grading time.
+    HISTORY_WEIGHT = 0.2
+
+    def __init__(self, judge: Judge, aging_interval: Optional[float] = None) -> None:
+        self.judge = judge
+        self.aging_interval = aging_interval or env.scheduler_aging_interval
+        self._condition = threading.Condition()
+        self._queue: List[_QueuedSubmission] = []
+        self._sequence = itertools.count()
+        self._closed = False
+        self._history: Dict[str, float] = {}
+        self._case_counts: Dict[str, Tuple[float, int]] = {}
+        self._dispatchers = [
+            threading.Thread(target=self._dispatch_loop, name='DMOJ Scheduler', daemon=True)
+            for _ in range(judge.slots)
+        ]
+        for dispatcher in self._dispatchers:
+            dispatcher.start()
+
+    def submit(
+        self,
+        submission: Submission,
+        priority: Optional[Priority] = None,
+        on_event: Optional[EventCallback] = None,
+    ) -> 'Future[list]':
+        """
+        Queues `submission` for grading, returning a future of every `(batch, case, Result)` it produces.
+
+        The priority defaults to the `priority` key of the submission's meta, e.g. `rejudge`, then to practice; an
+        unknown one is logged and treated as practice too. `on_event`, if given, is called with every IPC event while
+        the submission is graded.
+        """
+        if priority is None:
+            priority = self._meta_priority(submission)
+        baseline = self._baseline(submission)
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('scheduler is closed')
+            estimate = baseline * self._history.get(submission.problem_id, 1.0)
+            entry = _QueuedSubmission(submission, priority, baseline, estimate, next(self._sequence), on_event)
+            self._queue.append(entry)
+            self._condition.notify()
+        return entry.future
+
+    @property
+    def queued_submissions(self) -> List[Submission]:
+        """The submissions still waiting for a slot, in the order they would be graded right now."""
+        with self._condition:
+            now = time.monotonic()
+            return [entry.submission for entry in sorted(self._queue, key=lambda entry: self._sort_key(entry, now))]
+
+    def abort(self, submission_id: int) -> None:
+        """Drops the submission from the queue, or aborts it if it is already being graded."""
+        with self._condition:
+            for entry in self._queue:
+                if entry.submission.id == submission_id:
+                    self._queue.remove(entry)
+                    entry.future.cancel()
+                    return
+        self.judge.abort_grading(submission_id)
+
+    def close(self) -> None:
+        """Cancels everything still queued and waits for the submissions being graded to finish."""
+        with self._condition:
+            self._closed = True
+            queued, self._queue = self._queue, []
+            self._condition.notify_all()
+        for entry in queued:
+            entry.future.cancel()
+        for dispatcher in self._dispatchers:
+            dispatcher.join()
+
+    def estimate(self, submission: Submission) -> float:
+        """Returns how many seconds `submission` is expected to take to grade."""
+        baseline = self._baseline(submission)
+        with self._condition:
+            return baseline * self._history.get(submission.problem_id, 1.0)
+
+    @staticmethod
+    def _meta_priority(submission: Submission) -> Priority:
+        name = submission.meta.get('priority')
+        if name is None:
+            return Priority.DEFAULT
+        try:
+            return Priority[str(name).upper()]
+        except KeyError:
+            log.warning('Unknown priority %r for submission %d, using %s', name, submission.id, Priority.DEFAULT.name)
+            return Priority.DEFAULT
+
+    def _baseline(self, submission: Submission) -> float:
+        return self._case_count(submission) * submission.time_limit
+
+    def _case_count(self, submission: Submission) -> int:
+        root_dir = get_problem_root(submission.problem_id)
+        if root_dir is None:
+            return 0
+        try:
+            mtime = os.path.getmtime(os.path.join(root_dir, 'init.yml'))
+        except OSError:
+            return 0
+
+        cached = self._case_counts.get(submission.problem_id)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            problem = Problem(submission.problem_id, submission.time_limit, submission.memory_limit, {})
+            cases = problem.cases()
+        except Exception:
+            # Whatever is wrong with the problem will be reported once it is graded.
+            return 0
+        case_count = sum(len(case.batched_cases) if isinstance(case, BatchedTestCase) else 1 for case in cases)
+        self._case_counts[submission.problem_id] = mtime, case_count
+        return case_count
+
+    def _sort_key(self, entry: _QueuedSubmission, now: float) -> Tuple[int, float, int]:
+        promotions = int((now - entry.enqueued_at) // self.aging_interval)
+        return max(entry.priority - promotions, Priority.CONTEST), entry.enqueued_at + entry.estimate, entry.sequence
+
+    def _record_grading_time(self, entry: _QueuedSubmission, elapsed: float) -> None:
+        if entry.baseline <= 0:
+            return
+        problem_id = entry.submission.problem_id
+        with self._condition:
+            ratio = self._history.get(problem_id, 1.0)
+            ratio += self.HISTORY_WEIGHT * (elapsed / entry.baseline - ratio)
+            self._history[problem_id] = ratio
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+            # The most urgent submission is only picked once it can start right away, so that one submitted while the
+            # judge is busy can still go first.
+            self.judge.acquire_slot()
+            with self._condition:
+                entry = None
+                if self._queue and not self._closed:
+                    now = time.monotonic()
+                    entry = min(self._queue, key=lambda entry: self._sort_key(entry, now))
+                    self._queue.remove(entry)
+
+            if entry is not None and entry.future.set_running_or_notify_cancel():
+                self._grade(entry)
+            else:
+                self.judge.release_slot()
+
+    def _grade(self, entry: _QueuedSubmission) -> None:
+        started = time.monotonic()
+        results = []
+        completed = False
+        try:
+            for ipc_type, data in self.judge.grade(entry.submission, slot_acquired=True):
+                if entry.on_event is not None:
+                    entry.on_event(ipc_type, data)
+                if ipc_type == IPC.RESULT:
+                    results.append(data)
+                elif ipc_type == IPC.GRADING_END:
+                    completed = True
+        except BaseException as e:
+            entry.future.set_exception(e)
+            return
+
+        # Compile errors and aborted submissions say nothing about how long the problem takes to grade.
+        if completed:
+            self._record_grading_time(entry, time.monotonic() - started)
+        entry.future.set_result(results)
@@ -0,0 +1,207 @@
+import multiprocessing
+import queue
+import threading
+from typing import Dict, Generator, List, Optional, Set, Tuple
+
+from dmoj.judge import FlattenedCases, IPC, JudgeWorker, Submission, flatten_cases, shard_case_numbers
+from dmoj.problem import BatchedTestCase, Problem
+from dmoj.result import Result
+
+
+class ShardCoordinator:
+    """
+    Grades one submission on several judges at once, each grading a shard of its cases, and merges what they report
+    into the stream a single judge would have sent.
+
+    A node is anything with the interface of a `JudgeWorker` (`start_grading`, `communicate`, `request_abort_grading`
+    and `close`); by default, the nodes are local worker processes, but a node relaying to a remote judge fits in the
+    same way. Every node compiles the submission itself, and learns which cases are its own from the `shard` key of
+    the submission's meta; batches are never split between nodes.
+
+    Results are passed on in case order. Under short-circuiting, every case after the first failure is reported as
+    SC, whichever node graded it, and each node is aborted as soon as it has reported all of its cases before the
+    failure. A batch depending on a failed batch is reported as SC as well, even if another node graded it.
+    """
+
+    def __init__(self, nodes: Optional[list] = None, shards: Optional[int] = None) -> None:
+        if nodes is None:
+            nodes = [JudgeWorker() for _ in range(shards or multiprocessing.cpu_count())]
+        self.nodes = nodes
+        self._lock = threading.Lock()
+        self._grading_nodes: list = []
+
+    def grade(self, submission: Submission) -> Generator[Tuple[IPC, tuple], None, None]:
+        problem = Problem(submission.problem_id, submission.time_limit, submission.memory_limit, submission.meta)
+        flattened_cases, batches = flatten_cases(problem.cases())
+        unit_count = len(
+            [
+                index
+                for index, (batch_number, _) in enumerate(flattened_cases)
+                if batch_number is None or index == 0 or flattened_cases[index - 1][0] != batch_number
+            ]
+        )
+        nodes = self.nodes[: max(1, min(len(self.nodes), unit_count))]
+        shard_cases = [shard_case_numbers(flattened_cases, shard, len(nodes)) for shard in range(len(nodes))]
+
+        events: 'queue.Queue[Tuple[int, Optional[Tuple[IPC, tuple]]]]' = queue.Queue()
+        relays = []
+        with self._lock:
+            self._grading_nodes = nodes
+        for shard, node in enumerate(nodes):
+            node.start_grading(submission._replace(meta={**submission.meta, 'shard': [shard, len(nodes)]}))
+            relay = threading.Thread(target=self._relay_thread_main, args=(shard, node, events), daemon=True)
+            relay.start()
+            relays.append(relay)
+
+        finished = False
+        try:
+            yield from self._merge(submission, flattened_cases, batches, nodes, shard_cases, events)
+            finished = True
+        finally:
+            if not finished:
+                for node in nodes:
+                    node.request_abort_grading()
+            for relay in relays:
+                relay.join()
+            with self._lock:
+                self._grading_nodes = []
+
+    def abort(self) -> None:
+        with self._lock:
+            nodes = list(self._grading_nodes)
+        for node in nodes:
+            node.request_abort_grading()
+
+    def close(self) -> None:
+        for node in self.nodes:
+            node.close()
+
+    @staticmethod
+    def _relay_thread_main(
+        shard: int, node, events: 'queue.Queue[Tuple[int, Optional[Tuple[IPC, tuple]]]]'
+    ) -> None:
+        try:
+            for event in node.communicate():
+                events.put((shard, event))
+        except Exception as e:
+            events.put((shard, (IPC.UNHANDLED_EXCEPTION, (repr(e),))))
+        finally:
+            events.put((shard, None))
+
+    def _merge(
+        self,
+        submission: Submission,
+        flattened_cases: FlattenedCases,
+        batches: Dict[int, BatchedTestCase],
+        nodes: list,
+        shard_cases: List[List[int]],
+        events: 'queue.Queue[Tuple[int, Optional[Tuple[IPC, tuple]]]]',
+    ) -> Generator[Tuple[IPC, tuple], None, None]:
+        results: Dict[int, Result] = {}
+        next_case = 1
+        short_circuit_at: Optional[int] = None
+        failed_batches: Set[BatchedTestCase] = set()
+        doomed_batches: Set[int] = set()
+        done_shards: Set[int] = set()
+        aborted_shards: Set[int] = set()
+        sent_begin = sent_compile_message = False
+        # Set once the submission as a whole ended early: a compile error, an abort or a crash on some node.
+        failed = False
+
+        def fail_others(shard: int) -> None:
+            for other_shard, node in enumerate(nodes):
+                if other_shard != shard and other_shard not in done_shards:
+                    aborted_shards.add(other_shard)
+                    node.request_abort_grading()
+
+        def is_short_circuited(case_number: int) -> bool:
+            if short_circuit_at is None or case_number <= short_circuit_at:
+                return False
+            # The rest of the failed case's batch is up to the node grading it, just as without sharding.
+            batch_number = flattened_cases[case_number - 1][0]
+            return batch_number is None or batch_number != flattened_cases[short_circuit_at - 1][0]
+
+        def abort_needless_shards() -> None:
+            if short_circuit_at is None:
+                return
+            for shard, case_numbers in enumerate(shard_cases):
+                if shard in done_shards or shard in aborted_shards or short_circuit_at in case_numbers:
+                    continue
+                if all(
+                    case_number < next_case or case_number in results
+                    for case_number in case_numbers
+                    if case_number < short_circuit_at
+                ):
+                    aborted_shards.add(shard)
+                    nodes[shard].request_abort_grading()
+
+        def ready_results() -> Generator[Tuple[IPC, tuple], None, None]:
+            nonlocal next_case
+            while next_case <= len(flattened_cases):
+                batch_number, case = flattened_cases[next_case - 1]
+                starts_batch = batch_number and (next_case == 1 or flattened_cases[next_case - 2][0] != batch_number)
+                if starts_batch and JudgeWorker._skip_batch_if_doomed(batches[batch_number], failed_batches):
+                    doomed_batches.add(batch_number)
+
+                if batch_number in doomed_batches or is_short_circuited(next_case):
+                    results.pop(next_case, None)
+                    result = Result(case, result_flag=Result.SC)
+                elif next_case in results:
+                    result = results.pop(next_case)
+                else:
+                    return
+
+                if starts_batch:
+                    yield IPC.BATCH_BEGIN, (batch_number,)
+                if result.result_flag & Result.WA and batch_number:
+                    failed_batches.add(batches[batch_number])
+                yield IPC.RESULT, (batch_number, next_case, result)
+                ends_batch = batch_number and (
+                    next_case == len(flattened_cases) or flattened_cases[next_case][0] != batch_number
+                )
+                if ends_batch:
+                    yield IPC.BATCH_END, (batch_number,)
+                next_case += 1
+
+        while len(done_shards) < len(nodes):
+            shard, event = events.get()
+            if event is None:
+                done_shards.add(shard)
+                continue
+            ipc_type, data = event
+            if failed or ipc_type in (IPC.HELLO, IPC.HEARTBEAT, IPC.BATCH_BEGIN, IPC.BATCH_END, IPC.GRADING_END):
+                continue
+
+            if ipc_type == IPC.COMPILE_MESSAGE:
+                if not sent_compile_message:
+                    sent_compile_message = True
+                    yield ipc_type, data
+            elif ipc_type == IPC.GRADING_BEGIN:
+                if not sent_begin:
+                    sent_begin = True
+                    yield ipc_type, data
+            elif ipc_type == IPC.RESULT:
+                _, case_number, result = data
+                if case_number >= next_case:
+                    results[case_number] = result
+                if result.result_flag & Result.WA and submission.short_circuit:
+                    if short_circuit_at is None or case_number < short_circuit_at:
+                        short_circuit_at = case_number
+                yield from ready_results()
+                abort_needless_shards()
+            elif ipc_type == IPC.GRADING_ABORTED and shard in aborted_shards:
+                # Done with the cases that still mattered.
+                continue
+            else:
+                # A compile error, an abort or a crash ends the whole submission.
+                failed = True
+                fail_others(shard)
+                yield ipc_type, data
+
+        if failed:
+            return
+        yield from ready_results()
+        if next_case <= len(flattened_cases):
+            yield IPC.UNHANDLED_EXCEPTION, (f'no node reported case {next_case}',)
+            return
+        yield IPC.GRADING_END, ()
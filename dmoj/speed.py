@@ -0,0 +1,102 @@
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from typing import Optional, Tuple
+
+from dmoj.judgeenv import env
+
+log = logging.getLogger('dmoj.speed')
+
+# The benchmark is run this many times, and the fastest run counts; slower ones were disturbed by something else.
+BENCHMARK_ROUNDS = 5
+
+# How many times slower than the reference node this node is; time limits are multiplied by it.
+_speed_factor = 1.0
+
+
+def _benchmark_workload() -> int:
+    # A mix of integer arithmetic, branching, and memory traffic through lists and dicts, like most submissions.
+    total = 0
+    for i in range(200000):
+        total = (total * 31 + i) % 1000000007
+    values = [(i * 7919) % 100003 for i in range(100000)]
+    values.sort()
+    counts: dict = {}
+    for value in values:
+        counts[value % 1024] = counts.get(value % 1024, 0) + 1
+    return total + len(counts)
+
+
+def run_benchmark(rounds: int = BENCHMARK_ROUNDS) -> float:
+    """Returns the CPU time, in seconds, of the fastest of `rounds` runs of the benchmark."""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.process_time()
+        _benchmark_workload()
+        best = min(best, time.process_time() - start)
+    return best
+
+
+def _machine() -> str:
+    # The benchmark result only carries over to the same CPU model running the same Python.
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo', 'r') as f:
+            cpu = next(line.split(':', 1)[1].strip() for line in f if line.startswith('model name'))
+    except (OSError, StopIteration):
+        pass
+    return f'{cpu} / Python {sys.version.split()[0]}'
+
+
+def _load_cached_benchmark(path: str) -> Optional[float]:
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+        if cached['machine'] == _machine():
+            return float(cached['benchmark_time'])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _save_benchmark(path: str, benchmark_time: float) -> None:
+    temp_path = f'{path}.tmp'
+    try:
+        with open(temp_path, 'w') as f:
+            json.dump({'machine': _machine(), 'benchmark_time': benchmark_time}, f)
+        os.replace(temp_path, path)
+    except OSError:
+        log.exception('Failed to save the speed benchmark to %s', path)
+
+
+def calibrate() -> float:
+    """
+    Sets this node's speed factor from how long the benchmark takes here against `speed_reference_time`, the time it
+    takes on the node time limits were set on, and returns it. The benchmark is only run if `speed_benchmark_file`
+    doesn't already hold its time on this machine. The factor stays 1 unless `speed_normalization` is on.
+    """
+    global _speed_factor
+    if not env.speed_normalization:
+        _speed_factor = 1.0
+        return _speed_factor
+
+    path = env.speed_benchmark_file
+    benchmark_time = _load_cached_benchmark(path) if path else None
+    if benchmark_time is None:
+        benchmark_time = run_benchmark()
+        if path:
+            _save_benchmark(path, benchmark_time)
+    _speed_factor = round(benchmark_time / env.speed_reference_time, 3)
+    log.info('Speed benchmark took %.3fs, setting the speed factor to %.3f', benchmark_time, _speed_factor)
+    return _speed_factor
+
+
+def get_speed_factor() -> float:
+    return _speed_factor
+
+
+def speed_factor() -> Tuple[str, float]:
+    return 'speed-factor', _speed_factor
@@ -0,0 +1,224 @@
+import itertools
+import multiprocessing
+import subprocess
+import tempfile
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+from dmoj.checkers import CheckerOutput
+from dmoj.error import InternalError
+from dmoj.executors import executors
+from dmoj.executors.base_executor import BaseExecutor
+from dmoj.problem import BatchedTestCase, Problem, TestCase
+from dmoj.result import CheckerResult, Result
+from dmoj.utils.helper_files import parse_helper_file_error
+from dmoj.utils.unicode import utf8bytes, utf8text
+
+Mismatch = NamedTuple(
+    'Mismatch',
+    [
+        ('seed', int),
+        ('input', bytes),
+        ('brute_output', bytes),
+        ('candidate_output', bytes),
+        ('verdict', str),
+        ('feedback', str),
+    ],
+)
+# Called with how many iterations are done so far.
+ProgressCallback = Callable[[int], None]
+
+# The tester whose iterations the processes of the pool run; inherited by them when they are forked.
+_tester: Optional['StressTester'] = None
+
+
+def _set_tester(tester: 'StressTester') -> None:
+    global _tester
+    _tester = tester
+
+
+def _run_iteration(seed: int) -> Optional[Mismatch]:
+    assert _tester is not None
+    return _tester.run_iteration(seed)
+
+
+class StressTester:
+    """
+    Looks for an input on which a candidate solution disagrees with a brute force.
+
+    Inputs come from the generator of one of the problem's cases, as `TestCase._run_generator` would run it, with a
+    fresh seed appended to its arguments every iteration. Both solutions are run on each input, and the output of the
+    candidate is checked against that of the brute force with the case's checker. The generator and both solutions
+    are compiled once, before `processes` worker processes, one per core by default, are forked to run iterations.
+    """
+
+    # Iterations each process is handed at a time.
+    CHUNK_SIZE = 16
+
+    def __init__(
+        self,
+        problem_id: str,
+        brute: Tuple[str, str],
+        candidate: Tuple[str, str],
+        time_limit: float,
+        memory_limit: int,
+        case_number: Optional[int] = None,
+        processes: Optional[int] = None,
+    ) -> None:
+        self.problem = Problem(problem_id, time_limit, memory_limit, {})
+        self.case = self._find_generated_case(case_number)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.candidate_source = candidate[1]
+        self.candidate_language = candidate[0]
+
+        self.generator, self.generator_args, self.generator_time_limit, self.generator_memory_limit = (
+            self.case._compile_generator(self.case.config.generator, args=self.case.config.generator_args)
+        )
+        self.brute = self._compile_solution(*brute)
+        self.candidate = self._compile_solution(*candidate)
+
+    def run(
+        self, iterations: Optional[int] = None, first_seed: int = 1, on_progress: Optional[ProgressCallback] = None
+    ) -> Tuple[int, Optional[Mismatch]]:
+        """
+        Runs up to `iterations` iterations, forever if None, with seeds counting up from `first_seed`. Returns how many
+        ran, and the mismatch found, if any; of the mismatches found in the last round of iterations, the one with the
+        smallest input is picked.
+        """
+        done = 0
+        round_size = self.processes * self.CHUNK_SIZE
+        with multiprocessing.Pool(self.processes, initializer=_set_tester, initargs=(self,)) as pool:
+            for round_start in itertools.count(first_seed, round_size):
+                if iterations is not None:
+                    round_size = min(round_size, iterations - done)
+                    if round_size <= 0:
+                        break
+                seeds = range(round_start, round_start + round_size)
+                mismatches: List[Mismatch] = [
+                    mismatch
+                    for mismatch in pool.imap_unordered(_run_iteration, seeds, chunksize=self.CHUNK_SIZE)
+                    if mismatch is not None
+                ]
+                done += len(seeds)
+                if on_progress is not None:
+                    on_progress(done)
+                if mismatches:
+                    return done, min(mismatches, key=lambda mismatch: (len(mismatch.input), mismatch.seed))
+        return done, None
+
+    def run_iteration(self, seed: int) -> Optional[Mismatch]:
+        input = self._generate(seed)
+        brute_result = self._run_solution(self.brute, input)
+        if brute_result.result_flag:
+            raise InternalError(
+                f'brute force failed with {brute_result.readable_codes()[0]} on seed {seed}: {brute_result.feedback}'
+            )
+
+        result = self._run_solution(self.candidate, input)
+        if not result.result_flag:
+            check = self._check(input, brute_result.proc_output, result)
+            if not isinstance(check, CheckerResult):
+                check = CheckerResult(bool(check), self.case.points if check else 0.0)
+            if check.passed:
+                return None
+            result.result_flag |= Result.WA
+            result.feedback = check.feedback or result.feedback
+        return Mismatch(
+            seed, input, brute_result.proc_output, result.proc_output, result.readable_codes()[0], result.feedback
+        )
+
+    def _find_generated_case(self, case_number: Optional[int]) -> TestCase:
+        cases: List[TestCase] = []
+        for case in self.problem.cases():
+            cases.extend(case.batched_cases if isinstance(case, BatchedTestCase) else [case])  # type: ignore
+        if case_number is not None:
+            if not 1 <= case_number <= len(cases):
+                raise ValueError(f'problem has no case {case_number}')
+            if not cases[case_number - 1].config.generator:
+                raise ValueError(f'case {case_number} has no generator')
+            return cases[case_number - 1]
+        for case in cases:
+            if case.config.generator:
+                return case
+        raise ValueError('problem has no generator')
+
+    def _compile_solution(self, language: str, source: str) -> BaseExecutor:
+        return executors[language].Executor(
+            self.problem.id,
+            utf8bytes(source),
+            hints=self.problem.config.hints or [],
+            unbuffered=self.problem.config.unbuffered,
+        )
+
+    def _generate(self, seed: int) -> bytes:
+        proc = self.generator.launch(
+            *map(str, self.generator_args + [seed]),
+            time=self.generator_time_limit,
+            memory=self.generator_memory_limit,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        input, stderr = proc.communicate()
+        parse_helper_file_error(
+            proc, self.generator, 'generator', stderr, self.generator_time_limit, self.generator_memory_limit
+        )
+        return input
+
+    def _run_solution(self, binary: BaseExecutor, input: bytes) -> Result:
+        result = Result(self.case)
+        wall_time = self.case.config.wall_time_factor * self.problem.time_limit
+        # `launch` waits for the process itself, so the input has to be there from the start, as the graders do it.
+        with tempfile.TemporaryFile() as input_file:
+            input_file.write(input)
+            input_file.seek(0)
+            proc = binary.launch(
+                time=self.problem.time_limit,
+                memory=self.problem.memory_limit,
+                stdin=input_file,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                wall_time=wall_time,
+            )
+        try:
+            result.proc_output, error = proc.communicate(None, timeout=wall_time)
+        except subprocess.TimeoutExpired:
+            error = b''
+            proc.kill()
+            result.result_flag |= Result.TLE
+        finally:
+            proc.wait()
+        binary.populate_result(error, result, proc)
+        return result
+
+    def _check(self, input: bytes, expected: bytes, result: Result) -> CheckerOutput:
+        case = self.case
+        try:
+            return case.checker()(
+                result.proc_output,
+                expected,
+                submission_source=utf8bytes(self.candidate_source),
+                judge_input=lambda: input,
+                point_value=case.points,
+                case_position=case.position,
+                batch=case.batch,
+                submission_language=self.candidate_language,
+                binary_data=case.has_binary_data,
+                execution_time=result.execution_time,
+                problem_id=self.problem.id,
+                case=case,
+                result=result,
+            )
+        except UnicodeDecodeError:
+            return CheckerResult(False, 0, feedback='invalid unicode')
+
+
+def describe_mismatch(mismatch: Mismatch, limit: int = 200) -> str:
+    def excerpt(data: bytes) -> str:
+        text = utf8text(data[:limit], 'replace')
+        return text + ('...' if len(data) > limit else '')
+
+    lines = [f'Seed {mismatch.seed}: {mismatch.verdict}' + (f' ({mismatch.feedback})' if mismatch.feedback else '')]
+    lines.append(f'Input:\n{excerpt(mismatch.input)}')
+    lines.append(f'Brute force output:\n{excerpt(mismatch.brute_output)}')
+    lines.append(f'Candidate output:\n{excerpt(mismatch.candidate_output)}')
+    return '\n'.join(lines)
@@ -1,6 +1,8 @@
 import os
 from multiprocessing import cpu_count as _get_cpu_count
 
+from dmoj.speed import speed_factor
+
 _cpu_count = _get_cpu_count()
 
 
@@ -30,4 +32,24 @@ def cpu_count():
     return 'cpu-count', _cpu_count
 
 
-report_callbacks = [load_fair, cpu_count]
+def memory_pressure():
+    # Share of the last 10 seconds some task spent stalled on memory, see Documentation/accounting/psi.rst.
+    try:
+        with open('/proc/pressure/memory', 'r') as f:
+            some = f.readline().split()
+        pressure = float(dict(field.split('=') for field in some[1:])['avg10'])
+    except (OSError, KeyError, ValueError):
+        pressure = -1
+    return 'memory-pressure', pressure
+
+
+def memory_available():
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            available = next(int(line.split()[1]) for line in f if line.startswith('MemAvailable:'))
+    except (OSError, StopIteration, ValueError):
+        available = -1
+    return 'memory-available', available
+
+
+report_callbacks = [load_fair, cpu_count, memory_pressure, memory_available, speed_factor]
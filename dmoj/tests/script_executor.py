@@ -0,0 +1,27 @@
+import os
+import sys
+from typing import List
+
+from dmoj.executors.base_executor import BaseExecutor
+from dmoj.utils.unicode import utf8bytes
+
+
+class ScriptExecutor(BaseExecutor):
+    """Runs a Python script through the real `BaseExecutor.launch`, for tests that need actual processes."""
+
+    ext = 'py'
+
+    def __init__(self, source: str) -> None:
+        super().__init__('script', utf8bytes(source))
+        with open(self._file('script.py'), 'wb') as script:
+            script.write(self.source)
+
+    def get_executable(self) -> str:
+        return sys.executable
+
+    def get_cmdline(self, **kwargs) -> List[str]:
+        return [sys.executable, os.path.join(self._dir, 'script.py')]
+
+    @classmethod
+    def get_runtime_versions(cls):
+        return [('python', sys.version_info[:3])]
@@ -0,0 +1,109 @@
+import multiprocessing
+import unittest
+from unittest import mock
+
+from dmoj.admission import AdmissionController, load_factor
+from dmoj.judgeenv import env
+
+
+class AdmissionTest(unittest.TestCase):
+    def setUp(self):
+        self.load = 0.5
+        self.pressure = 0.0
+        self.available = 4194304
+        patches = [
+            mock.patch('dmoj.admission.sysinfo.load_fair', lambda: ('load', self.load)),
+            mock.patch('dmoj.admission.sysinfo.memory_pressure', lambda: ('memory-pressure', self.pressure)),
+            mock.patch('dmoj.admission.sysinfo.memory_available', lambda: ('memory-available', self.available)),
+            mock.patch('dmoj.admission.sysinfo.cpu_count', lambda: ('cpu-count', 4)),
+            # Whatever slots other tests left held don't count here.
+            mock.patch('dmoj.admission._held_slots', multiprocessing.Value('i', 0)),
+            mock.patch.dict(env.raw_config, {'admission_control': True, 'admission_refresh_interval': 0}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_disabled(self):
+        self.load = 4.0
+        with mock.patch.dict(env.raw_config, {'admission_control': False}):
+            self.assertEqual(load_factor(), (1.0, ''))
+
+    def test_load_factor(self):
+        self.assertEqual(load_factor(), (1.0, ''))
+        self.load = 2.0
+        self.assertEqual(load_factor(), (0.5, 'load 2.00 per core'))
+        self.pressure = 40.0
+        self.assertEqual(load_factor()[0], 0.25)
+        self.available = 1024
+        self.assertEqual(load_factor()[0], 0.0)
+
+    def test_caps_are_logged_when_they_change(self):
+        controller = AdmissionController('parallel cases')
+        with self.assertLogs('dmoj.admission') as logs:
+            self.assertEqual(controller.capped(8), 8)
+            self.load = 2.0
+            self.assertEqual(controller.capped(8), 4)
+            self.assertEqual(controller.capped(8), 4)
+            self.available = 0
+            self.assertEqual(controller.capped(8), 1)
+            self.load, self.available = 0.5, 4194304
+            self.assertEqual(controller.capped(8), 8)
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            [
+                'Admission control: parallel cases capped at 4 of 8 (load 2.00 per core)',
+                'Admission control: parallel cases capped at 1 of 8 (load 2.00 per core, 0 KB of memory available)',
+                'Admission control: parallel cases capped at 8 of 8 (load back to normal)',
+            ],
+        )
+        self.assertEqual([record.levelname for record in logs.records], ['WARNING', 'WARNING', 'INFO'])
+
+    def test_slots(self):
+        controller = AdmissionController('grading slots', 4)
+        self.load = 2.0
+        with self.assertLogs('dmoj.admission'):
+            self.assertTrue(controller.try_acquire())
+            self.assertTrue(controller.try_acquire())
+            self.assertFalse(controller.try_acquire())
+            controller.release()
+            self.assertTrue(controller.try_acquire())
+            self.load = 0.5
+            self.assertTrue(controller.try_acquire())
+
+            for _ in range(3):
+                controller.release()
+
+    def test_judges_own_load_is_not_held_against_it(self):
+        controller = AdmissionController('grading slots', 4)
+        with self.assertLogs('dmoj.admission') as logs:
+            for held in range(4):
+                # Every slot held keeps one of the four cores busy.
+                self.load = held / 4
+                self.assertTrue(controller.try_acquire())
+            self.load = 1.0
+            self.assertEqual(controller.capped(4), 4)
+            self.assertFalse(controller.try_acquire())
+
+            # Two more cores' worth of load from outside the judge is, though.
+            controller.release()
+            self.load = 2.75
+            self.assertEqual(controller.capped(4), 2)
+            for _ in range(3):
+                controller.release()
+        self.assertEqual(
+            [record.getMessage() for record in logs.records],
+            ['Admission control: grading slots capped at 2 of 4 (load 2.00 per core)'],
+        )
+
+    def test_parallel_cases_are_not_held_against_the_judge(self):
+        grading = AdmissionController('grading slots', 1)
+        cases = AdmissionController('parallel cases')
+        with self.assertLogs('dmoj.admission'):
+            self.assertTrue(grading.try_acquire())
+            # A submission running four cases at once, along with another core's worth of load from elsewhere.
+            with cases.holding(3):
+                self.load = 2.0
+                self.assertEqual(cases.capped(4), 4)
+            self.assertEqual(cases.capped(4), 2)
+            grading.release()
@@ -0,0 +1,133 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from dmoj.async_judge import AsyncJudge
+from dmoj.judge import IPC, Submission
+from dmoj.judgeenv import env
+from dmoj.result import Result
+
+
+class FakeCase:
+    points = 1
+    output_prefix_length = 0
+
+    def __init__(self, position, delay):
+        self.position = position
+        self.delay = delay
+
+
+class FakeGrader:
+    def __init__(self, judge, problem, language, source):
+        self.binary = None
+
+    def grade(self, case):
+        time.sleep(case.delay)
+        return Result(case)
+
+    def abort_grading(self):
+        pass
+
+
+class FakeProblem:
+    grader_class = FakeGrader
+    run_pretests_only = False
+
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        self.delay = meta.get('delay', 0)
+
+    def cases(self):
+        return [FakeCase(position, self.delay) for position in range(3)]
+
+
+def make_submission(id, delay=0.0):
+    return Submission(id, 'fake', 'CPP20', '', 1.0, 65536, False, {'delay': delay})
+
+
+class AsyncJudgeTest(unittest.TestCase):
+    def setUp(self):
+        self.problem_patch = mock.patch('dmoj.judge.Problem', FakeProblem)
+        self.problem_patch.start()
+
+    def tearDown(self):
+        self.problem_patch.stop()
+
+    def test_grade_concurrently(self):
+        async def main():
+            judge = AsyncJudge(slots=2)
+            try:
+
+                async def collect(submission):
+                    return [event async for event in judge.grade(submission)]
+
+                return await asyncio.gather(collect(make_submission(1)), collect(make_submission(2)))
+            finally:
+                judge.close()
+
+        for events in asyncio.run(main()):
+            self.assertEqual([ipc_type for ipc_type, _ in events if ipc_type == IPC.RESULT], [IPC.RESULT] * 3)
+            self.assertEqual(events[-1], (IPC.GRADING_END, ()))
+
+    def test_cancellation_frees_slot(self):
+        async def main():
+            judge = AsyncJudge(slots=1)
+            try:
+
+                async def consume():
+                    async for _ in judge.grade(make_submission(1, delay=0.2)):
+                        pass
+
+                task = asyncio.create_task(consume())
+                while not judge.current_judge_workers:
+                    await asyncio.sleep(0.01)
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+
+                # The slot comes back once the worker acknowledges the abort.
+                events = await asyncio.wait_for(self._collect(judge, make_submission(2)), 10)
+                self.assertEqual(events[-1], (IPC.GRADING_END, ()))
+            finally:
+                judge.close()
+
+        asyncio.run(main())
+
+    def test_failing_to_start_a_worker_frees_slot(self):
+        async def main():
+            judge = AsyncJudge(slots=1)
+            try:
+                with mock.patch.object(judge._worker_pool, 'acquire', side_effect=OSError('fork failed')):
+                    with self.assertRaises(OSError):
+                        await self._collect(judge, make_submission(1))
+                events = await asyncio.wait_for(self._collect(judge, make_submission(2)), 10)
+                self.assertEqual(events[-1], (IPC.GRADING_END, ()))
+            finally:
+                judge.close()
+
+        asyncio.run(main())
+
+    def test_problem_updates_and_warmup(self):
+        async def main():
+            judge = AsyncJudge(slots=1)
+            try:
+                # The warmup at startup replaces the workers once it is done.
+                judge.warmup.wait(10)
+                await self._collect(judge, make_submission(1))
+                self.assertEqual(list(judge.warmup._current_scores()), ['fake'])
+                [worker] = judge._worker_pool._idle_workers
+
+                # Workers forked before the update are replaced, rather than grading with what they loaded.
+                judge.update_problems()
+                events = await asyncio.wait_for(self._collect(judge, make_submission(2)), 10)
+                self.assertEqual(events[-1], (IPC.GRADING_END, ()))
+                self.assertIsNot(judge._worker_pool._idle_workers[0], worker)
+            finally:
+                judge.close()
+
+        with mock.patch.dict(env.raw_config, {'warmup_problems': 1}):
+            asyncio.run(main())
+
+    @staticmethod
+    async def _collect(judge, submission):
+        return [event async for event in judge.grade(submission)]
@@ -0,0 +1,116 @@
+import os
+import threading
+import unittest
+from unittest import mock
+
+from dmoj.bulk_rejudge import BulkRejudge
+from dmoj.config import ConfigNode
+from dmoj.judge import IPC, Judge, Submission
+from dmoj.result import Result
+
+
+class FakeCase:
+    points = 1
+    output_prefix_length = 0
+
+    def __init__(self, position):
+        self.position = position
+
+
+class FakeGrader:
+    def __init__(self, judge, problem, language, source):
+        self.binary = None
+        self.source = source
+
+    def grade(self, case):
+        flag = Result.AC if self.source == b'good' else Result.WA
+        return Result(case, result_flag=flag, execution_time=os.getpid())
+
+    def abort_grading(self):
+        pass
+
+
+class FakeProblem:
+    grader_class = FakeGrader
+    run_pretests_only = False
+    preloads = 0
+
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        self.id = problem_id
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.meta = ConfigNode(meta)
+
+    def preload(self):
+        FakeProblem.preloads += 1
+
+    def cases(self):
+        return [FakeCase(0), FakeCase(1)]
+
+
+def refuse_to_load(*args):
+    raise AssertionError('workers should use the preloaded problem')
+
+
+def make_submission(id, source, problem_id='fake'):
+    return Submission(id, problem_id, 'CPP20', source, 1.0, 65536, False, {})
+
+
+class BulkRejudgeTest(unittest.TestCase):
+    def setUp(self):
+        FakeProblem.preloads = 0
+        patches = [
+            mock.patch('dmoj.bulk_rejudge.Problem', FakeProblem),
+            mock.patch('dmoj.judge.Problem', refuse_to_load),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def make_judge(self, slots):
+        judge = Judge(slots=slots)
+        self.addCleanup(judge.murder)
+        return judge
+
+    def test_rejudge(self):
+        submissions = [make_submission(1, 'good'), make_submission(2, 'bad'), make_submission(3, 'good')]
+        progress = []
+        outcomes = BulkRejudge(self.make_judge(2)).rejudge(
+            submissions, on_progress=lambda done, total, submission, events: progress.append((done, total))
+        )
+
+        self.assertEqual(FakeProblem.preloads, 1)
+        self.assertEqual(progress, [(1, 3), (2, 3), (3, 3)])
+        self.assertEqual(sorted(outcomes), [1, 2, 3])
+        # Identical sources are graded once, and share the outcome.
+        self.assertIs(outcomes[1], outcomes[3])
+        for sub_id, flag in ((1, Result.AC), (2, Result.WA)):
+            results = [data[2] for ipc_type, data in outcomes[sub_id] if ipc_type == IPC.RESULT]
+            self.assertEqual([result.result_flag for result in results], [flag, flag])
+            self.assertEqual(outcomes[sub_id][-1][0], IPC.GRADING_END)
+
+    def test_rejudge_is_limited_to_one_problem(self):
+        submissions = [make_submission(1, 'good'), make_submission(2, 'good', problem_id='other')]
+        with self.assertRaises(ValueError):
+            BulkRejudge(self.make_judge(1)).rejudge(submissions)
+
+    def test_rejudge_waits_for_grading_slots(self):
+        judge = self.make_judge(1)
+        outcomes = {}
+        judge.acquire_slot()
+        thread = threading.Thread(
+            target=lambda: outcomes.update(BulkRejudge(judge).rejudge([make_submission(1, 'good')], on_progress=None))
+        )
+        thread.start()
+        thread.join(0.5)
+        # The submission being graded elsewhere holds the only slot.
+        self.assertEqual(outcomes, {})
+        judge.release_slot()
+        thread.join(10)
+        self.assertEqual(outcomes[1][-1], (IPC.GRADING_END, ()))
+
+    def test_abort(self):
+        rejudge = BulkRejudge(self.make_judge(1))
+        rejudge.abort()
+        outcomes = rejudge.rejudge([make_submission(1, 'good')], on_progress=None)
+        self.assertEqual(outcomes, {1: [(IPC.GRADING_ABORTED, ())]})
@@ -0,0 +1,115 @@
+import os
+import tempfile
+import unittest
+from functools import partial
+from unittest import mock
+
+import yaml
+
+from dmoj import checkers
+from dmoj.calibrate import Run, Solution, TimeLimitCalibrator
+from dmoj.config import ConfigNode
+from dmoj.tests.script_executor import ScriptExecutor
+
+SOLUTIONS = {
+    'fast': 'print(2 * int(input()))',
+    'slow': 'n = int(input())\nwhile sum(range(400000 * n)) < 0:\n    pass\nprint(2 * n)',
+    'wrong': 'print(int(input()) + 3)',
+}
+
+
+class FakeCase:
+    points = 1
+    batch = 0
+    has_binary_data = False
+
+    def __init__(self, position, n):
+        self.position = position
+        self.n = n
+        self.config = ConfigNode({'in': f'{position}.in', 'wall_time_factor': 3, 'symlinks': {}})
+
+    def input_data(self):
+        return b'%d\n' % self.n
+
+    def output_data(self):
+        return b'%d\n' % (2 * self.n)
+
+    def checker(self):
+        return partial(checkers.standard.check)
+
+
+class FakeProblem:
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        self.id = problem_id
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.config = ConfigNode({})
+        self.root_dir = ''
+
+    def preload(self):
+        pass
+
+    def cases(self):
+        return [FakeCase(0, 1), FakeCase(1, 20), FakeCase(2, 2)]
+
+
+class TimeLimitCalibratorTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch('dmoj.calibrate.Problem', FakeProblem),
+            mock.patch.object(
+                TimeLimitCalibrator, '_compile_solution', lambda self, solution: ScriptExecutor(solution.source)
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def make_calibrator(self, *names):
+        solutions = [Solution(f'{name}.py', 'PY3', SOLUTIONS[name]) for name in names]
+        return TimeLimitCalibrator('fake', solutions, repetitions=2, factor=1.5, time_limit=5.0, processes=2)
+
+    def test_runs_measure_cpu_time(self):
+        calibrator = self.make_calibrator('fast', 'slow')
+        progress = []
+        runs = calibrator.run(on_progress=lambda done, total: progress.append((done, total)))
+        self.assertEqual(progress[-1], (12, 12))
+        self.assertEqual({run.verdict for run in runs}, {'AC'})
+
+        report = calibrator.report(runs)
+        slow = report['solutions'][1]
+        self.assertEqual(slow['slowest_case'], 2)
+        self.assertTrue(all(time > 0 for case in slow['cases'] for time in case['times']))
+        # Counting up to eight million takes a while, unlike starting Python to print a number.
+        self.assertGreater(slow['slowest_median'], report['solutions'][0]['cases'][1]['median'])
+        self.assertGreater(report['proposed_time_limit'], 0.1)
+
+    def test_failing_solution_is_reported(self):
+        calibrator = self.make_calibrator('wrong')
+        report = calibrator.report(calibrator.run())
+        self.assertEqual(report['solutions'][0]['failed_cases'], [1, 2, 3])
+        self.assertEqual(report['solutions'][0]['cases'][0]['verdicts'], ['WA'])
+
+    def test_proposed_time_limit(self):
+        calibrator = self.make_calibrator('fast', 'slow')
+        runs = [Run(0, case, 0.01 * (case + 1), 'AC') for case in range(3) for _ in range(3)]
+        runs += [Run(1, 1, time, 'AC') for time in (0.4, 0.5, 0.9)]
+        report = calibrator.report(runs)
+        self.assertEqual([solution['slowest_case'] for solution in report['solutions']], [3, 2])
+        # 0.5s on the slowest case, times 1.5.
+        self.assertEqual(report['proposed_time_limit'], 0.8)
+
+        case = report['solutions'][1]['cases'][0]
+        self.assertEqual(case['input'], '1.in')
+        self.assertEqual((case['min'], case['median'], case['max']), (0.4, 0.5, 0.9))
+        self.assertEqual(case['times'], [0.4, 0.5, 0.9])
+
+    def test_report_is_written_next_to_init(self):
+        calibrator = self.make_calibrator('fast')
+        report = calibrator.report([Run(0, 0, 0.05, 'AC')])
+        with tempfile.TemporaryDirectory() as root_dir:
+            calibrator.problem.root_dir = root_dir
+            path = calibrator.write_report(report)
+            self.assertEqual(path, os.path.join(root_dir, 'calibration.yml'))
+            with open(path) as report_file:
+                self.assertEqual(yaml.safe_load(report_file), report)
@@ -0,0 +1,59 @@
+import subprocess
+import time
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, JudgeWorker, Submission
+from dmoj.utils import cancellation
+from dmoj.utils.cancellation import CancellationToken
+
+
+class FakeGrader:
+    def __init__(self, judge, problem, language, source):
+        # Stands in for a compiler that takes forever.
+        cancellation.track(subprocess.Popen(['sleep', '30'])).wait()
+        self.binary = None
+
+    def abort_grading(self):
+        pass
+
+
+class FakeProblem:
+    grader_class = FakeGrader
+    run_pretests_only = False
+
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        pass
+
+
+class CancellationTokenTest(unittest.TestCase):
+    def test_cancel_kills_tracked_processes(self):
+        token = CancellationToken()
+        process = token.track(subprocess.Popen(['sleep', '30']))
+        token.cancel()
+        self.assertEqual(process.wait(1), -9)
+        self.assertTrue(token.cancelled)
+
+    def test_track_after_cancel_kills_immediately(self):
+        token = CancellationToken()
+        token.cancel()
+        process = token.track(subprocess.Popen(['sleep', '30']))
+        self.assertEqual(process.wait(1), -9)
+
+
+class AbortCompileTest(unittest.TestCase):
+    def test_abort_during_compile(self):
+        with mock.patch('dmoj.judge.Problem', FakeProblem):
+            worker = JudgeWorker()
+        self.addCleanup(worker.close)
+
+        worker.start_grading(Submission(1, 'fake', 'CPP20', '', 1.0, 65536, False, {}))
+        events = worker.communicate()
+        self.assertEqual(next(events), (IPC.HELLO, ()))
+        time.sleep(0.2)
+
+        start = time.monotonic()
+        worker.request_abort_grading()
+        self.assertEqual(list(events), [(IPC.GRADING_ABORTED, ())])
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertTrue(worker.is_alive())
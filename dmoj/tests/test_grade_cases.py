@@ -0,0 +1,355 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from dmoj import admission
+from dmoj.config import ConfigNode
+from dmoj.failure_history import FailureHistory
+from dmoj.judge import IPC, JudgeWorker, Submission
+from dmoj.judgeenv import env
+from dmoj.problem import BatchedTestCase, ProblemDataManager, TestCase as ProblemTestCase
+from dmoj.result import Result
+from dmoj.utils import tracing
+from dmoj.utils.cancellation import CancellationToken
+
+
+class FakeCase:
+    output_prefix_length = 0
+
+    def __init__(self, position, flag=Result.AC, delay=0.0, points=1, check_delay=0.0):
+        self.position = position
+        self.flag = flag
+        self.delay = delay
+        self.points = points
+        self.check_delay = check_delay
+
+    def free_data(self):
+        pass
+
+
+class FakeTestCase(ProblemTestCase, FakeCase):
+    def __init__(self, position, input_file, is_pretest=False, points=1):
+        FakeCase.__init__(self, position, points=points)
+        self.config = ConfigNode({'in': input_file})
+        self.has_binary_data = False
+        self.is_pretest = is_pretest
+
+    def free_data(self):
+        pass
+
+
+class FakeBatch(BatchedTestCase):
+    def __init__(self, cases, dependency_batches=()):
+        self.batched_cases = cases
+        self.dependency_batches = list(dependency_batches)
+        self.points = 1
+
+
+class FakeGrader:
+    supports_parallel_cases = True
+
+    def __init__(self):
+        self.graded = []
+        self.lock = threading.Lock()
+
+    def grade(self, case):
+        with self.lock:
+            self.graded.append(case.position)
+        time.sleep(case.delay)
+        return Result(case, result_flag=case.flag, points=0 if case.flag else case.points)
+
+    def abort_case(self, thread_ident):
+        pass
+
+
+class FakePipelinedGrader(FakeGrader):
+    supports_pipelined_checking = True
+
+    def __init__(self):
+        super().__init__()
+        self.aborted = []
+
+    def run_case(self, case):
+        with self.lock:
+            self.graded.append(case.position)
+        time.sleep(case.delay)
+        return Result(case)
+
+    def check_case(self, case, result):
+        time.sleep(case.check_delay)
+        result.result_flag = case.flag
+        result.points = 0 if case.flag else case.points
+        return result
+
+    def abort_case(self, thread_ident):
+        self.aborted.append(thread_ident)
+
+
+class FakeProblem:
+    run_pretests_only = False
+
+    def __init__(self, cases, config=None, root_dir=None):
+        self.id = 'fake'
+        self._cases = cases
+        self.config = ConfigNode(config or {})
+        self.root_dir = root_dir
+        self.problem_data = ProblemDataManager(root_dir) if root_dir else None
+
+    def cases(self):
+        return self._cases
+
+
+def make_worker(problem, short_circuit=True, grader_class=FakeGrader):
+    worker = JudgeWorker.__new__(JudgeWorker)
+    worker.submission = Submission(1, 'fake', 'CPP20', '', 1.0, 65536, short_circuit, {})
+    worker.problem = None
+    worker.cancellation_token = CancellationToken()
+    worker._case_hints = {}
+    worker._phase_stacks = {}
+    worker._phase_lock = threading.Lock()
+    worker.grader = grader_class()
+    problem.grader_class = lambda *args: worker.grader
+    worker.grader.binary = None
+    return worker
+
+
+def run(worker, problem):
+    with mock.patch('dmoj.judge.Problem', lambda *args: problem):
+        return list(worker._grade_cases())
+
+
+def results_of(messages):
+    return [(data[0], data[1], data[2].result_flag) for ipc_type, data in messages if ipc_type == IPC.RESULT]
+
+
+class GradeCasesTest(unittest.TestCase):
+    def test_sequential_short_circuit(self):
+        problem = FakeProblem([FakeCase(0), FakeCase(1, Result.WA), FakeCase(2)])
+        worker = make_worker(problem)
+        messages = run(worker, problem)
+        self.assertEqual(results_of(messages), [(None, 1, Result.AC), (None, 2, Result.WA), (None, 3, Result.SC)])
+        self.assertEqual(worker.grader.graded, [0, 1])
+
+    def test_parallel_results_in_case_order(self):
+        cases = [FakeCase(i, delay=0.05 * (4 - i)) for i in range(4)]
+        problem = FakeProblem(cases, {'parallel_cases': 4})
+        worker = make_worker(problem)
+        with mock.patch('dmoj.judge.multiprocessing.cpu_count', return_value=4):
+            messages = run(worker, problem)
+        self.assertEqual([case for _, case, _ in results_of(messages)], [1, 2, 3, 4])
+        self.assertEqual(messages[-1], (IPC.GRADING_END, ()))
+
+    def test_parallel_cases_are_held_while_running(self):
+        held = []
+        held_before = admission._held_slots.value
+        problem = FakeProblem([FakeCase(i) for i in range(4)], {'parallel_cases': 4})
+        worker = make_worker(problem)
+        grade = worker.grader.grade
+        worker.grader.grade = lambda case: held.append(admission._held_slots.value) or grade(case)
+        with mock.patch('dmoj.judge.multiprocessing.cpu_count', return_value=4):
+            run(worker, problem)
+        self.assertEqual(held, [held_before + 3] * 4)
+        self.assertEqual(admission._held_slots.value, held_before)
+
+    def test_parallel_short_circuit_matches_sequential(self):
+        def make_cases():
+            return [FakeCase(0, delay=0.1), FakeCase(1, Result.WA), FakeCase(2, delay=0.1), FakeCase(3, Result.WA)]
+
+        sequential = FakeProblem(make_cases())
+        parallel = FakeProblem(make_cases(), {'parallel_cases': 4})
+        with mock.patch('dmoj.judge.multiprocessing.cpu_count', return_value=4):
+            self.assertEqual(
+                results_of(run(make_worker(parallel), parallel)),
+                results_of(run(make_worker(sequential), sequential)),
+            )
+
+    def test_parallel_disabled_for_unsupported_graders(self):
+        problem = FakeProblem([FakeCase(0)], {'parallel_cases': 4})
+        worker = make_worker(problem)
+        worker.grader.supports_parallel_cases = False
+        self.assertEqual(worker._case_parallelism(problem), 1)
+
+    def _dependency_problem(self, config=None):
+        batch1 = FakeBatch([FakeCase(0), FakeCase(1, Result.WA)])
+        batch2 = FakeBatch([FakeCase(2), FakeCase(3)], [batch1])
+        batch3 = FakeBatch([FakeCase(4)])
+        batch4 = FakeBatch([FakeCase(5)], [batch2])
+        batch5 = FakeBatch([FakeCase(6)], [batch3])
+        return FakeProblem([batch1, batch2, batch3, batch4, batch5], config)
+
+    def _assert_dependencies_honored(self, config=None, grader_class=FakeGrader):
+        problem = self._dependency_problem(config)
+        worker = make_worker(problem, short_circuit=False, grader_class=grader_class)
+        with mock.patch('dmoj.judge.multiprocessing.cpu_count', return_value=4):
+            messages = run(worker, problem)
+        self.assertEqual(
+            results_of(messages),
+            [
+                (1, 1, Result.AC),
+                (1, 2, Result.WA),
+                (2, 3, Result.SC),
+                (2, 4, Result.SC),
+                (3, 5, Result.AC),
+                (4, 6, Result.SC),
+                (5, 7, Result.AC),
+            ],
+        )
+        self.assertEqual(sorted(worker.grader.graded), [0, 1, 4, 6])
+
+    def test_failed_dependencies_skip_batches(self):
+        self._assert_dependencies_honored()
+
+    def test_failed_dependencies_skip_batches_in_parallel(self):
+        self._assert_dependencies_honored({'parallel_cases': 4})
+
+    def test_failed_dependencies_skip_batches_when_pipelined(self):
+        self._assert_dependencies_honored({'pipelined_checking': True}, FakePipelinedGrader)
+
+    def test_pipelined_short_circuit_matches_sequential(self):
+        def make_cases():
+            return [FakeCase(0, check_delay=0.1), FakeCase(1, Result.WA, check_delay=0.1), FakeCase(2), FakeCase(3)]
+
+        sequential = FakeProblem(make_cases())
+        pipelined = FakeProblem(make_cases(), {'pipelined_checking': True})
+        worker = make_worker(pipelined, grader_class=FakePipelinedGrader)
+        self.assertEqual(results_of(run(worker, pipelined)), results_of(run(make_worker(sequential), sequential)))
+        # The case after the failure ran while the failure was checked, and was killed for nothing.
+        self.assertEqual(worker.grader.graded, [0, 1, 2])
+        self.assertEqual(worker.grader.aborted, [threading.get_ident()])
+
+    def test_pipelined_checking_overlaps_runs(self):
+        problem = FakeProblem(
+            [FakeCase(i, delay=0.05, check_delay=0.05) for i in range(6)], {'pipelined_checking': True}
+        )
+        worker = make_worker(problem, grader_class=FakePipelinedGrader)
+        started = time.monotonic()
+        messages = run(worker, problem)
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(results_of(messages), [(None, i, Result.AC) for i in range(1, 7)])
+
+    def test_pipelining_disabled_for_unsupported_graders(self):
+        problem = FakeProblem([FakeCase(0)], {'pipelined_checking': True})
+        self.assertFalse(make_worker(problem)._pipelines_checking(problem))
+        worker = make_worker(problem, grader_class=FakePipelinedGrader)
+        self.assertTrue(worker._pipelines_checking(problem))
+
+    def test_batch_boundaries_sent_once_per_batch(self):
+        problem = FakeProblem([FakeBatch([FakeCase(0), FakeCase(1)]), FakeCase(2), FakeBatch([FakeCase(3)])])
+        worker = make_worker(problem)
+        messages = [(ipc_type, data) for ipc_type, data in run(worker, problem) if ipc_type != IPC.RESULT]
+        self.assertEqual(
+            messages,
+            [
+                (IPC.GRADING_BEGIN, (False,)),
+                (IPC.BATCH_BEGIN, (1,)),
+                (IPC.BATCH_END, (1,)),
+                (IPC.BATCH_BEGIN, (2,)),
+                (IPC.BATCH_END, (2,)),
+                (IPC.GRADING_END, ()),
+            ],
+        )
+
+    def test_fail_fast_order_within_batch(self):
+        batch = FakeBatch([FakeCase(0), FakeCase(1), FakeCase(2, Result.WA), FakeCase(3)])
+        problem = FakeProblem([FakeCase(4), batch, FakeCase(5)])
+        worker = make_worker(problem)
+        worker._case_hints = {4: 3.0, 1: 5.0}
+        messages = run(worker, problem)
+        self.assertEqual(
+            results_of(messages),
+            [
+                (None, 1, Result.AC),
+                (1, 2, Result.SC),
+                (1, 3, Result.SC),
+                (1, 4, Result.WA),
+                (1, 5, Result.SC),
+                (None, 6, Result.SC),
+            ],
+        )
+        # Case number 1 isn't in a batch, so it keeps its place.
+        self.assertEqual(worker.grader.graded, [4, 2])
+
+    def make_problem_with_data(self, cases, files, config=None):
+        root_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(root_dir.cleanup)
+        for name, content in files.items():
+            with open(os.path.join(root_dir.name, name), 'wb') as f:
+                f.write(content)
+        return FakeProblem(cases, config, root_dir.name)
+
+    def test_main_tests_reuse_duplicated_pretest_runs(self):
+        def make_problem():
+            cases = [
+                FakeTestCase(0, 'pre1.in', is_pretest=True, points=0),
+                FakeTestCase(1, 'pre2.in', is_pretest=True, points=0),
+                FakeTestCase(2, 'main1.in', points=5),
+                FakeTestCase(3, 'main2.in', points=7),
+            ]
+            files = {'pre1.in': b'1 2', 'pre2.in': b'3 4', 'main1.in': b'3 4', 'main2.in': b'1 2'}
+            return self.make_problem_with_data(cases, files)
+
+        problem = make_problem()
+        worker = make_worker(problem, grader_class=FakePipelinedGrader)
+        messages = run(worker, problem)
+        self.assertEqual(worker.grader.graded, [0, 1])
+        results = [data[2] for ipc_type, data in messages if ipc_type == IPC.RESULT]
+        # The reused run is checked, and scored, as the main test.
+        self.assertIs(results[2].case, problem.cases()[2])
+        self.assertEqual([result.points for result in results], [0, 0, 5, 7])
+
+        problem = make_problem()
+        worker = make_worker(problem, grader_class=FakePipelinedGrader)
+        with mock.patch.dict(env.raw_config, {'reuse_pretest_runs': False}):
+            run(worker, problem)
+        self.assertEqual(worker.grader.graded, [0, 1, 2, 3])
+
+    def test_identical_inputs_run_once_on_deterministic_problems(self):
+        def make_problem(config):
+            batches = [
+                FakeBatch([FakeTestCase(0, 'small.in'), FakeTestCase(1, 'max1.in')]),
+                FakeBatch([FakeTestCase(2, 'other.in'), FakeTestCase(3, 'max2.in', points=3)]),
+            ]
+            files = {'small.in': b'1', 'max1.in': b'9' * 1000, 'other.in': b'2', 'max2.in': b'9' * 1000}
+            return self.make_problem_with_data(batches, files, config)
+
+        problem = make_problem({'deterministic': True})
+        worker = make_worker(problem, grader_class=FakePipelinedGrader)
+        with mock.patch('builtins.print') as mock_print:
+            messages = run(worker, problem)
+        self.assertEqual(worker.grader.graded, [0, 1, 2])
+        self.assertEqual([data[2].points for ipc_type, data in messages if ipc_type == IPC.RESULT], [1, 1, 1, 3])
+        mock_print.assert_called_once_with('Running 3 distinct inputs for 4 cases of fake: case 4 reuses case 2')
+
+        problem = make_problem({})
+        worker = make_worker(problem, grader_class=FakePipelinedGrader)
+        run(worker, problem)
+        self.assertEqual(worker.grader.graded, [0, 1, 2, 3])
+
+    def test_phases_are_traced(self):
+        problem = FakeProblem([FakeCase(0), FakeCase(1)])
+        worker = make_worker(problem)
+        tracer = tracing.start('Worker grading 1')
+        try:
+            run(worker, problem)
+        finally:
+            tracing.stop()
+        spans = [(event['name'], event.get('args')) for event in tracer.events if event['ph'] == 'X']
+        self.assertIn(('loading problem', None), spans)
+        self.assertEqual(
+            [span for span in spans if span[0] == 'running'], [('running', {'case': 1}), ('running', {'case': 2})]
+        )
+
+
+class FailureHistoryTest(unittest.TestCase):
+    def test_recent_failures_weigh_more(self):
+        history = FailureHistory()
+        submission = Submission(1, 'fake', 'CPP20', '', 1.0, 65536, True, {})
+        history.record_first_failure(submission, 3)
+        history.record_first_failure(submission, 3)
+        history.record_first_failure(submission, 5)
+        hints = history.hints(submission)
+        self.assertGreater(hints[3], hints[5])
+        self.assertEqual(history.hints(submission._replace(meta={'pretests_only': True})), {})
@@ -0,0 +1,91 @@
+import os
+import signal
+import time
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, JudgeWorker, Submission
+from dmoj.judgeenv import env
+from dmoj.result import Result
+
+
+class FakeCase:
+    points = 1
+    output_prefix_length = 0
+
+    def __init__(self, position):
+        self.position = position
+
+
+class FakeGrader:
+    def __init__(self, judge, problem, language, source):
+        self.judge = judge
+        self.binary = None
+        self.meta = problem.meta
+
+    def grade(self, case):
+        with self.judge.phase('checking', time_limit=self.meta.get('time_limit')):
+            time.sleep(self.meta.get('delay', 0))
+        return Result(case)
+
+    def abort_grading(self):
+        pass
+
+
+class FakeProblem:
+    grader_class = FakeGrader
+    run_pretests_only = False
+
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        self.meta = meta
+
+    def cases(self):
+        return [FakeCase(0)]
+
+
+class HeartbeatTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch('dmoj.judge.Problem', FakeProblem),
+            mock.patch.dict(env.raw_config, {'worker_heartbeat_interval': 0.05, 'worker_heartbeat_timeout': 0.5}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.worker = JudgeWorker()
+        self.addCleanup(self.worker.close)
+
+    def grade(self, **meta):
+        self.worker.start_grading(Submission(1, 'fake', 'CPP20', '', 1.0, 65536, False, meta))
+        return self.worker.communicate()
+
+    def test_long_phase_with_heartbeats_survives(self):
+        events = list(self.grade(delay=1.5))
+        self.assertEqual(events[-1], (IPC.GRADING_END, ()))
+        self.assertNotIn(IPC.HEARTBEAT, [ipc_type for ipc_type, _ in events])
+        self.assertTrue(self.worker.is_alive())
+
+    def test_phases_are_reported(self):
+        events = self.grade(delay=0.5)
+        for ipc_type, _ in events:
+            if ipc_type == IPC.RESULT:
+                break
+        # The last heartbeat before the result was sent while the case was still being checked.
+        self.assertEqual([phase[:2] for phase in self.worker.phases], [('checking', 1)])
+        list(events)
+
+    def test_overrunning_phase_is_killed(self):
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            list(self.grade(delay=30, time_limit=0.1))
+        self.assertLess(time.monotonic() - start, 5)
+        self.assertFalse(self.worker.is_alive())
+
+    def test_silent_worker_is_killed(self):
+        events = self.grade(delay=30)
+        next(events)
+        os.kill(self.worker.worker_process.pid, signal.SIGSTOP)
+        start = time.monotonic()
+        with self.assertRaises(TimeoutError):
+            list(events)
+        self.assertLess(time.monotonic() - start, 5)
@@ -0,0 +1,104 @@
+import multiprocessing
+import pickle
+import threading
+import unittest
+
+from dmoj.config import ConfigNode
+from dmoj.problem import TestCase as ProblemTestCase
+from dmoj.result import Result
+from dmoj.utils import ipc_frames
+from dmoj.utils.shared_payload import SharedPayload
+
+
+def make_case(position, batch=0):
+    # Built the way the judge builds cases, so that any attribute added to them is caught by the round trip.
+    config = ConfigNode({'in': 'a.in', 'out': 'a.out', 'points': 5, 'output_prefix_length': 64, 'binary_data': False})
+    return ProblemTestCase(position, batch, config, None)
+
+
+def make_result(position, batch=0):
+    return Result(
+        make_case(position, batch),
+        result_flag=Result.WA | Result.TLE,
+        execution_time=1.25,
+        wall_clock_time=1.5,
+        max_memory=12345,
+        context_switches=(7, 8),
+        runtime_version='g++ 13',
+        proc_output=b'\xffbad utf-8',
+        feedback='sai ở dòng 1',
+        extended_feedback='',
+        points=2.5,
+        attempts=[1.25, 0.75],
+        raw_execution_time=1.5,
+    )
+
+
+class IPCFramesTest(unittest.TestCase):
+    def test_round_trip(self):
+        frame = ipc_frames.pack_frame(
+            [
+                ipc_frames.encode_batch_record(ipc_frames.BATCH_BEGIN, 2),
+                ipc_frames.encode_result_record(2, 3, make_result(2, batch=2)),
+                ipc_frames.encode_batch_record(ipc_frames.BATCH_END, 2),
+                ipc_frames.encode_result_record(None, 4, make_result(3)),
+            ]
+        )
+        self.assertTrue(ipc_frames.is_frame(frame))
+        self.assertFalse(ipc_frames.is_frame(pickle.dumps(('RESULT', ()))))
+
+        records = ipc_frames.unpack_frame(frame)
+        self.assertEqual(
+            [kind for kind, _ in records],
+            [ipc_frames.BATCH_BEGIN, ipc_frames.RESULT, ipc_frames.BATCH_END, ipc_frames.RESULT],
+        )
+        self.assertEqual(records[0][1], (2,))
+        self.assertEqual(records[1][1][:2], (2, 3))
+        self.assertEqual(records[3][1][:2], (None, 4))
+
+        expected = make_result(3)
+        decoded = records[3][1][2]
+        self.assertEqual(vars(decoded.case), expected.case.__getstate__())
+        decoded.case = expected.case
+        self.assertEqual(vars(decoded), vars(expected))
+
+    def test_unsupported_results_are_left_to_pickle(self):
+        result = make_result(1)
+        result.extended_feedback = SharedPayload('x')
+        self.assertIsNone(ipc_frames.encode_result_record(None, 1, result))
+        result.extended_feedback.load()
+
+        result = make_result(1)
+        result.checker_stats = [1.0]
+        self.assertIsNone(ipc_frames.encode_result_record(None, 1, result))
+
+    def test_unknown_version(self):
+        frame = bytearray(ipc_frames.pack_frame([]))
+        frame[len(ipc_frames.MAGIC)] = ipc_frames.VERSION + 1
+        with self.assertRaises(ValueError):
+            ipc_frames.unpack_frame(bytes(frame))
+
+    def test_coalescing(self):
+        receiver, sender_conn = multiprocessing.Pipe(duplex=False)
+
+        def encode(message):
+            return ipc_frames.encode_batch_record(ipc_frames.BATCH_BEGIN, message) if isinstance(message, int) else None
+
+        sender = ipc_frames.FrameCoalescer(sender_conn, encode, window=60)
+        for batch_number in (1, 2, 3):
+            sender.send(batch_number)
+        self.assertFalse(receiver.poll())
+        # Anything that can't be framed flushes what is pending first, so order is kept.
+        sender.send('done')
+        self.assertEqual([data for _, data in ipc_frames.unpack_frame(receiver.recv_bytes())], [(1,), (2,), (3,)])
+        self.assertEqual(receiver.recv(), 'done')
+
+        sender.window = 0.01
+        for batch_number in (4, 5, 6):
+            sender.send(batch_number)
+            self.assertTrue(receiver.poll(5))
+            self.assertEqual(
+                ipc_frames.unpack_frame(receiver.recv_bytes()), [(ipc_frames.BATCH_BEGIN, (batch_number,))]
+            )
+        # Every window is flushed by the same thread.
+        self.assertEqual([thread.name for thread in threading.enumerate()].count('IPC frame flusher'), 1)
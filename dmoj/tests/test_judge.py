@@ -0,0 +1,175 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, Judge, Submission
+from dmoj.judgeenv import env
+
+
+def make_submission(id, problem_id='aplusb'):
+    return Submission(id, problem_id, 'CPP20', '', 1.0, 65536, False, {})
+
+
+class FakeWorker:
+    release = None
+    rss = None
+    trace_events = [{'name': 'running', 'cat': 'phase', 'ph': 'X', 'ts': 0, 'dur': 1, 'pid': 2, 'tid': 2}]
+
+    def __init__(self, problem=None):
+        self.submission = None
+        self.submissions_graded = 0
+        self.abort_requested = False
+
+    def is_alive(self):
+        return True
+
+    def start_grading(self, submission, failure_history=None):
+        self.submission = submission
+
+    def communicate(self):
+        yield IPC.HELLO, ()
+        FakeWorker.release.wait(5)
+        yield IPC.RESULT, (None, 1, 'result-%d' % self.submission.id)
+        yield IPC.GRADING_END, ()
+
+    def request_abort_grading(self):
+        self.abort_requested = True
+
+    def wait_with_timeout(self, timeout=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class JudgeSlotsTest(unittest.TestCase):
+    def setUp(self):
+        FakeWorker.release = threading.Event()
+        self.worker_patch = mock.patch('dmoj.judge.JudgeWorker', FakeWorker)
+        self.worker_patch.start()
+
+    def tearDown(self):
+        FakeWorker.release.set()
+        self.worker_patch.stop()
+
+    def _grade_in_thread(self, judge, submission, results):
+        thread = threading.Thread(target=lambda: results.append(judge.begin_grading(submission)))
+        thread.start()
+        return thread
+
+    def _wait_for_grading(self, judge, count):
+        for _ in range(500):
+            if len(judge.current_submissions) == count:
+                return
+            threading.Event().wait(0.01)
+        self.fail('submissions never started grading')
+
+    def test_concurrent_grading(self):
+        judge = Judge(slots=2)
+        results: list = []
+        threads = [self._grade_in_thread(judge, make_submission(i), results) for i in (1, 2)]
+        self._wait_for_grading(judge, 2)
+
+        self.assertEqual(judge.current_submission(1).id, 1)
+        self.assertEqual(judge.current_submission(2).id, 2)
+        self.assertIsNone(judge.current_submission(3))
+
+        FakeWorker.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(sorted(results), [[(None, 1, 'result-1')], [(None, 1, 'result-2')]])
+        self.assertEqual(judge.current_submissions, [])
+
+    def test_slots_bound_concurrency(self):
+        judge = Judge(slots=1)
+        results: list = []
+        threads = [self._grade_in_thread(judge, make_submission(i), results) for i in (1, 2)]
+        self._wait_for_grading(judge, 1)
+        threading.Event().wait(0.05)
+        self.assertEqual(len(judge.current_submissions), 1)
+
+        FakeWorker.release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(len(results), 2)
+
+    def test_abort_by_submission_id(self):
+        judge = Judge(slots=2)
+        results: list = []
+        threads = [self._grade_in_thread(judge, make_submission(i), results) for i in (1, 2)]
+        self._wait_for_grading(judge, 2)
+
+        workers = dict(judge.current_judge_workers)
+        judge.abort_grading(2)
+        self.assertFalse(workers[1].abort_requested)
+        self.assertTrue(workers[2].abort_requested)
+
+        FakeWorker.release.set()
+        for thread in threads:
+            thread.join(5)
+
+    def test_duplicate_submission_id(self):
+        judge = Judge(slots=2)
+        results: list = []
+        thread = self._grade_in_thread(judge, make_submission(1), results)
+        self._wait_for_grading(judge, 1)
+        with self.assertRaises(ValueError):
+            judge.begin_grading(make_submission(1))
+
+        FakeWorker.release.set()
+        thread.join(5)
+
+
+class JudgeStreamingTest(unittest.TestCase):
+    def setUp(self):
+        FakeWorker.release = threading.Event()
+        self.worker_patch = mock.patch('dmoj.judge.JudgeWorker', StreamingFakeWorker)
+        self.worker_patch.start()
+
+    def tearDown(self):
+        FakeWorker.release.set()
+        self.worker_patch.stop()
+
+    def test_events_are_streamed(self):
+        judge = Judge(slots=1)
+        events = judge.grade(make_submission(1))
+        # The first result arrives while the worker is still grading.
+        self.assertEqual(next(events), (IPC.RESULT, (None, 1, 'first')))
+        FakeWorker.release.set()
+        self.assertEqual(list(events), [(IPC.RESULT, (None, 2, 'second')), (IPC.GRADING_END, ())])
+        self.assertEqual(judge.current_submissions, [])
+
+    def test_closing_stream_aborts(self):
+        judge = Judge(slots=1)
+        events = judge.grade(make_submission(1))
+        next(events)
+        worker = judge.current_judge_workers[1]
+        FakeWorker.release.set()
+        events.close()
+        self.assertTrue(worker.abort_requested)
+        self.assertEqual(judge.current_submissions, [])
+
+    def test_trace_is_written(self):
+        with tempfile.TemporaryDirectory() as trace_dir:
+            with mock.patch.dict(env.raw_config, {'trace_dir': trace_dir}):
+                judge = Judge(slots=1)
+                FakeWorker.release.set()
+                list(judge.grade(make_submission(1)))
+            with open(os.path.join(trace_dir, 'aplusb-1.json')) as trace_file:
+                events = json.load(trace_file)['traceEvents']
+        self.assertEqual(
+            [event['name'] for event in events if event['ph'] == 'X'],
+            ['waiting for a grading slot', 'acquiring worker', 'grading', 'running'],
+        )
+
+
+class StreamingFakeWorker(FakeWorker):
+    def communicate(self):
+        yield IPC.HELLO, ()
+        yield IPC.RESULT, (None, 1, 'first')
+        FakeWorker.release.wait(5)
+        yield IPC.RESULT, (None, 2, 'second')
+        yield IPC.GRADING_END, ()
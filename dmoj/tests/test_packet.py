@@ -0,0 +1,105 @@
+import json
+import threading
+import unittest
+import zlib
+
+from dmoj.judge import IPC, Submission
+from dmoj.packet import PacketManager
+from dmoj.result import Result
+
+
+class FakeConn:
+    def __init__(self):
+        self.packets = []
+
+    def sendall(self, data):
+        self.packets.append(json.loads(zlib.decompress(data[PacketManager.SIZE_PACK.size :])))
+
+
+class FakeCase:
+    points = 1
+    output_prefix_length = 0
+
+
+class FakeJudge:
+    def __init__(self, events):
+        self.events = events
+        self.current_submissions = []
+
+    def grade(self, submission):
+        self.current_submissions.append(submission)
+        yield from self.events
+        self.current_submissions.remove(submission)
+
+
+def make_submission(submission_id):
+    return Submission(submission_id, 'aplusb', 'PY3', 'print(1)', 1.0, 65536, False, {})
+
+
+def make_packet_manager(judge):
+    manager = PacketManager.__new__(PacketManager)
+    manager.judge = judge
+    manager.conn = FakeConn()
+    manager.fallback = 4
+    manager._closed = True
+    manager._lock = threading.RLock()
+    manager._testcase_queue_lock = threading.Lock()
+    manager._testcase_queue = []
+    return manager
+
+
+class PacketManagerTest(unittest.TestCase):
+    def test_grading_packets_carry_the_submission_id(self):
+        events = [
+            (IPC.COMPILE_MESSAGE, ('warning',)),
+            (IPC.GRADING_BEGIN, (False,)),
+            (IPC.BATCH_BEGIN, (1,)),
+            (IPC.RESULT, (1, 1, Result(FakeCase(), result_flag=Result.WA))),
+            (IPC.RESULT, (1, 2, Result(FakeCase()))),
+            (IPC.BATCH_END, (1,)),
+            (IPC.GRADING_END, ()),
+        ]
+        manager = make_packet_manager(FakeJudge(events))
+        manager._grade_submission(make_submission(7))
+
+        packets = manager.conn.packets
+        self.assertEqual(
+            [packet['name'] for packet in packets],
+            ['compile-message', 'grading-begin', 'batch-begin', 'test-case-status', 'batch-end', 'grading-end'],
+        )
+        self.assertEqual({packet['submission-id'] for packet in packets}, {7})
+        self.assertEqual([case['position'] for case in packets[3]['cases']], [1, 2])
+        self.assertEqual(packets[3]['cases'][0]['status'], Result.WA)
+
+    def test_results_of_concurrent_submissions_are_kept_apart(self):
+        manager = make_packet_manager(FakeJudge([]))
+        manager.test_case_status_packet(1, 1, Result(FakeCase()))
+        manager.test_case_status_packet(2, 1, Result(FakeCase()))
+        manager.test_case_status_packet(1, 2, Result(FakeCase()))
+        manager.grading_end_packet(2)
+
+        packets = manager.conn.packets
+        self.assertEqual(
+            [(packet['name'], packet['submission-id']) for packet in packets[:2]],
+            [('test-case-status', 1), ('test-case-status', 2)],
+        )
+        self.assertEqual([case['position'] for case in packets[0]['cases']], [1, 2])
+        self.assertEqual((packets[2]['name'], packets[2]['submission-id']), ('grading-end', 2))
+
+    def test_grading_failure_is_an_internal_error(self):
+        class FailingJudge(FakeJudge):
+            def grade(self, submission):
+                raise OSError('no such problem')
+
+        manager = make_packet_manager(FailingJudge([]))
+        manager._grade_submission(make_submission(3))
+        packets = manager.conn.packets
+        self.assertEqual([(packet['name'], packet['submission-id']) for packet in packets], [('internal-error', 3)])
+
+    def test_current_submission(self):
+        judge = FakeJudge([])
+        manager = make_packet_manager(judge)
+        manager.current_submission_packet()
+        judge.current_submissions = [make_submission(4), make_submission(5)]
+        manager.current_submission_packet()
+        self.assertEqual([packet['submission-id'] for packet in manager.conn.packets], [None, 4, 5])
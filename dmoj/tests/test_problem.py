@@ -1,4 +1,5 @@
 import os
+import tempfile
 import unittest
 from unittest import mock
 
@@ -111,5 +112,83 @@ class ProblemTest(unittest.TestCase):
             with self.assertRaisesRegex(InvalidInitException, 'No test cases'):
                 MockProblem('test', 2, 16384, {})
 
+    def test_batch_dependencies(self):
+        self.problem_data = ProblemDataManager(None)
+        self.problem_data.update(
+            {
+                'init.yml': """
+pretest_test_cases:
+  - {batched: [{in: p1.in}]}
+  - {batched: [{in: p2.in}], dependencies: [1]}
+test_cases:
+  - {batched: [{in: 1.in}]}
+  - {batched: [{in: 2.in}]}
+  - {batched: [{in: 3.in}], dependencies: [2]}
+"""
+            }
+        )
+        with mock.patch('dmoj.problem.get_problem_root') as gpr:
+            gpr.return_value = '/proc'
+            problem = Problem('test', 2, 16384, {})
+            pretest1, pretest2, test1, test2, test3 = problem.cases()
+
+        self.assertEqual([batch.batch_no for batch in (pretest1, pretest2)], [1, 2])
+        self.assertEqual([batch.batch_no for batch in (test1, test2, test3)], [1, 2, 3])
+        self.assertEqual(pretest2.dependency_batches, [pretest1])
+        self.assertEqual(test3.dependency_batches, [test2])
+        self.assertEqual(test1.dependency_batches, [])
+
+    def test_preload(self):
+        with tempfile.TemporaryDirectory() as root_dir:
+            for name, content in (('1.in', '1 2'), ('1.out', '3'), ('2.in', '3 4'), ('2.out', '7')):
+                with open(os.path.join(root_dir, name), 'w') as f:
+                    f.write(content)
+            self.problem_data = ProblemDataManager(root_dir)
+            self.problem_data.update(
+                {
+                    'init.yml': 'binary_data: true\n'
+                    'test_cases: [{in: 1.in, out: 1.out}, {batched: [{in: 2.in, out: 2.out}]}]'
+                }
+            )
+            with mock.patch('dmoj.problem.get_problem_root') as gpr:
+                gpr.return_value = root_dir
+                problem = Problem('test', 2, 16384, {})
+                problem.preload()
+            for name in os.listdir(root_dir):
+                os.unlink(os.path.join(root_dir, name))
+
+        cases = problem.cases()
+        self.assertIs(problem.cases(), cases)
+        case1, (case2,) = cases[0], cases[1].batched_cases
+        self.assertEqual((case1.input_data(), case1.output_data()), (b'1 2', b'3'))
+        case1.free_data()
+        self.assertEqual(case1.input_data_io().to_bytes(), b'1 2')
+        self.assertEqual((case2.input_data(), case2.output_data()), (b'3 4', b'7'))
+
+    def test_warm_up(self):
+        with tempfile.TemporaryDirectory() as root_dir:
+            for name, content in (('1.in', '1 2'), ('1.out', '3')):
+                with open(os.path.join(root_dir, name), 'w') as f:
+                    f.write(content)
+            self.problem_data = ProblemDataManager(root_dir)
+            self.problem_data.update(
+                {
+                    'init.yml': 'binary_data: true\n'
+                    'test_cases: [{in: 1.in, out: 1.out, checker: {name: bridged, args: {files: check.cpp}}},'
+                    ' {generator: gen.cpp, points: 1}]'
+                }
+            )
+            with mock.patch('dmoj.problem.get_problem_root') as gpr, mock.patch(
+                'dmoj.problem.checkers.bridged.get_executor'
+            ) as get_executor, mock.patch('dmoj.problem.TestCase._compile_generator') as compile_generator:
+                gpr.return_value = root_dir
+                problem = Problem('test', 2, 16384, {})
+                problem.warm_up()
+
+        get_executor.assert_called_once_with('test', 'check.cpp', [], None, mock.ANY)
+        compile_generator.assert_called_once_with('gen.cpp', args=None)
+        # Nothing is kept in memory.
+        self.assertIsNone(problem._preloaded_cases)
+
     def tearDown(self):
         self.data_patch.stop()
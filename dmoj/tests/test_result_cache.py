@@ -0,0 +1,135 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, Submission
+from dmoj.result import Result
+from dmoj.result_cache import ResultCache
+
+
+class FakeExecutor:
+    class Executor:
+        @classmethod
+        def get_runtime_versions(cls):
+            return (('fake', (1, 0)),)
+
+
+class FakeCase:
+    points = 1
+
+    def __init__(self, position):
+        self.position = position
+
+
+def make_submission(source='print(1)', time_limit=1.0, **meta):
+    return Submission(1, 'aplusb', 'FAKE', source, time_limit, 65536, False, meta)
+
+
+def make_events(*flags):
+    events = [(IPC.COMPILE_MESSAGE, ('',))]
+    for position, flag in enumerate(flags, 1):
+        events.append((IPC.RESULT, (None, position, Result(FakeCase(position), result_flag=flag))))
+    events.append((IPC.GRADING_END, ()))
+    return events
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.problem_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.write_problem_file('init.yml', 'deterministic: true\ntest_cases: []\n')
+        self.write_problem_file('1.in', '1 2\n')
+
+        patches = [
+            mock.patch('dmoj.result_cache.get_problem_root', lambda problem_id: self.problem_dir.name),
+            mock.patch.dict('dmoj.result_cache.executors', {'FAKE': FakeExecutor}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.problem_dir.cleanup)
+        self.addCleanup(self.cache_dir.cleanup)
+        self.cache = ResultCache(self.cache_dir.name)
+
+    def write_problem_file(self, name, content):
+        path = os.path.join(self.problem_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        # Make sure the rewrite is visible to the fingerprint even on coarse-grained filesystem clocks.
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def test_key_depends_on_source_limits_and_data(self):
+        key = self.cache.key(make_submission())
+        self.assertIsNotNone(key)
+        self.assertEqual(self.cache.key(make_submission()), key)
+        self.assertNotEqual(self.cache.key(make_submission(source='print(2)')), key)
+        self.assertNotEqual(self.cache.key(make_submission(time_limit=2.0)), key)
+        self.assertNotEqual(self.cache.key(make_submission(**{'in-contest': True})), key)
+        self.assertEqual(
+            self.cache.key(make_submission(pretests_only=True, attempt=2)),
+            self.cache.key(make_submission(attempt=2, pretests_only=True)),
+        )
+
+        self.write_problem_file('1.in', '3 4\n')
+        self.cache.invalidate_changed()
+        self.assertNotEqual(self.cache.key(make_submission()), key)
+
+    def test_problem_data_is_fingerprinted_once(self):
+        with mock.patch.object(ResultCache, '_fingerprint', wraps=ResultCache._fingerprint) as fingerprint:
+            key = self.cache.key(make_submission())
+            self.cache.put(make_submission(), key, make_events(Result.AC))
+            self.cache.key(make_submission(source='print(2)'))
+            self.assertEqual(fingerprint.call_count, 1)
+
+            self.cache.invalidate_changed()
+            self.cache.key(make_submission())
+            self.assertEqual(fingerprint.call_count, 2)
+
+    def test_non_deterministic_problems_are_not_cached(self):
+        self.write_problem_file('init.yml', 'test_cases: []\n')
+        self.assertIsNone(self.cache.key(make_submission()))
+
+    def test_round_trip(self):
+        submission = make_submission()
+        key = self.cache.key(submission)
+        self.assertIsNone(self.cache.get(submission, key))
+
+        self.cache.put(submission, key, make_events(Result.AC, Result.WA))
+        events = self.cache.get(submission, key)
+        self.assertEqual(
+            [ipc_type for ipc_type, _ in events], [IPC.COMPILE_MESSAGE, IPC.RESULT, IPC.RESULT, IPC.GRADING_END]
+        )
+        self.assertEqual(events[2][1][2].result_flag, Result.WA)
+
+    def test_unstable_or_incomplete_gradings_are_not_stored(self):
+        submission = make_submission()
+        key = self.cache.key(submission)
+
+        self.cache.put(submission, key, make_events(Result.AC, Result.TLE))
+        self.assertIsNone(self.cache.get(submission, key))
+        self.cache.put(submission, key, make_events(Result.IE))
+        self.assertIsNone(self.cache.get(submission, key))
+        self.cache.put(submission, key, make_events(Result.AC)[:-1])
+        self.assertIsNone(self.cache.get(submission, key))
+
+    def test_failing_to_store_is_logged(self):
+        submission = make_submission()
+        key = self.cache.key(submission)
+        with mock.patch.object(ResultCache, '_write', side_effect=OSError('No space left on device')):
+            with self.assertLogs('dmoj.result_cache', 'ERROR'):
+                self.cache.put(submission, key, make_events(Result.AC))
+        self.assertIsNone(self.cache.get(submission, key))
+
+    def test_invalidate_changed(self):
+        submission = make_submission()
+        key = self.cache.key(submission)
+        self.cache.put(submission, key, make_events(Result.AC))
+
+        self.cache.invalidate_changed()
+        self.assertIsNotNone(self.cache.get(submission, key))
+
+        self.write_problem_file('1.in', '3 4\n')
+        self.cache.invalidate_changed()
+        self.assertIsNone(self.cache.get(submission, key))
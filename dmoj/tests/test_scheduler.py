@@ -0,0 +1,120 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, Submission
+from dmoj.scheduler import Priority, SubmissionScheduler
+
+
+def make_submission(id, problem_id='aplusb', time_limit=1.0, **meta):
+    return Submission(id, problem_id, 'CPP20', '', time_limit, 65536, False, meta)
+
+
+class FakeJudge:
+    def __init__(self, slots=1):
+        self.slots = slots
+        self.graded = []
+        self.release = threading.Event()
+        # Lets a single submission be graded at a time, like admission control would on a busy machine.
+        self.admitted = threading.Semaphore(1)
+
+    def acquire_slot(self):
+        self.admitted.acquire()
+
+    def release_slot(self):
+        self.admitted.release()
+
+    def grade(self, submission, slot_acquired=False):
+        if not slot_acquired:
+            self.acquire_slot()
+        try:
+            self.graded.append(submission.id)
+            self.release.wait(5)
+            yield IPC.RESULT, (None, 1, 'result-%d' % submission.id)
+            yield IPC.GRADING_END, ()
+        finally:
+            self.release_slot()
+
+    def abort_grading(self, submission_id=None):
+        pass
+
+
+class SubmissionSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.case_counts = {'aplusb': 10, 'long': 100}
+        patch = mock.patch.object(
+            SubmissionScheduler, '_case_count', lambda _, submission: self.case_counts[submission.problem_id]
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.judge = FakeJudge()
+
+    def _busy_scheduler(self, **kwargs):
+        scheduler = SubmissionScheduler(self.judge, **kwargs)
+        self.addCleanup(scheduler.close)
+        self.addCleanup(self.judge.release.set)
+        # Occupies the only slot, so everything submitted afterwards queues up.
+        first = scheduler.submit(make_submission(0))
+        while not self.judge.graded:
+            time.sleep(0.01)
+        return scheduler, first
+
+    def test_contest_before_rejudge(self):
+        scheduler, _ = self._busy_scheduler()
+        scheduler.submit(make_submission(1), Priority.REJUDGE)
+        scheduler.submit(make_submission(2, priority='contest'))
+        scheduler.submit(make_submission(3), Priority.PRACTICE)
+        self.assertEqual([submission.id for submission in scheduler.queued_submissions], [2, 3, 1])
+
+    def test_unknown_priority(self):
+        scheduler, _ = self._busy_scheduler()
+        scheduler.submit(make_submission(1), Priority.REJUDGE)
+        with self.assertLogs('dmoj.scheduler', 'WARNING'):
+            scheduler.submit(make_submission(2, priority='urgent'))
+        self.assertEqual([submission.id for submission in scheduler.queued_submissions], [2, 1])
+
+    def test_picks_once_a_slot_is_free(self):
+        self.judge = FakeJudge(slots=2)
+        scheduler, first = self._busy_scheduler()
+        rejudged = scheduler.submit(make_submission(1), Priority.REJUDGE)
+        # The idle dispatcher mustn't pick the rejudge while the only admitted slot is taken.
+        time.sleep(0.1)
+        self.assertEqual([submission.id for submission in scheduler.queued_submissions], [1])
+        contest = scheduler.submit(make_submission(2), Priority.CONTEST)
+        self.judge.release.set()
+        for future in (first, rejudged, contest):
+            future.result(5)
+        self.assertEqual(self.judge.graded, [0, 2, 1])
+
+    def test_shortest_job_first_within_class(self):
+        scheduler, _ = self._busy_scheduler()
+        scheduler.submit(make_submission(1, 'long'))
+        scheduler.submit(make_submission(2))
+        scheduler.submit(make_submission(3, time_limit=20.0))
+        self.assertEqual([submission.id for submission in scheduler.queued_submissions], [2, 1, 3])
+
+    def test_aging(self):
+        scheduler, _ = self._busy_scheduler(aging_interval=0.1)
+        scheduler.submit(make_submission(1), Priority.TESTSUITE)
+        time.sleep(0.35)
+        scheduler.submit(make_submission(2), Priority.CONTEST)
+        self.assertEqual([submission.id for submission in scheduler.queued_submissions], [1, 2])
+
+    def test_results_and_history(self):
+        scheduler, first = self._busy_scheduler()
+        events = []
+        second = scheduler.submit(make_submission(1), on_event=lambda *event: events.append(event))
+        self.judge.release.set()
+        self.assertEqual(first.result(5), [(None, 1, 'result-0')])
+        self.assertEqual(second.result(5), [(None, 1, 'result-1')])
+        self.assertEqual(events[-1], (IPC.GRADING_END, ()))
+        # Both took next to no time, far less than 10 cases at 1 second each.
+        self.assertLess(scheduler.estimate(make_submission(2)), 10 * 0.9)
+
+    def test_abort_queued(self):
+        scheduler, _ = self._busy_scheduler()
+        future = scheduler.submit(make_submission(1))
+        scheduler.abort(1)
+        self.assertTrue(future.cancelled())
+        self.assertEqual(scheduler.queued_submissions, [])
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, JudgeWorker, Submission, flatten_cases, shard_case_numbers
+from dmoj.problem import BatchedTestCase
+from dmoj.result import Result
+from dmoj.sharding import ShardCoordinator
+
+
+class FakeCase:
+    points = 1
+    output_prefix_length = 0
+
+    def __init__(self, position, flag=Result.AC, delay=0.0):
+        self.position = position
+        self.flag = flag
+        self.delay = delay
+
+
+class FakeBatch(BatchedTestCase):
+    def __init__(self, cases, dependency_batches=()):
+        self.batched_cases = cases
+        self.dependency_batches = list(dependency_batches)
+        self.points = 1
+
+
+class FakeGrader:
+    def __init__(self, judge, problem, language, source):
+        self.binary = None
+        self.aborted = threading.Event()
+
+    def grade(self, case):
+        self.aborted.wait(case.delay)
+        return Result(case, result_flag=case.flag, execution_time=os.getpid())
+
+    def abort_grading(self):
+        self.aborted.set()
+
+
+class FakeConfig:
+    parallel_cases = None
+    pipelined_checking = None
+
+
+class FakeProblem:
+    grader_class = FakeGrader
+    run_pretests_only = False
+    config = FakeConfig()
+    cases_list = []
+
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        pass
+
+    def cases(self):
+        return FakeProblem.cases_list
+
+
+def make_submission(short_circuit):
+    return Submission(1, 'fake', 'CPP20', '', 1.0, 65536, short_circuit, {})
+
+
+def results_of(events):
+    return [(data[0], data[1], data[2].result_flag) for ipc_type, data in events if ipc_type == IPC.RESULT]
+
+
+class ShardCoordinatorTest(unittest.TestCase):
+    def setUp(self):
+        patches = [mock.patch('dmoj.judge.Problem', FakeProblem), mock.patch('dmoj.sharding.Problem', FakeProblem)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def grade(self, cases, short_circuit=True, shards=2):
+        """Grades the cases with a coordinator over local worker processes, and with a single worker."""
+        FakeProblem.cases_list = cases
+        coordinator = ShardCoordinator(shards=shards)
+        worker = JudgeWorker()
+        try:
+            started = time.monotonic()
+            sharded = list(coordinator.grade(make_submission(short_circuit)))
+            elapsed = time.monotonic() - started
+            worker.start_grading(make_submission(short_circuit))
+            single = [event for event in worker.communicate() if event[0] != IPC.HELLO]
+        finally:
+            coordinator.close()
+            worker.close()
+        return sharded, single, elapsed
+
+    def test_shards_keep_batches_together(self):
+        flattened_cases, _ = flatten_cases([FakeCase(0), FakeBatch([FakeCase(1), FakeCase(2)]), FakeCase(3)])
+        self.assertEqual(shard_case_numbers(flattened_cases, 0, 2), [1, 4])
+        self.assertEqual(shard_case_numbers(flattened_cases, 1, 2), [2, 3])
+
+    def test_merged_in_case_order(self):
+        cases = [FakeCase(0, delay=0.2), FakeBatch([FakeCase(1), FakeCase(2)]), FakeCase(3), FakeCase(4)]
+        sharded, single, _ = self.grade(cases)
+        self.assertEqual([ipc_type for ipc_type, _ in sharded], [ipc_type for ipc_type, _ in single])
+        self.assertEqual(results_of(sharded), results_of(single))
+        # Every shard ran in a process of its own.
+        pids = {data[2].execution_time for ipc_type, data in sharded if ipc_type == IPC.RESULT}
+        self.assertEqual(len(pids), 2)
+
+    def test_short_circuit_propagates(self):
+        cases = [FakeCase(0), FakeCase(1, Result.WA, delay=0.1), FakeCase(2, delay=5), FakeCase(3), FakeCase(4)]
+        sharded, single, elapsed = self.grade(cases)
+        self.assertEqual(results_of(sharded), results_of(single))
+        self.assertEqual(sharded[-1], (IPC.GRADING_END, ()))
+        # The node busy with the third case was aborted instead of being waited for.
+        self.assertLess(elapsed, 3)
+
+    def test_failed_dependencies_across_shards(self):
+        batch1 = FakeBatch([FakeCase(0, Result.WA)])
+        batch2 = FakeBatch([FakeCase(1)], [batch1])
+        batch3 = FakeBatch([FakeCase(2)])
+        sharded, single, _ = self.grade([batch1, batch2, batch3], short_circuit=False)
+        self.assertEqual(results_of(sharded), [(1, 1, Result.WA), (2, 2, Result.SC), (3, 3, Result.AC)])
+        self.assertEqual(results_of(sharded), results_of(single))
@@ -0,0 +1,95 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+from unittest import mock
+
+from dmoj.judge import JudgeWorker
+from dmoj.result import Result
+from dmoj.utils import shared_payload
+from dmoj.utils.shared_payload import SharedPayload, free_unloaded_payloads
+
+
+def _send_payload(conn, token=None):
+    if token is not None:
+        shared_payload.set_process_token(token)
+    conn.send(SharedPayload(b'y' * 4096))
+    conn.close()
+
+
+class FakeCase:
+    points = 1
+    output_prefix_length = 64
+
+
+class SharedPayloadTest(unittest.TestCase):
+    def test_round_trip(self):
+        for value in (b'\0\xff' * 100000, 'ưu tiên ' * 10000, b''):
+            payload = SharedPayload(value)
+            self.assertEqual(payload.load(), value)
+
+    @unittest.skipUnless(os.path.isdir('/dev/shm'), 'shared memory is not backed by /dev/shm')
+    def test_load_frees_segment(self):
+        payload = SharedPayload(b'x' * 1024)
+        self.assertTrue(os.path.exists(os.path.join('/dev/shm', payload.name)))
+        payload.load()
+        self.assertFalse(os.path.exists(os.path.join('/dev/shm', payload.name)))
+
+    def test_creator_exits_quietly(self):
+        script = textwrap.dedent(
+            '''
+            import multiprocessing
+            from dmoj.tests.test_shared_payload import _send_payload
+
+            if __name__ == '__main__':
+                parent_conn, child_conn = multiprocessing.Pipe()
+                process = multiprocessing.Process(target=_send_payload, args=(child_conn,))
+                process.start()
+                assert parent_conn.recv().load() == b'y' * 4096
+                process.join()
+            '''
+        )
+        proc = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, timeout=60)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        # Neither the creator's resource tracker nor anything else may complain about the segment.
+        self.assertEqual(proc.stderr, '')
+
+    @unittest.skipUnless(os.path.isdir('/dev/shm'), 'shared memory is not backed by /dev/shm')
+    def test_unloaded_payloads_are_freed(self):
+        token = shared_payload.new_process_token()
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_send_payload, args=(child_conn, token))
+        process.start()
+        payload = parent_conn.recv()
+        process.join()
+        self.assertTrue(os.path.exists(os.path.join('/dev/shm', payload.name)))
+
+        # Another process that had the same pid is told apart by its token.
+        free_unloaded_payloads(process.pid, shared_payload.new_process_token())
+        self.assertTrue(os.path.exists(os.path.join('/dev/shm', payload.name)))
+        free_unloaded_payloads(process.pid, token)
+        self.assertFalse(os.path.exists(os.path.join('/dev/shm', payload.name)))
+
+    def test_forked_processes_get_their_own_token(self):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_send_payload, args=(child_conn,))
+        process.start()
+        payload = parent_conn.recv()
+        process.join()
+        own_payload = SharedPayload(b'z')
+        self.assertNotEqual(payload.name.split('_')[2], own_payload.name.split('_')[2])
+        payload.load()
+        own_payload.load()
+
+    def test_only_large_result_fields_are_shared(self):
+        result = Result(FakeCase(), proc_output=b'small', extended_feedback='x' * 2048, feedback='ok')
+        with mock.patch('dmoj.judge.env', mock.Mock(ipc_shared_memory_threshold=1024)):
+            JudgeWorker._share_large_payloads(result)
+        self.assertEqual(result.proc_output, b'small')
+        self.assertEqual(result.feedback, 'ok')
+        self.assertIsInstance(result.extended_feedback, SharedPayload)
+
+        JudgeWorker._load_shared_payloads(result)
+        self.assertEqual(result.extended_feedback, 'x' * 2048)
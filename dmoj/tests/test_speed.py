@@ -0,0 +1,43 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dmoj import speed, sysinfo
+from dmoj.judgeenv import env
+
+
+class SpeedFactorTest(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, speed, '_speed_factor', 1.0)
+
+    def calibrate(self, config, benchmark_time=0.1):
+        with mock.patch.dict(env.raw_config, config), mock.patch.object(
+            speed, 'run_benchmark', return_value=benchmark_time
+        ) as run_benchmark:
+            return speed.calibrate(), run_benchmark.call_count
+
+    def test_disabled_by_default(self):
+        self.assertEqual(self.calibrate({}), (1.0, 0))
+        self.assertEqual(sysinfo.speed_factor(), ('speed-factor', 1.0))
+
+    def test_factor_against_the_reference(self):
+        factor, _ = self.calibrate({'speed_normalization': True, 'speed_reference_time': 0.08})
+        self.assertEqual(factor, 1.25)
+        self.assertEqual(speed.get_speed_factor(), 1.25)
+        self.assertIn(speed.speed_factor, sysinfo.report_callbacks)
+
+    def test_benchmark_is_cached_per_machine(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            path = os.path.join(cache_dir, 'speed.json')
+            config = {'speed_normalization': True, 'speed_reference_time': 0.1, 'speed_benchmark_file': path}
+            self.assertEqual(self.calibrate(config, 0.2), (2.0, 1))
+            self.assertEqual(self.calibrate(config, 0.05), (2.0, 0))
+
+            with open(path, 'w') as f:
+                json.dump({'machine': 'another CPU', 'benchmark_time': 0.2}, f)
+            self.assertEqual(self.calibrate(config, 0.05), (0.5, 1))
+
+    def test_benchmark_runs(self):
+        self.assertGreater(speed.run_benchmark(rounds=1), 0)
@@ -0,0 +1,89 @@
+import unittest
+from unittest import mock
+
+from dmoj.config import ConfigNode
+from dmoj.graders.standard import StandardGrader
+from dmoj.judgeenv import env
+from dmoj.result import Result
+
+
+class FakeCase:
+    position = 0
+
+
+class FakeProblem:
+    id = 'fake'
+    time_limit = 1.0
+    memory_limit = 65536
+
+
+def make_grader(times, flag=0):
+    grader = StandardGrader.__new__(StandardGrader)
+    grader.problem = FakeProblem()
+    grader._abort_requested = False
+    runs = iter(times)
+    grader._run_attempt = lambda case: Result(case, result_flag=flag, execution_time=next(runs))
+    return grader
+
+
+class TLERecheckTest(unittest.TestCase):
+    def run_case(self, times, config, flag=0):
+        with mock.patch.dict(env.raw_config, config):
+            return make_grader(times, flag).run_case(FakeCase())
+
+    def test_disabled_by_default(self):
+        result = self.run_case([0.95], {})
+        self.assertEqual((result.execution_time, result.attempts), (0.95, []))
+
+    def test_runs_far_from_the_limit_are_not_repeated(self):
+        result = self.run_case([0.5], {'tle_recheck_band': 0.1})
+        self.assertEqual(result.attempts, [])
+
+    def test_minimum_stops_once_a_run_clears_the_band(self):
+        result = self.run_case([1.05, 0.95, 0.7, 0.6], {'tle_recheck_band': 0.1, 'tle_recheck_attempts': 3})
+        self.assertEqual((result.execution_time, result.attempts), (0.7, [1.05, 0.95, 0.7]))
+
+    def test_median_uses_every_attempt(self):
+        config = {'tle_recheck_band': 0.1, 'tle_recheck_attempts': 2, 'tle_recheck_report': 'median'}
+        result = self.run_case([1.05, 0.7, 0.95, 0.5], config)
+        self.assertEqual((result.execution_time, result.attempts), (0.95, [1.05, 0.7, 0.95]))
+
+    def test_runtime_errors_are_not_repeated(self):
+        result = self.run_case([0.95], {'tle_recheck_band': 0.1}, flag=Result.RTE)
+        self.assertEqual(result.attempts, [])
+
+
+class FakeBinary:
+    def __init__(self, execution_time):
+        self.execution_time = execution_time
+        self.launch_kwargs = None
+
+    def launch(self, **kwargs):
+        self.launch_kwargs = kwargs
+
+    def populate_result(self, error, result, process):
+        result.execution_time = self.execution_time
+
+
+class SpeedFactorTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch('dmoj.speed._speed_factor', 1.5)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.grader = StandardGrader.__new__(StandardGrader)
+        self.grader.problem = FakeProblem()
+        self.grader.binary = FakeBinary(1.2)
+        self.grader._running_procs = {}
+
+    def test_time_limit_is_scaled(self):
+        case = FakeCase()
+        case.config = ConfigNode({'wall_time_factor': 3, 'symlinks': {}})
+        self.grader._launch_process(case)
+        self.assertEqual(self.grader.binary.launch_kwargs['time'], 1.5)
+        self.assertEqual(self.grader.binary.launch_kwargs['wall_time'], 4.5)
+
+    def test_raw_and_scaled_times_are_recorded(self):
+        result = Result(FakeCase())
+        self.grader.populate_result(b'', result, None)
+        self.assertEqual(result.raw_execution_time, 1.2)
+        self.assertAlmostEqual(result.execution_time, 0.8)
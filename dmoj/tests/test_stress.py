@@ -0,0 +1,140 @@
+import unittest
+from functools import partial
+from unittest import mock
+
+from dmoj import checkers
+from dmoj.config import ConfigNode
+from dmoj.error import InternalError
+from dmoj.result import Result
+from dmoj.stress import StressTester
+from dmoj.tests.script_executor import ScriptExecutor
+
+
+class FakeProcess:
+    def __init__(self, output, returncode=0):
+        self.output = output
+        self.returncode = returncode
+
+    def communicate(self, input=None, timeout=None):
+        return self.output(input), b''
+
+    def kill(self):
+        pass
+
+    def wait(self):
+        return self.returncode
+
+
+class FakeGenerator:
+    def launch(self, *args, **kwargs):
+        return FakeProcess(lambda input: b'%s\n' % args[-1].encode())
+
+
+class FakeSolution:
+    def __init__(self, solve, returncode=0):
+        self.solve = solve
+        self.returncode = returncode
+
+    def launch(self, *args, **kwargs):
+        output = b'%d\n' % self.solve(int(kwargs['stdin'].read()))
+        return FakeProcess(lambda input: output, self.returncode)
+
+    def populate_result(self, error, result, process):
+        if process.returncode:
+            result.result_flag |= Result.RTE
+
+
+class FakeCase:
+    points = 1
+    position = 0
+    batch = 0
+    has_binary_data = False
+
+    def __init__(self, generator=None):
+        self.generator = generator or FakeGenerator()
+        self.config = ConfigNode({'generator': 'gen.cpp', 'generator_args': ['small'], 'wall_time_factor': 3})
+
+    def _compile_generator(self, gen, args=None):
+        return self.generator, list(args), 10, 65536
+
+    def checker(self):
+        return partial(checkers.standard.check)
+
+
+class FakeProblem:
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        self.id = problem_id
+        self.time_limit = time_limit
+        self.memory_limit = memory_limit
+        self.config = ConfigNode({})
+
+    def cases(self):
+        return [FakeCase()]
+
+
+SOLUTIONS = {
+    'brute': FakeSolution(lambda n: 2 * n),
+    'fast': FakeSolution(lambda n: n << 1),
+    'buggy': FakeSolution(lambda n: 2 * n + (n % 7 == 3)),
+    'crashing': FakeSolution(lambda n: 0, returncode=1),
+}
+
+
+class StressTesterTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch('dmoj.stress.Problem', FakeProblem),
+            mock.patch.object(StressTester, '_compile_solution', lambda self, language, source: SOLUTIONS[source]),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def make_tester(self, brute, candidate):
+        return StressTester('fake', ('CPP20', brute), ('CPP20', candidate), 1.0, 65536, processes=2)
+
+    def test_no_mismatch(self):
+        progress = []
+        iterations, mismatch = self.make_tester('brute', 'fast').run(40, on_progress=progress.append)
+        self.assertEqual(iterations, 40)
+        self.assertIsNone(mismatch)
+        self.assertEqual(progress, [32, 40])
+
+    def test_smallest_mismatch_is_reported(self):
+        iterations, mismatch = self.make_tester('brute', 'buggy').run(first_seed=1)
+        self.assertEqual(iterations, 32)
+        # Seeds 3, 10, 17, 24 and 31 all fail; the input of seed 3 is the shortest.
+        self.assertEqual(mismatch.seed, 3)
+        self.assertEqual(mismatch.input, b'3\n')
+        self.assertEqual((mismatch.brute_output, mismatch.candidate_output), (b'6\n', b'7\n'))
+        self.assertEqual(mismatch.verdict, 'WA')
+
+    def test_candidate_crash_is_a_mismatch(self):
+        _, mismatch = self.make_tester('brute', 'crashing').run(10)
+        self.assertEqual((mismatch.seed, mismatch.verdict), (1, 'RTE'))
+
+    def test_brute_force_failure_stops(self):
+        with self.assertRaises(InternalError):
+            self.make_tester('crashing', 'brute').run(10)
+
+
+class LaunchedProcessTest(unittest.TestCase):
+    def setUp(self):
+        generator = ScriptExecutor('import sys\nprint(sys.argv[-1])')
+        patches = [
+            mock.patch('dmoj.stress.Problem', FakeProblem),
+            mock.patch.object(FakeProblem, 'cases', lambda self: [FakeCase(generator)]),
+            mock.patch.object(StressTester, '_compile_solution', lambda self, language, source: ScriptExecutor(source)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_mismatch_between_processes(self):
+        brute = 'print(2 * int(input()))'
+        candidate = 'n = int(input())\nprint(2 * n + (n == 3))'
+        tester = StressTester('fake', ('PY3', brute), ('PY3', candidate), 2.0, 65536, processes=2)
+        iterations, mismatch = tester.run(8)
+        self.assertEqual(iterations, 8)
+        self.assertEqual((mismatch.seed, mismatch.input), (3, b'3\n'))
+        self.assertEqual((mismatch.brute_output, mismatch.candidate_output), (b'6\n', b'7\n'))
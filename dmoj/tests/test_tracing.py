@@ -0,0 +1,50 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from dmoj.utils import tracing
+
+
+class TracingTest(unittest.TestCase):
+    def tearDown(self):
+        tracing.stop()
+
+    def test_spans_are_free_while_off(self):
+        self.assertIsNone(tracing.stop())
+        self.assertIs(tracing.span('running'), tracing.span('checking', case=1))
+        self.assertIs(tracing.span_of(None, 'grading'), tracing.span('running'))
+
+    def test_trace_file(self):
+        tracer = tracing.start('Worker grading 1')
+        with tracing.span('compiling', 'executor', executor='CPP20'):
+            pass
+
+        def run_case():
+            with tracing.span('running', 'phase', case=1):
+                pass
+
+        thread = threading.Thread(target=run_case, name='case_0')
+        thread.start()
+        thread.join()
+        self.assertIs(tracing.stop(), tracer)
+        with tracing.span('not traced'):
+            pass
+
+        with tempfile.TemporaryDirectory() as trace_dir:
+            path = os.path.join(trace_dir, 'traces', 'aplusb-1.json')
+            tracer.write(path)
+            with open(path) as trace_file:
+                events = json.load(trace_file)['traceEvents']
+
+        spans = [event for event in events if event['ph'] == 'X']
+        self.assertEqual([span['name'] for span in spans], ['compiling', 'running'])
+        self.assertEqual(spans[0]['args'], {'executor': 'CPP20'})
+        self.assertEqual(spans[1]['cat'], 'phase')
+        self.assertNotEqual(spans[0]['tid'], spans[1]['tid'])
+        self.assertGreaterEqual(spans[1]['ts'], spans[0]['ts'] + spans[0]['dur'])
+
+        names = {(event['name'], event['args']['name']) for event in events if event['ph'] == 'M'}
+        self.assertIn(('process_name', 'Worker grading 1'), names)
+        self.assertIn(('thread_name', 'case_0'), names)
@@ -0,0 +1,85 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from dmoj.warmup import ProblemWarmup
+
+
+class FakeProblem:
+    warmed = []
+
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        if problem_id == 'broken':
+            raise ValueError('bad init.yml')
+        self.id = problem_id
+
+    def warm_up(self):
+        FakeProblem.warmed.append(self.id)
+
+
+class ProblemWarmupTest(unittest.TestCase):
+    def setUp(self):
+        FakeProblem.warmed = []
+        patches = [
+            mock.patch('dmoj.warmup.Problem', FakeProblem),
+            mock.patch('dmoj.warmup.get_problem_root', lambda problem_id: None if problem_id == 'gone' else '/'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_hot_problems(self):
+        warmup = ProblemWarmup(top=2)
+        for problem_id in ['old'] * 5 + ['gone'] * 4 + ['new'] * 3 + ['rare']:
+            warmup.record(problem_id)
+        self.assertEqual(warmup.hot_problems(), ['old', 'new'])
+
+        # Older submissions count for less and less.
+        for _ in range(300):
+            warmup.record('new')
+        warmup.record('rare')
+        self.assertEqual(warmup.hot_problems(), ['new', 'rare'])
+
+    def test_scores_are_scaled_down(self):
+        warmup = ProblemWarmup(top=3)
+        with mock.patch.object(ProblemWarmup, 'MAX_WEIGHT', 1.5):
+            for problem_id in ['old'] * 5 + ['new'] * 3 + ['rare']:
+                warmup.record(problem_id)
+        reference = ProblemWarmup(top=3)
+        for problem_id in ['old'] * 5 + ['new'] * 3 + ['rare']:
+            reference.record(problem_id)
+        self.assertEqual(warmup.hot_problems(), ['old', 'new', 'rare'])
+        self.assertEqual(warmup._current_scores().keys(), reference._current_scores().keys())
+        for problem_id, score in reference._current_scores().items():
+            self.assertAlmostEqual(warmup._current_scores()[problem_id], score)
+
+    def test_history_survives_restarts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            history_file = os.path.join(directory, 'history.json')
+            warmup = ProblemWarmup(history_file, top=1)
+            warmup.record('aplusb')
+            # Saved at shutdown, not on every submission.
+            self.assertFalse(os.path.exists(history_file))
+            warmup.save()
+            self.assertEqual(ProblemWarmup(history_file, top=1).hot_problems(), ['aplusb'])
+
+            with mock.patch.object(ProblemWarmup, 'SAVE_INTERVAL', 0):
+                warmup.record('hello')
+                warmup.record('hello')
+            self.assertEqual(ProblemWarmup(history_file, top=1).hot_problems(), ['hello'])
+
+            with open(history_file, 'w') as f:
+                f.write('not json')
+            self.assertEqual(ProblemWarmup(history_file, top=1).hot_problems(), [])
+
+    def test_warm_up_in_background(self):
+        warmed = []
+        warmup = ProblemWarmup(top=3, on_warmed=lambda: warmed.append(list(FakeProblem.warmed)))
+        for problem_id in ('aplusb', 'broken', 'aplusb', 'hello'):
+            warmup.record(problem_id)
+
+        warmup.warm_up_in_background()
+        warmup.wait(timeout=10)
+        # A problem that fails to load doesn't keep the others from being warmed.
+        self.assertEqual(warmed, [['aplusb', 'hello']])
@@ -0,0 +1,123 @@
+import os
+import unittest
+from unittest import mock
+
+from dmoj.judge import IPC, JudgeWorkerPool, Submission
+from dmoj.result import Result
+
+
+class FakeCase:
+    points = 1
+    output_prefix_length = 0
+
+    def __init__(self, position):
+        self.position = position
+
+
+class FakeGrader:
+    def __init__(self, judge, problem, language, source):
+        self.binary = None
+
+    def grade(self, case):
+        return Result(case, execution_time=os.getpid())
+
+    def abort_grading(self):
+        pass
+
+
+class FakeProblem:
+    grader_class = FakeGrader
+    run_pretests_only = False
+
+    def __init__(self, problem_id, time_limit, memory_limit, meta):
+        pass
+
+    def cases(self):
+        return [FakeCase(0), FakeCase(1)]
+
+
+def grade(worker, sub_id):
+    worker.start_grading(Submission(sub_id, 'fake', 'CPP20', '', 1.0, 65536, False, {}))
+    return list(worker.communicate())
+
+
+class JudgeWorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.problem_patch = mock.patch('dmoj.judge.Problem', FakeProblem)
+        self.problem_patch.start()
+
+    def tearDown(self):
+        self.problem_patch.stop()
+
+    def test_worker_is_reused(self):
+        pool = JudgeWorkerPool(1, max_submissions=10)
+        try:
+            worker = pool.acquire()
+            first = grade(worker, 1)
+            pool.release(worker)
+
+            self.assertIs(pool.acquire(), worker)
+            second = grade(worker, 2)
+            pool.release(worker)
+        finally:
+            pool.close()
+
+        for messages in (first, second):
+            self.assertEqual(messages[0], (IPC.HELLO, ()))
+            self.assertEqual(messages[-1], (IPC.GRADING_END, ()))
+        pids = {data[2].execution_time for ipc_type, data in first + second if ipc_type == IPC.RESULT}
+        self.assertEqual(pids, {worker.worker_process.pid})
+        self.assertEqual(worker.submissions_graded, 2)
+
+    def test_worker_is_recycled(self):
+        pool = JudgeWorkerPool(1, max_submissions=1)
+        try:
+            worker = pool.acquire()
+            grade(worker, 1)
+            pool.release(worker)
+            worker.worker_process.join(5)
+            self.assertFalse(worker.worker_process.is_alive())
+
+            # The replacement is only forked once a worker is needed, by the thread that needs it.
+            self.assertEqual(pool._idle_workers, [])
+            replacement = pool.acquire()
+            self.assertIsNot(replacement, worker)
+            self.assertEqual(grade(replacement, 2)[-1], (IPC.GRADING_END, ()))
+            pool.release(replacement)
+        finally:
+            pool.close()
+
+    def test_refresh_replaces_workers_between_submissions(self):
+        pool = JudgeWorkerPool(2, max_submissions=10)
+        try:
+            busy_worker = pool.acquire()
+            idle_worker = pool.acquire()
+            pool.release(idle_worker)
+            pool.refresh()
+            # Nothing is forked until a worker is needed.
+            self.assertTrue(idle_worker.is_alive())
+
+            fresh_worker = pool.acquire()
+            self.assertIsNot(fresh_worker, idle_worker)
+            self.assertEqual(grade(fresh_worker, 1)[-1], (IPC.GRADING_END, ()))
+            pool.release(fresh_worker)
+            idle_worker.worker_process.join(5)
+            self.assertFalse(idle_worker.is_alive())
+
+            grade(busy_worker, 2)
+            pool.release(busy_worker)
+            busy_worker.worker_process.join(5)
+            self.assertFalse(busy_worker.is_alive())
+            self.assertIs(pool.acquire(), fresh_worker)
+        finally:
+            pool.close()
+
+    def test_closed_pool_forks_no_workers(self):
+        pool = JudgeWorkerPool(1)
+        worker = pool.acquire()
+        pool.close()
+        pool.release(worker)
+        worker.worker_process.join(5)
+        self.assertFalse(worker.is_alive())
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
@@ -0,0 +1,65 @@
+import subprocess
+import threading
+from typing import List
+
+
+class CancellationToken:
+    """
+    Tells everything working on behalf of one submission that it should stop.
+
+    Every process launched while the token is current is tracked by it, and `cancel` kills them all: compilers,
+    generators, the submission itself, interactors and checkers alike. Code that runs in-process checks `cancelled`
+    between steps instead.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._processes: List[subprocess.Popen] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            processes, self._processes = self._processes, []
+        for process in processes:
+            _kill(process)
+
+    def track(self, process: subprocess.Popen) -> subprocess.Popen:
+        """Kills `process` if the token is cancelled before it exits; if it already was, kills it right away."""
+        with self._lock:
+            if not self._cancelled:
+                # Processes that were waited for are done with; forget them so the list doesn't grow with every case.
+                self._processes = [tracked for tracked in self._processes if tracked.returncode is None]
+                self._processes.append(process)
+                return process
+        _kill(process)
+        return process
+
+
+def _kill(process: subprocess.Popen) -> None:
+    try:
+        process.kill()
+    except OSError:
+        pass
+
+
+# A worker process grades one submission at a time, so the token for that submission is simply process-wide.
+_current_token = CancellationToken()
+
+
+def current_token() -> CancellationToken:
+    return _current_token
+
+
+def set_current_token(token: CancellationToken) -> None:
+    global _current_token
+    _current_token = token
+
+
+def track(process: subprocess.Popen) -> subprocess.Popen:
+    """Ties `process` to the submission currently being graded, so that aborting the submission kills it."""
+    return _current_token.track(process)
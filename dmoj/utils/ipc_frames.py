@@ -0,0 +1,266 @@
+"""
+Compact binary framing for the high-volume judge worker messages: case results and batch boundaries.
+
+A frame packs any number of records, so that results produced in quick succession cross the pipe in a single
+`send_bytes` call instead of one pickle each:
+
+    frame  := MAGIC version:u8 count:u32 record*
+    record := kind:u8 batch:u32 body
+    body   := (empty, for BATCH_BEGIN and BATCH_END)
+            | RESULT_FIXED runtime_version proc_output feedback extended_feedback attempt:f64*    (for RESULT)
+
+All integers are little-endian, a batch of 0 stands for "not batched", and the four strings are UTF-8 encoded, their
+lengths and the number of attempts being the last five fields of RESULT_FIXED. Anything that doesn't fit this layout
+is left to pickle by the caller.
+"""
+
+import struct
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+from dmoj.problem import TestCase
+from dmoj.result import Result
+from dmoj.utils.unicode import utf8bytes, utf8text
+
+# Pickled messages always start with b'\x80', so frames can share the pipe with them.
+MAGIC = b'DJF'
+VERSION = 3
+
+RESULT = 1
+BATCH_BEGIN = 2
+BATCH_END = 3
+
+FRAME_HEADER = struct.Struct('<3sBI')
+RECORD_HEADER = struct.Struct('<BI')
+RESULT_FIXED = struct.Struct(
+    '<I'  # case number
+    'IIdI?'  # case: position, batch, points, output_prefix_length, has_binary_data
+    'IdddQQQd'  # result_flag, execution_time, raw_execution_time, wall_clock_time, max_memory, switches, points
+    'IIII'  # lengths of runtime_version, proc_output, feedback, extended_feedback
+    'H'  # number of attempts
+)
+ATTEMPT = struct.Struct('<d')
+
+_CASE_STATE = frozenset(('position', 'batch', 'points', 'output_prefix_length', 'has_binary_data'))
+_RESULT_STATE = frozenset(
+    (
+        'case',
+        'result_flag',
+        'execution_time',
+        'raw_execution_time',
+        'wall_clock_time',
+        'max_memory',
+        'context_switches',
+        'runtime_version',
+        'proc_output',
+        'feedback',
+        'extended_feedback',
+        'points',
+        'attempts',
+    )
+)
+
+Record = Tuple[int, tuple]
+
+
+def is_frame(data: bytes) -> bool:
+    return data[: len(MAGIC)] == MAGIC
+
+
+def encode_batch_record(kind: int, batch_number: int) -> bytes:
+    return RECORD_HEADER.pack(kind, batch_number)
+
+
+def encode_result_record(batch_number: Optional[int], case_number: int, result: Result) -> Optional[bytes]:
+    """
+    Returns the record for `result`, or None if it carries anything the layout can't represent, such as a payload
+    moved to shared memory.
+    """
+    case = result.case
+    if type(case) is not TestCase or set(case.__getstate__()) != _CASE_STATE or set(vars(result)) != _RESULT_STATE:
+        return None
+    strings = (result.runtime_version, result.feedback, result.extended_feedback)
+    if not isinstance(result.proc_output, bytes) or not all(isinstance(string, str) for string in strings):
+        return None
+    if len(result.attempts) > 0xFFFF:
+        return None
+
+    runtime_version, feedback, extended_feedback = (utf8bytes(string) for string in strings)
+    return b''.join(
+        (
+            RECORD_HEADER.pack(RESULT, batch_number or 0),
+            RESULT_FIXED.pack(
+                case_number,
+                case.position,
+                case.batch,
+                case.points,
+                case.output_prefix_length,
+                case.has_binary_data,
+                result.result_flag,
+                result.execution_time,
+                result.raw_execution_time,
+                result.wall_clock_time,
+                result.max_memory,
+                *result.context_switches,
+                result.points,
+                len(runtime_version),
+                len(result.proc_output),
+                len(feedback),
+                len(extended_feedback),
+                len(result.attempts),
+            ),
+            runtime_version,
+            result.proc_output,
+            feedback,
+            extended_feedback,
+            *(ATTEMPT.pack(attempt) for attempt in result.attempts),
+        )
+    )
+
+
+def pack_frame(records: List[bytes]) -> bytes:
+    return FRAME_HEADER.pack(MAGIC, VERSION, len(records)) + b''.join(records)
+
+
+def unpack_frame(data: bytes) -> List[Record]:
+    """
+    Decodes a frame into `(kind, args)` records, where args are `(batch_number,)` for batch boundaries and
+    `(batch_number, case_number, Result)` for results.
+    """
+    magic, version, count = FRAME_HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'unsupported IPC frame version: {version}')
+
+    view = memoryview(data)
+    offset = FRAME_HEADER.size
+    records: List[Record] = []
+    for _ in range(count):
+        kind, batch_number = RECORD_HEADER.unpack_from(data, offset)
+        offset += RECORD_HEADER.size
+        if kind in (BATCH_BEGIN, BATCH_END):
+            records.append((kind, (batch_number,)))
+            continue
+        if kind != RESULT:
+            raise ValueError(f'unknown IPC record kind: {kind}')
+
+        (
+            case_number,
+            position,
+            case_batch,
+            case_points,
+            output_prefix_length,
+            has_binary_data,
+            result_flag,
+            execution_time,
+            raw_execution_time,
+            wall_clock_time,
+            max_memory,
+            voluntary_switches,
+            involuntary_switches,
+            points,
+            *lengths,
+            attempt_count,
+        ) = RESULT_FIXED.unpack_from(data, offset)
+        offset += RESULT_FIXED.size
+        fields = []
+        for length in lengths:
+            fields.append(bytes(view[offset : offset + length]))
+            offset += length
+        runtime_version, proc_output, feedback, extended_feedback = fields
+        attempts = []
+        for _ in range(attempt_count):
+            attempts.append(ATTEMPT.unpack_from(data, offset)[0])
+            offset += ATTEMPT.size
+
+        case = TestCase.__new__(TestCase)
+        case.__setstate__(
+            {
+                'position': position,
+                'batch': case_batch,
+                'points': case_points,
+                'output_prefix_length': output_prefix_length,
+                'has_binary_data': has_binary_data,
+            }
+        )
+        result = Result(
+            case,
+            result_flag=result_flag,
+            execution_time=execution_time,
+            wall_clock_time=wall_clock_time,
+            max_memory=max_memory,
+            context_switches=(voluntary_switches, involuntary_switches),
+            runtime_version=utf8text(runtime_version),
+            proc_output=proc_output,
+            feedback=utf8text(feedback),
+            extended_feedback=utf8text(extended_feedback),
+            points=points,
+            attempts=attempts,
+            raw_execution_time=raw_execution_time,
+        )
+        records.append((kind, (batch_number or None, case_number, result)))
+    return records
+
+
+class FrameCoalescer:
+    """
+    Sends messages over `conn`, packing every message `encode` accepts into frames.
+
+    Encoded records are held back for at most `window` seconds (or until `max_records` pile up), so that results
+    produced in quick succession share one frame. A message `encode` rejects flushes the pending frame and is then
+    pickled as usual, which keeps every message in order. Frames whose window runs out are sent by a single flusher
+    thread, started along with the first window.
+    """
+
+    def __init__(
+        self, conn, encode: Callable[[object], Optional[bytes]], window: float, max_records: int = 256
+    ) -> None:
+        self.conn = conn
+        self.encode = encode
+        self.window = window
+        self.max_records = max_records
+        self._condition = threading.Condition()
+        self._records: List[bytes] = []
+        # When the pending frame has to be sent, on the `time.monotonic` clock.
+        self._deadline: Optional[float] = None
+        self._flusher: Optional[threading.Thread] = None
+
+    def send(self, message) -> None:
+        record = self.encode(message)
+        with self._condition:
+            if record is None:
+                self._flush_locked()
+                self.conn.send(message)
+                return
+
+            self._records.append(record)
+            if self.window <= 0 or len(self._records) >= self.max_records:
+                self._flush_locked()
+            elif self._deadline is None:
+                self._deadline = time.monotonic() + self.window
+                if self._flusher is None:
+                    self._flusher = threading.Thread(target=self._flusher_main, name='IPC frame flusher', daemon=True)
+                    self._flusher.start()
+                self._condition.notify()
+
+    def flush(self) -> None:
+        with self._condition:
+            self._flush_locked()
+
+    def _flusher_main(self) -> None:
+        with self._condition:
+            while True:
+                if self._deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                else:
+                    self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self._deadline = None
+        if self._records:
+            records, self._records = self._records, []
+            self.conn.send_bytes(pack_frame(records))
@@ -1,5 +1,6 @@
 import ctypes
 import ctypes.util
+import os
 import signal
 from typing import Optional
 
@@ -17,6 +18,16 @@ def oom_score_adj(score: int, to: Optional[int] = None) -> None:
         f.write(utf8bytes(str(score)))
 
 
+def get_rss(pid: int) -> Optional[int]:
+    """Returns the resident set size of `pid` in kilobytes, or None if it can't be determined."""
+    try:
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') // 1024
+
+
 try:
     from signal import strsignal as _strsignal
 except ImportError:  # before Python 3.8
@@ -0,0 +1,86 @@
+import itertools
+import os
+import secrets
+from multiprocessing import resource_tracker, shared_memory
+from typing import Union
+
+from dmoj.utils.unicode import utf8bytes, utf8text
+
+# Where POSIX shared memory segments show up as files, on Linux.
+SHM_DIR = '/dev/shm'
+
+_segment_numbers = itertools.count()
+# Tells this process's segments apart from those of an earlier process with the same pid; every process gets its own.
+_process_token = secrets.token_hex(4)
+
+
+def new_process_token() -> str:
+    return secrets.token_hex(4)
+
+
+def set_process_token(token: str) -> None:
+    """Names the segments of this process after `token`, so that its parent can free them by it."""
+    global _process_token, _segment_numbers
+    _process_token = token
+    _segment_numbers = itertools.count()
+
+
+os.register_at_fork(after_in_child=lambda: set_process_token(new_process_token()))
+
+
+def _segment_prefix(pid: int, token: str) -> str:
+    return f'dmoj_{pid}_{token}_'
+
+
+class SharedPayload:
+    """
+    Stands in for a large bytes or str value on its way between processes.
+
+    The value is copied once into a shared memory segment, and only this small handle goes through the pipe. The
+    receiving side copies the value back out with `load`, which also frees the segment; a payload must therefore be
+    loaded exactly once. The segment belongs to the receiving side from the moment it is created: if the creating
+    process dies before every payload it sent was loaded, `free_unloaded_payloads` frees the rest, given the token the
+    process was started with (see `set_process_token`).
+    """
+
+    def __init__(self, value: Union[bytes, str]) -> None:
+        self.is_text = isinstance(value, str)
+        data = utf8bytes(value)
+        self.size = len(data)
+        name = f'{_segment_prefix(os.getpid(), _process_token)}{next(_segment_numbers)}'
+        segment = shared_memory.SharedMemory(name=name, create=True, size=max(self.size, 1))
+        # Otherwise this process's resource tracker would unlink the segment when the process exits, loaded or not,
+        # and warn about it having leaked.
+        resource_tracker.unregister(segment._name, 'shared_memory')  # type: ignore[attr-defined]
+        try:
+            segment.buf[: self.size] = data
+            self.name = segment.name
+        finally:
+            segment.close()
+
+    def load(self) -> Union[bytes, str]:
+        segment = shared_memory.SharedMemory(name=self.name)
+        try:
+            data = bytes(segment.buf[: self.size])
+        finally:
+            segment.close()
+            segment.unlink()
+        return utf8text(data, 'replace') if self.is_text else data
+
+
+def free_unloaded_payloads(pid: int, token: str) -> None:
+    """
+    Frees the segments of every payload that process `pid`, with the token `token`, created and was never loaded.
+    The process must have exited.
+    """
+    try:
+        names = os.listdir(SHM_DIR)
+    except OSError:
+        return
+    prefix = _segment_prefix(pid, token)
+    for name in names:
+        if name.startswith(prefix):
+            try:
+                os.unlink(os.path.join(SHM_DIR, name))
+            except OSError:
+                pass
@@ -0,0 +1,153 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from dmoj.judgeenv import env, get_problem_root
+from dmoj.problem import Problem
+
+
+class ProblemWarmup:
+    """
+    Keeps track of how often each problem is submitted to, and gets the `top` hottest ones ready ahead of time, so
+    that the first submissions after a restart or a problem update don't pay for it.
+
+    Warming a problem parses its init.yml, opens its archive, compiles its interactor, generators and bridged checkers
+    into the compiled binary cache, and reads its test data into the page cache (see `Problem.warm_up`). Warmups run
+    in a background thread; `on_warmed` is called after each, so that the judge can fork fresh workers that inherit
+    the compiled binaries.
+
+    With a `history_file`, the frequencies survive restarts: they are saved at most every `SAVE_INTERVAL` seconds as
+    submissions are recorded, and by `save`, which the judge calls when it shuts down.
+    """
+
+    # Weight left to all earlier submissions each time a new one is recorded.
+    DECAY = 0.99
+    # Problems whose score decayed below this are forgotten.
+    MIN_SCORE = 0.01
+    # Rather than decaying every score, each submission recorded weighs 1 / DECAY times more than the one before; once
+    # the weight grows past this, every score is scaled back down by it at once.
+    MAX_WEIGHT = 1e100
+    SAVE_INTERVAL = 60
+
+    def __init__(
+        self,
+        history_file: Optional[str] = None,
+        top: Optional[int] = None,
+        on_warmed: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.history_file = history_file
+        self.top = top or env.warmup_problems
+        self.on_warmed = on_warmed
+        self._lock = threading.Lock()
+        # Every score, multiplied by the weight of the latest submission.
+        self._scores: Dict[str, float] = self._load_history()
+        self._weight = 1.0
+        self._changed = False
+        self._saved_at = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._rerun = False
+
+    def record(self, problem_id: str) -> None:
+        with self._lock:
+            self._weight /= self.DECAY
+            self._scores[problem_id] = self._scores.get(problem_id, 0.0) + self._weight
+            if self._weight > self.MAX_WEIGHT:
+                self._scores = self._current_scores()
+                self._weight = 1.0
+            self._changed = True
+            save_due = time.monotonic() - self._saved_at >= self.SAVE_INTERVAL
+        if save_due:
+            self.save()
+
+    def save(self) -> None:
+        """Writes the frequencies to the `history_file`, if any, unless they are already there."""
+        if not self.history_file:
+            return
+        with self._lock:
+            if not self._changed:
+                return
+            scores = self._current_scores()
+            self._changed = False
+            self._saved_at = time.monotonic()
+        self._save_history(scores)
+
+    def hot_problems(self) -> List[str]:
+        """Returns the `top` problems submitted to most often lately, hottest first, skipping any no longer around."""
+        with self._lock:
+            ranked = sorted(self._scores, key=self._scores.__getitem__, reverse=True)
+        return [problem_id for problem_id in ranked if get_problem_root(problem_id) is not None][: self.top]
+
+    def warm_up(self, problem_ids: Optional[List[str]] = None) -> None:
+        """Warms `problem_ids`, or the hot problems, one at a time; a problem that fails to load is skipped."""
+        for problem_id in self.hot_problems() if problem_ids is None else problem_ids:
+            started = time.monotonic()
+            try:
+                # The limits and meta are irrelevant to anything warming touches.
+                Problem(problem_id, 0, 0, {}).warm_up()
+            except Exception as e:
+                print(f"Failed to warm up {problem_id}: {e!r}")
+                continue
+            print(f"Warmed up {problem_id} in {time.monotonic() - started:.2f}s.")
+
+    def warm_up_in_background(self) -> None:
+        """
+        Warms the hot problems in a background thread. If a warmup is already running, another one follows it, so
+        that changes made since it started are picked up.
+        """
+        with self._lock:
+            if self._thread is not None:
+                self._rerun = True
+                return
+            self._thread = threading.Thread(target=self._warmup_thread_main, name='Problem warmup', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """Waits for the background warmup, if any, to finish."""
+        with self._lock:
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _warmup_thread_main(self) -> None:
+        while True:
+            try:
+                self.warm_up()
+                if self.on_warmed is not None:
+                    self.on_warmed()
+            except Exception as e:
+                print(f"Problem warmup failed: {e!r}")
+            with self._lock:
+                if not self._rerun:
+                    self._thread = None
+                    return
+                self._rerun = False
+
+    def _current_scores(self) -> Dict[str, float]:
+        scores = {problem_id: score / self._weight for problem_id, score in self._scores.items()}
+        return {problem_id: score for problem_id, score in scores.items() if score >= self.MIN_SCORE}
+
+    def _load_history(self) -> Dict[str, float]:
+        if not self.history_file:
+            return {}
+        try:
+            with open(self.history_file) as history:
+                scores = json.load(history)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(scores, dict):
+            return {}
+        return {str(problem_id): float(score) for problem_id, score in scores.items()}
+
+    def _save_history(self, scores: Dict[str, float]) -> None:
+        if not self.history_file:
+            return
+        directory = os.path.dirname(os.path.abspath(self.history_file))
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=directory, delete=False) as history:
+                json.dump(scores, history)
+            os.replace(history.name, self.history_file)
+        except OSError as e:
+            print(f"Failed to save the submission history: {e!r}")
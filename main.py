@@ -1,4 +1,5 @@
-from dmoj.judge import Judge, Submission
+from dmoj.judge import IPC, Judge, Submission
+from dmoj.scheduler import SubmissionScheduler
 from dmoj import executors
 
 if __name__ == '__main__':
@@ -30,34 +31,25 @@ int main() {
     # Tạo judge instance
     judge = Judge()
 
-    # Chấm từng submission và hiển thị kết quả
-    for submission in submissions:
-        print(f"Grading Submission #{submission.id} ({submission.problem_id})...")
-        results = judge.begin_grading(submission)
+    def report(submission, ipc_type, data):
+        # In kết quả từng test ngay khi worker chấm xong (lỗi biên dịch đã được judge in ra)
+        if ipc_type == IPC.RESULT:
+            batch, case, result = data
+            verdict = result.readable_codes()[0]
+            time_str = f"{result.execution_time:.3f}s"
+            memory_str = f"{result.max_memory}kb"
+            test_str = f"Submission #{submission.id} Test {case}: {verdict} [Time: {time_str}, Memory: {memory_str}]"
+            if result.feedback:
+                test_str += f" (Feedback: {result.feedback})"
+            print(test_str)
 
-        # Kiểm tra lỗi biên dịch hoặc thông báo
-        has_compile_error = False
-        for ipc_type, data in judge.current_judge_worker.communicate():
-            if ipc_type == 'COMPILE-ERROR':
-                print(f"Submission #{submission.id} Compile Error: {data[0].decode('utf-8')}")
-                has_compile_error = True
-                break
-            elif ipc_type == 'COMPILE-MESSAGE':
-                print(f"Submission #{submission.id} Compile Message: {data[0].decode('utf-8')}")
-
-        # Nếu không có lỗi biên dịch, hiển thị kết quả
-        if not has_compile_error and results:
-            print(f"Submission #{submission.id} Results:")
-            test_results = []
-            for batch, case, result in results:
-                verdict = result.readable_codes()[0]
-                time_str = f"{result.execution_time:.3f}s"
-                memory_str = f"{result.max_memory}kb"
-                test_str = f"Test {case}: {verdict} [Time: {time_str}, Memory: {memory_str}]"
-                if result.feedback:
-                    test_str += f" (Feedback: {result.feedback})"
-                test_results.append(test_str)
-            print("  " + ", ".join(test_results))
-        elif not has_compile_error and not results:
+    # Chấm đồng thời các submission theo mức ưu tiên, mỗi slot một worker riêng
+    scheduler = SubmissionScheduler(judge)
+    futures = [
+        (submission, scheduler.submit(submission, on_event=lambda *event, sub=submission: report(sub, *event)))
+        for submission in submissions
+    ]
+    for submission, future in futures:
+        if not future.result():
             print(f"Submission #{submission.id}: No results returned.")
-        print()
\ No newline at end of file
+    scheduler.close()